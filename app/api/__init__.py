@@ -3,7 +3,7 @@ from .anki import router as anki_router
 from .flashcards import router as flashcards_router
 from .history import router as history_router
 from .dashboard import router as dashboard_router
-from .models import router as models_router
+from .models import router as models_router, start_models_refresher, stop_models_refresher
 from .websocket import router as websocket_router, start_broadcaster, stop_broadcaster
 from .documents import router as documents_router
 from .questions import router as questions_router
@@ -20,4 +20,6 @@ __all__ = [
     "questions_router",
     "start_broadcaster",
     "stop_broadcaster",
+    "start_models_refresher",
+    "stop_models_refresher",
 ]
@@ -3,15 +3,34 @@
 from fastapi import APIRouter, Depends, Header, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional, Tuple, List
+from typing import Iterable, Optional, Tuple, List
 import asyncio
+import bisect
+import hashlib
 import json
 import re
+import sys
 import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
 import httpx
 
-from app.config import OLLAMA_MODEL, OLLAMA_ANALYSIS_MODEL, OLLAMA_VALIDATION_MODEL, RATE_LIMIT_GENERATE
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+from app.config import (
+    OLLAMA_MODEL,
+    OLLAMA_ANALYSIS_MODEL,
+    OLLAMA_VALIDATION_MODEL,
+    LLM_VALIDATION_MAX_CONCURRENCY,
+    PERSIST_FILTER_RESULTS,
+    RATE_LIMIT_GENERATE,
+)
 from app.middleware.rate_limit import limiter
 
 
@@ -60,11 +79,12 @@ def merge_api_keys(header_keys: ApiKeys, body_request) -> ApiKeys:
         openai_key=header_keys.openai or getattr(body_request, "openaiApiKey", None),
         perplexity_key=header_keys.perplexity or getattr(body_request, "perplexityApiKey", None),
     )
-from app.services.ollama import ollama_generate_stream  # noqa: E402
+from app.services.ollama import ollama_generate_stream, src_stats  # noqa: E402
 from app.services.api_providers import openai_generate_stream, perplexity_generate_stream  # noqa: E402
 from app.services.parser import (  # noqa: E402
     parse_flashcards_qa,
     parse_flashcards_json,
+    looks_like_json,
     normalize_cards,
     pick_default_deck,
 )
@@ -75,18 +95,15 @@ from app.utils.text import (  # noqa: E402
 from app.utils.validation import validate_content_sufficiency  # noqa: E402
 from app.utils.prompt_validation import validate_custom_prompt, log_injection_attempt  # noqa: E402
 from app.services.storage import (  # noqa: E402
+    AuditBatch,
     save_analysis,
-    save_cards,
-    save_llm_response,
+    save_cards_and_link_responses,
     save_filter_result,
-    save_generation_request,
-    save_pipeline_stage,
-    _get_connection,
 )
 
 from app.services.prompt_provider import PromptProvider, get_prompt_provider  # noqa: E402
-from app.core.prompts import get_default_prompts_for_ui  # noqa: E402
-from app.api.models import get_provider_for_model, get_first_available_ollama_llm  # noqa: E402
+from app.core.prompts import get_default_prompts_for_ui, split_for_cache  # noqa: E402
+from app.api.models import get_provider_for_model, get_first_available_ollama_llm, is_embedding_model  # noqa: E402
 from app.core.topic_segmentation import (  # noqa: E402
     segment_with_langextract,
     is_langextract_available,
@@ -96,6 +113,23 @@ router = APIRouter(prefix="/api", tags=["flashcards"])
 logger = logging.getLogger(__name__)
 
 
+# =============================================================================
+# SSE Event Helpers
+# =============================================================================
+def _sse_event(event: str, data: dict) -> bytes:
+    """
+    Formata um evento SSE já em bytes (orjson quando disponível).
+
+    O StreamingResponse envia bytes sem nova codificação; os frames acumulados em
+    `pending` são unidos com b"".join.
+    """
+    if orjson is not None:
+        payload = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        payload = json.dumps(data).encode("utf-8")
+    return b"event: " + event.encode("ascii") + b"\ndata: " + payload + b"\n\n"
+
+
 def _text_limit_for_provider(provider: str, purpose: str) -> int:
     """Returns char limit for text truncation based on provider capabilities."""
     if provider in ("openai", "perplexity"):
@@ -173,8 +207,13 @@ def _is_generation_cancelled(request_id: Optional[str]) -> bool:
     return bool(rid and rid in _GENERATION_CANCELLED_IDS)
 
 
+_WS_RE = re.compile(r"\s+")
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_WORD_RE = re.compile(r"\S+")
+
+
 def _norm_ws(s: str) -> str:
-    return re.sub(r"\s+", " ", (s or "")).strip().lower()
+    return _WS_RE.sub(" ", (s or "")).strip().lower()
 
 
 # =============================================================================
@@ -182,6 +221,8 @@ def _norm_ws(s: str) -> str:
 # =============================================================================
 
 _SUPERMEMO_CHECKLIST_CACHE: Optional[str] = None
+_CHECKLIST_BLOCK_CACHE: Optional[str] = None
+_CHECKLIST_LOCK = threading.Lock()
 
 
 def _project_root() -> Path:
@@ -189,39 +230,49 @@ def _project_root() -> Path:
     return Path(__file__).resolve().parents[2]
 
 
+_CHECKLIST_PATH = _project_root() / "docs" / "supermemo_checklist.md"
+
+
 def _load_supermemo_checklist(max_chars: int = 2500) -> str:
     """
     Carrega uma versão curta do checklist SuperMemo para injetar no prompt.
-    - Mantém cache em memória.
+    - Mantém cache em memória (pré-carregado no import do módulo).
     - Limita tamanho para não estourar o contexto de um SLM pequeno.
     """
     global _SUPERMEMO_CHECKLIST_CACHE
     if _SUPERMEMO_CHECKLIST_CACHE is not None:
         return _SUPERMEMO_CHECKLIST_CACHE
 
-    try:
-        p = _project_root() / "docs" / "supermemo_checklist.md"
-        if not p.exists():
-            _SUPERMEMO_CHECKLIST_CACHE = ""
+    with _CHECKLIST_LOCK:
+        if _SUPERMEMO_CHECKLIST_CACHE is not None:
             return _SUPERMEMO_CHECKLIST_CACHE
+        try:
+            if not _CHECKLIST_PATH.exists():
+                _SUPERMEMO_CHECKLIST_CACHE = ""
+                return _SUPERMEMO_CHECKLIST_CACHE
 
-        txt = p.read_text(encoding="utf-8").strip()
-        if len(txt) > max_chars:
-            txt = txt[:max_chars].rstrip() + "\n\n[...truncado...]"
+            txt = _CHECKLIST_PATH.read_text(encoding="utf-8").strip()
+            if len(txt) > max_chars:
+                txt = txt[:max_chars].rstrip() + "\n\n[...truncado...]"
 
-        _SUPERMEMO_CHECKLIST_CACHE = txt
-        return _SUPERMEMO_CHECKLIST_CACHE
-    except Exception:
-        _SUPERMEMO_CHECKLIST_CACHE = ""
-        return _SUPERMEMO_CHECKLIST_CACHE
+            _SUPERMEMO_CHECKLIST_CACHE = txt
+            return _SUPERMEMO_CHECKLIST_CACHE
+        except Exception:
+            _SUPERMEMO_CHECKLIST_CACHE = ""
+            return _SUPERMEMO_CHECKLIST_CACHE
 
 
 def _format_checklist_block() -> str:
+    global _CHECKLIST_BLOCK_CACHE
+    if _CHECKLIST_BLOCK_CACHE is not None:
+        return _CHECKLIST_BLOCK_CACHE
+
     checklist = _load_supermemo_checklist()
     if not checklist:
-        return ""
+        _CHECKLIST_BLOCK_CACHE = ""
+        return _CHECKLIST_BLOCK_CACHE
 
-    return f"""
+    _CHECKLIST_BLOCK_CACHE = f"""
 DIRETRIZES DE QUALIDADE (SM20 Checklist) — NÃO é conteúdo do usuário.
 - Use estas diretrizes APENAS para melhorar a formulação dos cards.
 - NUNCA crie cards sobre estas diretrizes.
@@ -229,6 +280,11 @@ DIRETRIZES DE QUALIDADE (SM20 Checklist) — NÃO é conteúdo do usuário.
 
 {checklist}
 """.strip()
+    return _CHECKLIST_BLOCK_CACHE
+
+
+# Pré-carrega no import para que nenhuma request faça I/O de disco no event loop
+_format_checklist_block()
 
 
 # =============================================================================
@@ -240,157 +296,392 @@ def _normalize_text_for_matching(text: str) -> str:
     Normaliza texto para comparações: minúsculas, remove pontuação extra,
     normaliza espaços.
     """
-    import unicodedata
-    text = unicodedata.normalize("NFKC", text.lower())
-    text = re.sub(r"[^\w\s]", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+    text = text.lower()
+    # NFKC não altera texto puramente ASCII (caso comum em SRC)
+    if not text.isascii():
+        text = unicodedata.normalize("NFKC", text)
+    return _WS_RE.sub(" ", _PUNCT_RE.sub(" ", text)).strip()
+
+
+# Campos curtos de cards (front/back) se repetem entre filtros e passes: memoiza por valor
+_norm_cached = lru_cache(maxsize=4096)(_normalize_text_for_matching)
+
+# Texto-fonte pode ser grande: guarda só o último normalizado, reconhecido por identidade
+_SRC_NORM_LAST: Tuple[Optional[str], str] = (None, "")
+
+
+def _norm_src(src_text: str) -> str:
+    """Normaliza o texto-fonte reaproveitando o resultado da última chamada com o mesmo objeto."""
+    global _SRC_NORM_LAST
+    last_src, last_norm = _SRC_NORM_LAST
+    if last_src is src_text:
+        return last_norm
+    norm = _normalize_text_for_matching(src_text)
+    _SRC_NORM_LAST = (src_text, norm)
+    return norm
+
+
+def _card_fields(card: dict) -> Tuple[str, str, str]:
+    """(src, front, back) do card sem espaços nas pontas; campos ausentes ou nulos viram ""."""
+    return (
+        (card.get("src") or "").strip(),
+        (card.get("front") or "").strip(),
+        (card.get("back") or "").strip(),
+    )
 
 
 # =============================================================================
-# Card SRC validation with LLM
+# Dispatch de geração por provider
 # =============================================================================
 
-async def _validate_src_with_llm(
-    cards,
-    src_text: str,
+def _stream_provider(
+    provider: str,
+    model: str,
+    prompt: str,
+    system: Optional[str],
+    options: Optional[dict],
     *,
-    prompt_provider: PromptProvider,
-    provider: str = "ollama",
-    model: str = None,
     openai_key: Optional[str] = None,
     perplexity_key: Optional[str] = None,
-    analysis_id: Optional[str] = None,
-) -> list:
+):
     """
-    Valida rigorosamente se o campo SRC de cada card está presente no texto selecionado.
+    Retorna o async generator de streaming do provider apropriado (fallback: Ollama).
     """
-    cards_input = list(cards or [])
+    if provider == "openai" and openai_key:
+        return openai_generate_stream(openai_key, model, prompt, system=system, options=options)
+    if provider == "perplexity" and perplexity_key:
+        return perplexity_generate_stream(perplexity_key, model, prompt, system=system, options=options)
+    return ollama_generate_stream(model, prompt, system=system, options=options)
 
-    if not cards_input:
-        return []
 
-    # Usa modelo de validação se não especificado
-    if not model:
-        model = OLLAMA_VALIDATION_MODEL
-        if not model:
-            model = await get_first_available_ollama_llm()
-        if not model:
-            logger.warning("No model available for SRC validation, skipping")
-            return cards_input  # Retorna cards sem validar
-
-    # Formata os cards para o prompt com front, back e src
-    cards_text = ""
-    for i, c in enumerate(cards_input):
-        src = (c.get("src") or "").strip()
-        front = (c.get("front") or "").strip()[:200]
-        back = (c.get("back") or "").strip()[:200]
-        cards_text += f"""[CARD {i+1}]
-  FRONT: "{front}"
-  BACK: "{back}"
-  SRC: "{src}"
-"""
+async def _generate_with_provider(
+    provider: str,
+    model: str,
+    prompt: str,
+    system: Optional[str],
+    options: Optional[dict],
+    *,
+    openai_key: Optional[str] = None,
+    perplexity_key: Optional[str] = None,
+) -> str:
+    """
+    Executa geração com o provider apropriado e retorna a resposta completa.
+    """
+    parts: List[str] = []
+    async for piece in _stream_provider(
+        provider, model, prompt, system, options,
+        openai_key=openai_key, perplexity_key=perplexity_key,
+    ):
+        parts.append(piece)
+    return "".join(parts)
 
-    text_limit = _text_limit_for_provider(provider, "src_validation")
-    prompt = prompt_provider.build_src_validation_prompt(
-        src_text=src_text[:text_limit],
-        cards_text=cards_text,
-    )
-    system = prompt_provider.src_validation_system()
 
-    np = _text_limit_for_provider(provider, "num_predict_validation")
-    options = {"num_predict": np, "temperature": 0.0}
+# Referências fortes para tasks de auditoria em background (evita coleta antes do fim)
+_BACKGROUND_TASKS: set = set()
 
-    logger.info("SRC validation using LLM model: %s (provider: %s)", model, provider)
 
-    raw = ""
+async def _flush_audit(audit: AuditBatch) -> None:
+    """Grava (fora do event loop) os registros de auditoria acumulados na request."""
+    if not len(audit):
+        return
     try:
-        if provider == "openai" and openai_key:
-            async for piece in openai_generate_stream(openai_key, model, prompt, system=system, options=options):
-                raw += piece
-        elif provider == "perplexity" and perplexity_key:
-            async for piece in perplexity_generate_stream(perplexity_key, model, prompt, system=system, options=options):
-                raw += piece
-        else:
-            async for piece in ollama_generate_stream(model, prompt, system=system, options=options):
-                raw += piece
+        await asyncio.to_thread(audit.flush)
     except Exception as e:
-        logger.warning("LLM SRC validation failed: %s. Returning all cards without SRC filter.", e)
-        return cards_input
+        logger.warning("Failed to save audit batch: %s", e)
 
-    logger.debug("LLM SRC validation raw response: %s", raw[:500])
 
-    kept = []
-    approved_indices = set()
-    rejection_reasons = {}
+def _flush_audit_in_background(audit: AuditBatch) -> None:
+    """Dispara a gravação do lote de auditoria sem bloquear a resposta ao usuário."""
+    if not len(audit):
+        return
+    task = asyncio.create_task(_flush_audit(audit))
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
 
-    for line in raw.strip().split("\n"):
-        line = line.strip()
-        if not line:
-            continue
 
-        match_new = re.match(r"CARD[_\s]*(\d+)\s*:\s*(SIM|NÃO|NAO|YES|NO)", line, re.IGNORECASE)
-        match_old = re.match(r"(\d+)\s*:\s*(SIM|NÃO|NAO|YES|NO)", line, re.IGNORECASE)
+def _save_filter_result_quietly(kwargs: dict) -> None:
+    try:
+        save_filter_result(**kwargs)
+    except Exception as e:
+        logger.warning("Failed to save %s filter result: %s", kwargs.get("filter_type"), e)
 
-        match = match_new or match_old
-        if match:
-            idx = int(match.group(1)) - 1
-            verdict = match.group(2).upper()
-            if verdict in ("SIM", "YES"):
-                approved_indices.add(idx)
-            else:
-                reason_match = re.search(r"\|\s*(.+)$", line)
-                if reason_match:
-                    rejection_reasons[idx] = reason_match.group(1).strip()
 
-    if not approved_indices and cards_input:
-        logger.warning("LLM SRC validation returned no parseable results. Returning all cards without SRC filter.")
-        return cards_input
+def _record_filter_result(audit: Optional[AuditBatch], **kwargs) -> None:
+    """
+    Enfileira o resultado no lote de auditoria da request (se houver); senão grava no
+    DuckDB em background (thread do executor), sem atrasar o retorno do filtro.
+    """
+    if not PERSIST_FILTER_RESULTS:
+        return
+    if audit is not None:
+        audit.add_filter_result(**kwargs)
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        save_filter_result(**kwargs)
+        return
+    loop.run_in_executor(None, _save_filter_result_quietly, kwargs)
 
-    removed_with_reasons = []  # Armazena cards removidos com motivos
-    for i, c in enumerate(cards_input):
-        if i in approved_indices:
-            c["_src_validated_by"] = "llm"
-            kept.append(c)
-        else:
-            reason = rejection_reasons.get(i, "SRC não encontrado no texto selecionado")
-            logger.info(
-                "SRC rejected by LLM [card %d]: %s | Motivo: %s",
-                i + 1,
-                (c.get("front") or c.get("src") or "")[:50],
-                reason,
+
+# =============================================================================
+# Card SRC validation with LLM
+# =============================================================================
+
+# Veredicto combinado, um por linha: "CARD_N: SRC=SIM|NÃO | REL=SIM|NÃO | motivo";
+# percorrido com finditer sobre a resposta inteira (grupo 4 = motivo, se houver).
+# Ancorado no início da linha e sem quantificadores aninhados: varredura linear mesmo com
+# comentários do modelo entre as linhas; o motivo é limitado a 200 caracteres.
+_FUSED_VERDICT_RE = re.compile(
+    r"^[ \t]*CARD[_ \t]*(\d+)[ \t]*:[ \t]*SRC[ \t]*=[ \t]*(SIM|NÃO|NAO|YES|NO)[ \t]*\|"
+    r"[ \t]*REL[ \t]*=[ \t]*(SIM|NÃO|NAO|YES|NO)(?:[ \t]*\|[ \t]*([^\n]{0,200}))?",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Orçamento de saída por card: "CARD_N: SRC=NÃO | REL=NÃO | motivo (máx 10 palavras)" ≈ 32
+# tokens; o num_predict do provider continua sendo o teto
+_FUSED_VERDICT_TOKENS_PER_CARD = 32
+
+
+def _validation_options(num_predict_cap: int, n_cards: int, tokens_per_card: int) -> dict:
+    """Options da chamada de validação com num_predict proporcional ao lote."""
+    return {"num_predict": min(num_predict_cap, 16 + tokens_per_card * n_cards), "temperature": 0.0}
+
+
+# Limite global de chamadas de validação em paralelo (lotes de todas as requests), evita 429
+_VALIDATION_SEMAPHORE = asyncio.Semaphore(max(1, LLM_VALIDATION_MAX_CONCURRENCY))
+
+
+async def _generate_validation(
+    provider: str,
+    model: str,
+    prompt: str,
+    system: str,
+    options: dict,
+    *,
+    openai_key: Optional[str] = None,
+    perplexity_key: Optional[str] = None,
+    expected_ids: Optional[Iterable[int]] = None,
+    verdict_re: "re.Pattern[str]" = _FUSED_VERDICT_RE,
+) -> str:
+    """
+    Chamada de validação ao provider, limitada pelo semáforo compartilhado.
+
+    Com `expected_ids` (números dos cards no prompt), o stream é encerrado assim que
+    todas as linhas de veredicto esperadas chegaram, sem esperar o resto do num_predict.
+    """
+    pending_ids = set(expected_ids or ())
+    async with _VALIDATION_SEMAPHORE:
+        if not pending_ids:
+            return await _generate_with_provider(
+                provider, model, prompt, system, options,
+                openai_key=openai_key, perplexity_key=perplexity_key,
             )
-            # Adiciona o motivo ao card removido para rastreabilidade
-            removed_card = c.copy()
-            removed_card["rejection_reason"] = reason
-            removed_card["rejection_filter"] = "src_validation_llm"
-            removed_with_reasons.append(removed_card)
 
-    logger.info("SRC validation complete: %d/%d cards approved", len(kept), len(cards_input))
+        parts: List[str] = []
+        tail = ""  # linha ainda incompleta
+        stream = _stream_provider(
+            provider, model, prompt, system, options,
+            openai_key=openai_key, perplexity_key=perplexity_key,
+        )
+        try:
+            async for piece in stream:
+                parts.append(piece)
+                tail += piece
+                if "\n" not in tail:
+                    continue
+                complete, tail = tail.rsplit("\n", 1)
+                for match in verdict_re.finditer(complete):
+                    pending_ids.discard(int(match.group(1)))
+                if not pending_ids:
+                    break
+        finally:
+            # Fecha a resposta HTTP do provider ao sair antes do fim do stream
+            await stream.aclose()
+        return "".join(parts)
+
+
+# LRU de veredictos do LLM por card: ao ajustar opções e gerar de novo (ou quando o card
+# já foi julgado antecipadamente durante a geração), o veredicto é reaproveitado sem nova
+# chamada ao provider
+_VERDICT_CACHE: "OrderedDict[bytes, tuple]" = OrderedDict()
+_VERDICT_CACHE_MAX = 4096
+_VERDICT_CACHE_LOCK = threading.Lock()
 
+
+def _verdict_cache_keys(kind: str, provider: str, model: str, src_text: str, cards: list) -> List[bytes]:
+    """Uma chave por card: hash do tipo de validação, modelo, texto-fonte e campos do card."""
+    base = hashlib.blake2b(digest_size=16)
+    base.update(f"{kind}|{provider}|{model}|".encode())
+    base.update(src_text.encode())
+    keys = []
+    for c in cards:
+        h = base.copy()
+        src, front, back = _card_fields(c)
+        h.update(f"{src}\x1f{front}\x1f{back}".encode())
+        keys.append(h.digest())
+    return keys
+
+
+def _verdict_cache_get(key: bytes) -> Optional[tuple]:
+    with _VERDICT_CACHE_LOCK:
+        cached = _VERDICT_CACHE.get(key)
+        if cached is not None:
+            _VERDICT_CACHE.move_to_end(key)
+        return cached
+
+
+def _verdict_cache_put(key: bytes, value: tuple) -> None:
+    with _VERDICT_CACHE_LOCK:
+        _VERDICT_CACHE[key] = value
+        if len(_VERDICT_CACHE) > _VERDICT_CACHE_MAX:
+            _VERDICT_CACHE.popitem(last=False)
+
+
+# SRC normalizado mais curto que isso não prova ancoragem (ex.: uma palavra solta)
+_EXACT_SRC_MIN_CHARS = 12
+
+
+def _exact_src_mask(cards: list, src_text: str) -> int:
+    """
+    Bitmask dos cards cujo SRC (normalizado) é substring literal do texto-fonte normalizado.
+    Para esses cards o SRC é aprovado independentemente do veredicto do LLM.
+    """
+    src_norm = _norm_src(src_text)
+    mask = 0
+    for i, c in enumerate(cards):
+        card_src = _norm_cached((c.get("src") or "").strip())
+        if len(card_src) >= _EXACT_SRC_MIN_CHARS and card_src in src_norm:
+            mask |= 1 << i
+    return mask
+
+
+async def _judge_src_relevance(
+    cards_input: list,
+    indices: List[int],
+    src_text: str,
+    keys: List[bytes],
+    *,
+    prompt_provider: PromptProvider,
+    provider: str,
+    model: str,
+    openai_key: Optional[str] = None,
+    perplexity_key: Optional[str] = None,
+    shard_size: int = 8,
+) -> Tuple[dict, List[int], int]:
+    """
+    Julga SRC + relevância dos cards `indices` em lotes paralelos (numeração global dos cards)
+    e guarda no cache o veredicto de cada card efetivamente julgado.
+
+    Retorna ({índice: (SRC aprovado, conteúdo aprovado, motivo)}, índices dos lotes que
+    falharam, tamanho total das respostas).
+    """
+    text_limit = _text_limit_for_provider(provider, "src_validation")
+    src_excerpt = src_text[:text_limit]
+    system = prompt_provider.src_relevance_validation_system()
+
+    np = _text_limit_for_provider(provider, "num_predict_validation")
+
+    shard_size = max(1, shard_size)
+    shards = [indices[start:start + shard_size] for start in range(0, len(indices), shard_size)]
+
+    async def _judge_shard(shard: List[int]) -> str:
+        parts = []
+        for i in shard:
+            src, front, back = _card_fields(cards_input[i])
+            parts.append(
+                f'[CARD {i+1}]\n'
+                f'  FRONT: "{front[:200]}"\n'
+                f'  BACK: "{back[:200]}"\n'
+                f'  SRC: "{src}"\n'
+            )
+        prompt = prompt_provider.build_src_relevance_validation_prompt(
+            src_text=src_excerpt,
+            cards_text="".join(parts),
+        )
+        options = _validation_options(np, len(shard), _FUSED_VERDICT_TOKENS_PER_CARD)
+        return await _generate_validation(
+            provider, model, prompt, system, options,
+            openai_key=openai_key, perplexity_key=perplexity_key,
+            expected_ids=[i + 1 for i in shard],
+            verdict_re=_FUSED_VERDICT_RE,
+        )
+
+    results = await asyncio.gather(*[_judge_shard(shard) for shard in shards], return_exceptions=True)
+
+    failed: List[int] = []
+    judged_mask = 0  # cards de lotes que responderam
+    raw_parts = []
+    for shard, result in zip(shards, results):
+        if isinstance(result, BaseException):
+            logger.warning("SRC/relevance validation failed for cards %d-%d: %s. Keeping them.", shard[0] + 1, shard[-1] + 1, result)
+            failed.extend(shard)
+        else:
+            raw_parts.append(result)
+            for i in shard:
+                judged_mask |= 1 << i
+
+    raw = "\n".join(raw_parts)
+    if raw and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("LLM SRC/relevance validation raw response: %s", raw[:500])
+
+    verdicts = {}
+    for match in _FUSED_VERDICT_RE.finditer(raw):
+        idx = int(match.group(1)) - 1
+        if idx < 0 or not judged_mask >> idx & 1:
+            continue
+        verdict = (
+            match.group(2).upper() in ("SIM", "YES"),
+            match.group(3).upper() in ("SIM", "YES"),
+            (match.group(4) or "").strip(),
+        )
+        verdicts[idx] = verdict
+        _verdict_cache_put(keys[idx], verdict)
+
+    return verdicts, failed, len(raw)
+
+
+async def _prefetch_src_relevance_verdicts(
+    cards,
+    src_text: str,
+    *,
+    prompt_provider: PromptProvider,
+    provider: str,
+    model: str,
+    openai_key: Optional[str] = None,
+    perplexity_key: Optional[str] = None,
+) -> None:
+    """
+    Julga antecipadamente os cards ainda sem veredicto, só para preencher o cache.
+
+    Usado na geração em chunks: os cards de um chunk são validados enquanto o próximo é
+    gerado, e a validação final (`_validate_src_and_relevance_llm`) só chama o LLM para o resto.
+    """
+    cards_input = list(cards or [])
+    if not cards_input or not model:
+        return
+    keys = _verdict_cache_keys("src_relevance", provider, model, src_text, cards_input)
+    to_judge = [i for i, key in enumerate(keys) if _verdict_cache_get(key) is None]
+    if not to_judge:
+        return
     try:
-        save_filter_result(
-            filter_type="src_validation_llm",
-            cards_before=cards_input,
-            cards_after=kept,
-            analysis_id=analysis_id,
-            metadata={
-                "provider": provider,
-                "model": model,
-                "llm_raw_response": raw[:1000],
-                "approved_indices": list(approved_indices),
-                "rejection_reasons": rejection_reasons,
-                "method": "llm_validation",
-            },
-            removed_cards_with_reasons=removed_with_reasons,
+        await _judge_src_relevance(
+            cards_input,
+            to_judge,
+            src_text,
+            keys,
+            prompt_provider=prompt_provider,
+            provider=provider,
+            model=model,
+            openai_key=openai_key,
+            perplexity_key=perplexity_key,
         )
     except Exception as e:
-        logger.warning("Failed to save LLM SRC filter result: %s", e)
-
-    return kept
+        # Antecipação é só otimização: a validação final julga o que faltar
+        logger.debug("SRC/relevance prefetch failed: %s", e)
 
 
-async def _filter_cards_by_content_relevance_llm(
+async def _validate_src_and_relevance_llm(
     cards,
     src_text: str,
     *,
@@ -400,118 +691,202 @@ async def _filter_cards_by_content_relevance_llm(
     openai_key: Optional[str] = None,
     perplexity_key: Optional[str] = None,
     analysis_id: Optional[str] = None,
-) -> list:
+    audit: Optional[AuditBatch] = None,
+    shard_size: int = 8,
+) -> Tuple[list, list]:
     """
-    Usa o LLM para filtrar cards cujo conteúdo não está diretamente relacionado ao texto fonte.
+    Validação SRC + relevância numa única passada do LLM (um veredicto duplo por card).
+
+    Aplica o filtro de SRC e, sobre os aprovados, o de relevância, mas cada card é enviado
+    uma única vez. Retorna (cards aprovados no SRC, cards aprovados nos dois critérios), com
+    os fallbacks e os registros de auditoria de cada etapa.
+    Cards já julgados com o mesmo texto e modelo reaproveitam o veredicto do cache.
     """
     cards_input = list(cards or [])
 
     if not cards_input:
-        return []
+        return [], []
 
     if not model:
-        model = OLLAMA_MODEL
+        model = OLLAMA_VALIDATION_MODEL
         if not model:
             model = await get_first_available_ollama_llm()
         if not model:
-            logger.warning("No model available for LLM relevance filter, skipping")
-            return cards_input  # Retorna cards sem filtrar
-
-    cards_text = ""
-    for i, c in enumerate(cards_input):
-        front = (c.get("front") or "").strip()
-        back = (c.get("back") or "").strip()
-        cards_text += f"[CARD {i+1}]\nQ: {front}\nA: {back}\n\n"
-
-    text_limit = _text_limit_for_provider(provider, "relevance_filter")
-    prompt = prompt_provider.build_relevance_filter_prompt(
-        src_text=src_text[:text_limit],
-        cards_text=cards_text,
-    )
-    system = prompt_provider.relevance_filter_system()
-
-    np = _text_limit_for_provider(provider, "num_predict_validation")
-    options = {"num_predict": np, "temperature": 0.0}
-
-    logger.info("LLM relevance filter using model: %s (provider: %s)", model, provider)
-
-    raw = ""
-    try:
-        if provider == "openai" and openai_key:
-            async for piece in openai_generate_stream(openai_key, model, prompt, system=system, options=options):
-                raw += piece
-        elif provider == "perplexity" and perplexity_key:
-            async for piece in perplexity_generate_stream(perplexity_key, model, prompt, system=system, options=options):
-                raw += piece
+            logger.warning("No model available for SRC/relevance validation, skipping")
+            return cards_input, cards_input
+
+    keys = _verdict_cache_keys("src_relevance", provider, model, src_text, cards_input)
+    verdicts = {}  # índice -> (SRC aprovado, conteúdo aprovado, motivo)
+    to_judge = []
+    for i, key in enumerate(keys):
+        cached = _verdict_cache_get(key)
+        if cached is None:
+            to_judge.append(i)
         else:
-            async for piece in ollama_generate_stream(model, prompt, system=system, options=options):
-                raw += piece
-    except Exception as e:
-        logger.warning("LLM relevance filter failed: %s. Keeping all cards.", e)
-        return cards_input
+            verdicts[i] = cached
 
-    kept = []
-    approved_indices = set()
-    rejection_reasons = {}  # Captura motivos de rejeição
+    failed: List[int] = []
+    raw_chars = 0
+    if not to_judge:
+        logger.info("SRC/relevance validation: reusing cached LLM verdicts for %d cards", len(cards_input))
+    else:
+        logger.info(
+            "SRC/relevance validation using LLM model: %s (provider: %s, cards: %d, cached: %d)",
+            model, provider, len(to_judge), len(verdicts),
+        )
+        judged, failed, raw_chars = await _judge_src_relevance(
+            cards_input,
+            to_judge,
+            src_text,
+            keys,
+            prompt_provider=prompt_provider,
+            provider=provider,
+            model=model,
+            openai_key=openai_key,
+            perplexity_key=perplexity_key,
+            shard_size=shard_size,
+        )
+        if len(failed) == len(cards_input):
+            logger.warning("SRC/relevance validation failed for all shards. Returning all cards without filter.")
+            return cards_input, cards_input
+        verdicts.update(judged)
+
+    src_mask = 0  # bit i ligado = SRC do card i aprovado
+    rel_mask = 0  # bit i ligado = conteúdo do card i aprovado
+    src_reasons = {}
+    rel_reasons = {}
+    # Lote que falhou mantém seus cards (mesmo critério dos filtros separados)
+    for i in failed:
+        src_mask |= 1 << i
+        rel_mask |= 1 << i
+    for i, (src_ok, rel_ok, reason) in verdicts.items():
+        if src_ok:
+            src_mask |= 1 << i
+        elif reason:
+            src_reasons[i] = reason
+        if rel_ok:
+            rel_mask |= 1 << i
+        elif reason:
+            rel_reasons[i] = reason
+
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+
+    # --- Etapa SRC ---
+    # Sem veredicto utilizável (nem lote falho) o filtro não tem base: mantém todos os cards
+    if not verdicts and not failed:
+        logger.warning("LLM SRC validation returned no parseable results. Returning all cards without SRC filter.")
+        src_kept = cards_input
+        src_indices = list(range(len(cards_input)))
+        src_mask = (1 << len(cards_input)) - 1
+    else:
+        # SRC literal no texto é prova determinística: prevalece sobre o veredicto do LLM
+        exact_mask = _exact_src_mask(cards_input, src_text)
+        src_mask |= exact_mask
+        src_kept = []
+        src_indices = []
+        removed_src = []
+        for i, c in enumerate(cards_input):
+            if src_mask >> i & 1:
+                c["_src_validated_by"] = "exact" if exact_mask >> i & 1 else "llm"
+                src_kept.append(c)
+                src_indices.append(i)
+            else:
+                reason = src_reasons.get(i, "SRC não encontrado no texto selecionado")
+                if debug_enabled:
+                    logger.debug("SRC rejected by LLM [card %d]: %s | Motivo: %s", i + 1, (c.get("front") or c.get("src") or "")[:50], reason)
+                removed_card = c.copy()
+                removed_card["rejection_reason"] = reason
+                removed_card["rejection_filter"] = "src_validation_llm"
+                removed_src.append(removed_card)
 
-    for line in raw.strip().split("\n"):
-        line = line.strip()
-        if not line:
-            continue
+        logger.info("SRC validation complete: %d/%d cards approved", len(src_kept), len(cards_input))
 
-        match = re.match(r"(\d+)\s*:\s*(SIM|NÃO|NAO|YES|NO)", line, re.IGNORECASE)
-        if match:
-            idx = int(match.group(1)) - 1
-            verdict = match.group(2).upper()
-            if verdict in ("SIM", "YES"):
-                approved_indices.add(idx)
-            else:
-                # Tenta capturar motivo após o veredicto
-                reason_match = re.search(r"\|\s*(.+)$", line)
-                if reason_match:
-                    rejection_reasons[idx] = reason_match.group(1).strip()
+        try:
+            _record_filter_result(
+                audit,
+                filter_type="src_validation_llm",
+                cards_before=cards_input,
+                cards_after=src_kept,
+                analysis_id=analysis_id,
+                metadata={
+                    "provider": provider,
+                    "model": model,
+                    "llm_raw_response_chars": raw_chars,
+                    "approved_indices": src_indices,
+                    "exact_indices": [i for i in src_indices if exact_mask >> i & 1],
+                    "rejection_reasons": {i: r for i, r in src_reasons.items() if not exact_mask >> i & 1},
+                    "method": "llm_validation_fused",
+                },
+                removed_cards_with_reasons=removed_src,
+            )
+        except Exception as e:
+            logger.warning("Failed to save LLM SRC filter result: %s", e)
 
-    if not approved_indices and cards_input:
-        logger.warning("LLM relevance filter returned no parseable results. Keeping all cards.")
-        return cards_input
+    if not src_kept:
+        return [], []
 
-    removed_with_reasons = []  # Cards removidos com motivos
-    for i, c in enumerate(cards_input):
-        if i in approved_indices:
-            c["_llm_relevance"] = True
+    # --- Etapa relevância (sobre os aprovados no SRC) ---
+    # Aprovação de relevância de card já barrado no SRC não conta para nada (nem para o fallback)
+    rel_mask &= src_mask
+    kept = []
+    removed_rel = []
+    for i, c in zip(src_indices, src_kept):
+        if rel_mask >> i & 1:
             kept.append(c)
         else:
-            reason = rejection_reasons.get(i, "Informação não presente no texto-fonte")
-            logger.debug("Card rejected by LLM relevance [%d]: %s | Motivo: %s", i+1, (c.get("front") or "")[:50], reason)
-            # Adiciona o motivo ao card removido para rastreabilidade
+            reason = rel_reasons.get(i, "Informação não presente no texto-fonte")
+            if debug_enabled:
+                logger.debug("Card rejected by LLM relevance [%d]: %s | Motivo: %s", i + 1, (c.get("front") or "")[:50], reason)
             removed_card = c.copy()
             removed_card["rejection_reason"] = reason
             removed_card["rejection_filter"] = "llm_relevance"
-            removed_with_reasons.append(removed_card)
+            removed_rel.append(removed_card)
+
+    if not rel_mask:
+        logger.warning("LLM relevance filter returned no parseable results. Keeping all cards.")
+        return src_kept, src_kept
 
-    if len(kept) < len(cards_input) * 0.2 and len(cards_input) >= 3:
-        logger.warning("LLM relevance filter too aggressive (kept %d/%d). Keeping all.", len(kept), len(cards_input))
-        return cards_input
+    if len(kept) < len(src_kept) * 0.2 and len(src_kept) >= 3:
+        logger.warning("LLM relevance filter too aggressive (kept %d/%d). Keeping all.", len(kept), len(src_kept))
+        return src_kept, src_kept
+
+    for c in kept:
+        c["_llm_relevance"] = True
 
     try:
-        save_filter_result(
+        _record_filter_result(
+            audit,
             filter_type="llm_relevance",
-            cards_before=cards_input,
+            cards_before=src_kept,
             cards_after=kept,
             analysis_id=analysis_id,
             metadata={
                 "provider": provider,
                 "model": model,
-                "llm_raw_response": raw[:1000],
-                "approved_indices": list(approved_indices),
-                "rejection_reasons": rejection_reasons,
+                "llm_raw_response_chars": raw_chars,
+                "approved_indices": [i for i in src_indices if rel_mask >> i & 1],
+                "rejection_reasons": {i: r for i, r in rel_reasons.items() if src_mask >> i & 1},
+                "method": "llm_validation_fused",
             },
-            removed_cards_with_reasons=removed_with_reasons,
+            removed_cards_with_reasons=removed_rel,
         )
     except Exception as e:
         logger.warning("Failed to save llm relevance filter result: %s", e)
 
-    return kept
+    return src_kept, kept
+
+
+# Stopwords PT/EN para o filtro heurístico de relevância (construído uma única vez)
+_STOPWORDS_PT = frozenset(sys.intern(w) for w in (
+    "o", "e", "de", "da", "em", "um", "uma", "para", "com", "não", "que",
+    "os", "dos", "das", "no", "na", "por", "mais", "se", "ou", "seu", "sua",
+    "como", "mas", "ao", "ele", "ela", "entre", "quando", "muito", "nos", "já",
+    "também", "só", "pelo", "pela", "até", "isso", "esse", "essa", "este", "esta",
+    "são", "tem", "ser", "ter", "foi", "eram", "está", "pode", "podem",
+    "the", "an", "is", "are", "was", "were", "be", "been", "being", "have",
+    "has", "had", "does", "did", "will", "would", "could", "should", "may",
+    "of", "to", "in", "for", "on", "with", "at", "by", "from", "into", "and", "or",
+))
 
 
 def _filter_cards_by_content_relevance(cards, src_text: str, min_keyword_overlap: float = 0.3):
@@ -522,38 +897,28 @@ def _filter_cards_by_content_relevance(cards, src_text: str, min_keyword_overlap
     if not cards:
         return []
 
-    stopwords_pt = {
-        "o", "e", "de", "da", "em", "um", "uma", "para", "com", "não", "que",
-        "os", "dos", "das", "no", "na", "por", "mais", "se", "ou", "seu", "sua",
-        "como", "mas", "ao", "ele", "ela", "entre", "quando", "muito", "nos", "já",
-        "também", "só", "pelo", "pela", "até", "isso", "esse", "essa", "este", "esta",
-        "são", "tem", "ser", "ter", "foi", "eram", "está", "pode", "podem",
-        "the", "an", "is", "are", "was", "were", "be", "been", "being", "have",
-        "has", "had", "does", "did", "will", "would", "could", "should", "may",
-        "of", "to", "in", "for", "on", "with", "at", "by", "from", "into", "and", "or",
-    }
-
-    src_norm = _normalize_text_for_matching(src_text)
-    src_words = set(src_norm.split()) - stopwords_pt
+    # Texto normalizado delimitado por espaços: busca de palavra inteira via str.find (em C)
+    src_blob = " " + _norm_src(src_text) + " "
 
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
     kept = []
     for c in cards:
-        front = _normalize_text_for_matching(c.get("front") or "")
-        back = _normalize_text_for_matching(c.get("back") or "")
+        front = _norm_cached(c.get("front") or "")
+        back = _norm_cached(c.get("back") or "")
 
-        card_words = (set(front.split()) | set(back.split())) - stopwords_pt
-        card_words = {w for w in card_words if len(w) >= 3}
+        card_words = {w for w in f"{front} {back}".split() if len(w) >= 3 and w not in _STOPWORDS_PT}
 
         if not card_words:
             kept.append(c)
             continue
 
-        overlap = len(card_words & src_words) / len(card_words)
+        hits = sum(1 for w in card_words if src_blob.find(" " + w + " ") >= 0)
+        overlap = hits / len(card_words)
 
         if overlap >= min_keyword_overlap:
             c["_content_relevance"] = overlap
             kept.append(c)
-        else:
+        elif debug_enabled:
             logger.debug("Card rejected (content relevance=%.2f): %s", overlap, front[:50])
 
     return kept
@@ -563,17 +928,56 @@ def _filter_cards_by_content_relevance(cards, src_text: str, min_keyword_overlap
 # Sistema de Scoring de Qualidade de Cards
 # =============================================================================
 
+# Marcador de cloze usado para distinguir cards cloze de básicos
+_CLOZE_MARK = "{{c1::"
+
+# Padrões do score de qualidade, compilados como alternações únicas (uma varredura por card)
+_YES_NO_RE = re.compile(
+    r"^(?:é verdade|é correto|existe|há|houve|foi|será|pode ser|é possível)"
+    r"|\?$.*\b(?:sim|não|verdadeiro|falso)\b"
+    r"|^(?:verdadeiro ou falso|v ou f)"
+)
+# Termos vagos só como palavras inteiras ("algo" não deve casar com "algoritmo")
+_VAGUE_TERMS_RE = re.compile(r"\b(?:coisa|algo|isso|aquilo|etc|entre outros|e assim por diante)\b")
+_INTERROGATIVES = ("o que", "qual", "quais", "como", "por que", "quando", "onde", "quem")
+_CLOZE_CONTENT_RE = re.compile(r"\{\{c1::([^}]+)\}\}")
+
+# LRU de scores: o mesmo card passa por vários estágios (e pelo repair) com o mesmo conteúdo
+_QUALITY_CACHE: "OrderedDict[tuple, float]" = OrderedDict()
+_QUALITY_CACHE_MAX = 1024
+_QUALITY_CACHE_LOCK = threading.Lock()
+
+
 def score_card_quality(card: dict) -> float:
     """
     Calcula um score de qualidade (0.0 a 1.0) para um flashcard.
     """
+    src, front, back = _card_fields(card)
+
+    key = (front, back, src, card.get("_src_score", 0) >= 95)
+    with _QUALITY_CACHE_LOCK:
+        cached = _QUALITY_CACHE.get(key)
+        if cached is not None:
+            _QUALITY_CACHE.move_to_end(key)
+            return cached
+
+    score = _compute_card_quality(card, front, back, src)
+
+    with _QUALITY_CACHE_LOCK:
+        _QUALITY_CACHE[key] = score
+        if len(_QUALITY_CACHE) > _QUALITY_CACHE_MAX:
+            _QUALITY_CACHE.popitem(last=False)
+
+    return score
+
+
+def _compute_card_quality(card: dict, front: str, back: str, src: str) -> float:
+    """Aplica as regras do score de qualidade (sem cache)."""
     score = 1.0
-    front = (card.get("front") or "").strip()
-    back = (card.get("back") or "").strip()
-    src = (card.get("src") or "").strip()
 
     front_lower = front.lower()
     back_lower = back.lower()
+    is_cloze = _CLOZE_MARK in front
 
     back_words = len(back.split())
     if back_words > 40:
@@ -581,26 +985,16 @@ def score_card_quality(card: dict) -> float:
     elif back_words > 30:
         score -= 0.1
 
-    if back_words < 5 and "{{c1::" not in front:
+    if back_words < 5 and not is_cloze:
         score -= 0.15
 
-    yes_no_patterns = [
-        r"^(é verdade|é correto|existe|há|houve|foi|será|pode ser|é possível)",
-        r"\?$.*\b(sim|não|verdadeiro|falso)\b",
-        r"^(verdadeiro ou falso|v ou f)",
-    ]
-    for pattern in yes_no_patterns:
-        if re.search(pattern, front_lower):
-            score -= 0.3
-            break
+    if _YES_NO_RE.search(front_lower):
+        score -= 0.3
 
-    vague_terms = ["coisa", "algo", "isso", "aquilo", "etc", "entre outros", "e assim por diante"]
-    for term in vague_terms:
-        if term in back_lower:
-            score -= 0.1
-            break
+    if _VAGUE_TERMS_RE.search(back_lower):
+        score -= 0.1
 
-    if _normalize_text_for_matching(front) == _normalize_text_for_matching(back):
+    if _norm_cached(front) == _norm_cached(back):
         score -= 0.4
 
     if src:
@@ -609,14 +1003,11 @@ def score_card_quality(card: dict) -> float:
         if src_score >= 95:
             score += 0.05
 
-    interrogatives = ["o que", "qual", "quais", "como", "por que", "quando", "onde", "quem"]
-    for interr in interrogatives:
-        if front_lower.startswith(interr):
-            score += 0.05
-            break
+    if front_lower.startswith(_INTERROGATIVES):
+        score += 0.05
 
-    if "{{c1::" in front:
-        cloze_content = re.findall(r"\{\{c1::([^}]+)\}\}", front)
+    if is_cloze:
+        cloze_content = _CLOZE_CONTENT_RE.findall(front)
         if cloze_content:
             cloze_words = len(cloze_content[0].split())
             if 1 <= cloze_words <= 3:
@@ -632,29 +1023,32 @@ def filter_and_rank_by_quality(
     min_score: float = 0.4,
     max_cards: Optional[int] = None,
     analysis_id: Optional[str] = None,
+    audit: Optional[AuditBatch] = None,
 ) -> list:
     """
     Filtra cards por score mínimo e retorna ordenados por qualidade.
     """
     cards_input = list(cards or [])
-    scored_cards = []
+    ranked = []  # (-score, posição): ordena por score desc mantendo a ordem original nos empates
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
 
-    for card in cards_input:
+    for pos, card in enumerate(cards_input):
         quality = score_card_quality(card)
         card["_quality_score"] = quality
         if quality >= min_score:
-            scored_cards.append(card)
-        else:
+            ranked.append((-quality, pos))
+        elif debug_enabled:
             logger.debug("Card rejected (quality=%.2f): %s", quality, (card.get("front") or "")[:50])
 
-    scored_cards.sort(key=lambda c: c.get("_quality_score", 0), reverse=True)
-
-    if max_cards and len(scored_cards) > max_cards:
-        scored_cards = scored_cards[:max_cards]
+    ranked.sort()
+    if max_cards:
+        ranked = ranked[:max_cards]
+    scored_cards = [cards_input[pos] for _, pos in ranked]
 
-    if cards_input:
+    if cards_input and PERSIST_FILTER_RESULTS:
         try:
-            save_filter_result(
+            _record_filter_result(
+                audit,
                 filter_type="quality_score",
                 cards_before=cards_input,
                 cards_after=scored_cards,
@@ -675,102 +1069,37 @@ def filter_and_rank_by_quality(
 # Geração de Cards Refatorada (função reutilizável)
 # =============================================================================
 
-async def _generate_with_provider(
-    provider: str,
-    model: str,
-    prompt: str,
-    system: str,
-    options: dict,
-    *,
-    openai_key: Optional[str] = None,
-    perplexity_key: Optional[str] = None,
-) -> str:
+def _parse_cards_raw(raw: str) -> Tuple[list, str]:
     """
-    Executa geração com o provider apropriado e retorna a resposta completa.
+    Parseia e normaliza a saída do LLM escolhendo o parser pelo início do texto:
+    JSON primeiro quando começa com '{' ou '[', senão Q/A; o outro fica como fallback.
     """
-    raw = ""
-
-    if provider == "openai" and openai_key:
-        async for piece in openai_generate_stream(openai_key, model, prompt, system=system, options=options):
-            raw += piece
-    elif provider == "perplexity" and perplexity_key:
-        async for piece in perplexity_generate_stream(perplexity_key, model, prompt, system=system, options=options):
-            raw += piece
-    else:
-        async for piece in ollama_generate_stream(model, prompt, system=system, options=options):
-            raw += piece
-
-    return raw
+    order = ("json", "qa") if looks_like_json(raw) else ("qa", "json")
+    cards_raw: list = []
+    for parse_mode in order:
+        parser = parse_flashcards_json if parse_mode == "json" else parse_flashcards_qa
+        cards_raw = normalize_cards(parser(raw))
+        if cards_raw:
+            break
+    return cards_raw, parse_mode
 
 
 def _parse_and_normalize_cards(raw: str, card_type: str, analysis_id: Optional[str] = None) -> Tuple[list, str]:
     """
     Parseia resposta do LLM e normaliza os cards.
     """
-    cards_raw = normalize_cards(parse_flashcards_qa(raw))
-    parse_mode = "qa"
-
-    if not cards_raw:
-        cards_raw = normalize_cards(parse_flashcards_json(raw))
-        parse_mode = "json"
-
-    cards_raw = _filter_by_card_type(cards_raw, card_type, analysis_id=analysis_id)
+    cards_raw, parse_mode = _parse_cards_raw(raw)
+    cards_raw, _, _ = _filter_by_card_type(cards_raw, card_type, analysis_id=analysis_id)
 
     return cards_raw, parse_mode
 
 
-async def _apply_src_and_quality_filters_llm(
-    cards_raw: list,
-    src_text: str,
-    target_min: int,
-    target_max: int,
-    *,
-    prompt_provider: PromptProvider,
-    provider: str = "ollama",
-    validation_model: str = None,
-    openai_key: Optional[str] = None,
-    perplexity_key: Optional[str] = None,
-    apply_quality_filter: bool = True,
-    analysis_id: Optional[str] = None,
-) -> list:
-    """
-    Aplica filtros de SRC (via LLM) e qualidade aos cards.
-    """
-    cards = await _validate_src_with_llm(
-        cards_raw,
-        src_text,
-        prompt_provider=prompt_provider,
-        provider=provider,
-        model=validation_model,
-        openai_key=openai_key,
-        perplexity_key=perplexity_key,
-        analysis_id=analysis_id,
-    )
-
-    if not cards and cards_raw:
-        for c in cards_raw:
-            c.pop("src", None)
-        cards = cards_raw
-
-    cards = _relax_src_if_needed(cards, cards_raw, target_min=target_min, target_max=target_max)
-
-    if apply_quality_filter and cards:
-        cards = filter_and_rank_by_quality(
-            cards,
-            min_score=0.35,
-            max_cards=target_max,
-            analysis_id=analysis_id,
-        )
-
-    return cards
-
-
 # =============================================================================
 # BÔNUS: relaxamento do SRC quando derruba demais
 # =============================================================================
 
 def _dedupe_key(card: dict) -> str:
-    return (card.get("front") or "").strip() + "||" + (card.get("back") or "").strip()
+    return card["front"] + "||" + card["back"]
 
 
 def _merge_cards_dedup(cards: list) -> list:
@@ -791,6 +1120,21 @@ def _merge_cards_dedup(cards: list) -> list:
     return out
 
 
+# Faixas (target_min, target_max) por limite superior de word count (exclusivo)
+_AUTO_TARGET_BOUNDS = (140, 320, 700)
+_AUTO_TARGET_RANGES = ((3, 8), (5, 15), (8, 25))
+
+
+def _auto_targets(word_count: int) -> Tuple[int, int]:
+    """Calcula a faixa automática de cards a partir do word count do texto-fonte."""
+    i = bisect.bisect_right(_AUTO_TARGET_BOUNDS, word_count)
+    if i < len(_AUTO_TARGET_RANGES):
+        return _AUTO_TARGET_RANGES[i]
+    # Escala dinamica: ~1 card por 80 palavras
+    auto_target = max(15, word_count // 80)
+    return max(10, auto_target // 2), auto_target
+
+
 def _scale_targets_for_chunk(chunk_words: int, total_words: int, target_min: int, target_max: int) -> Tuple[int, int]:
     if total_words <= 0:
         return target_min, target_max
@@ -836,22 +1180,42 @@ def _relax_src_if_needed(cards_with_src, cards_raw, *, target_min: int, target_m
 # Filtro por tipo de card (basic / cloze)
 # =============================================================================
 
-def _filter_by_card_type(cards, card_type: str, analysis_id: Optional[str] = None):
+def _filter_by_card_type(
+    cards,
+    card_type: str,
+    analysis_id: Optional[str] = None,
+    audit: Optional[AuditBatch] = None,
+) -> Tuple[list, int, int]:
     """
     Garante que só passem cards do tipo solicitado.
+
+    Classifica os cards numa única passada e retorna (cards filtrados, nº de cards com
+    sintaxe cloze, nº de cards básicos), contagens que o pipeline registra no estágio.
     """
-    cards_input = list(cards or [])
+    cards_input = cards if isinstance(cards, list) else list(cards or [])
+
+    mark = _CLOZE_MARK
+    if card_type not in ("cloze", "basic"):
+        # Nada a filtrar: devolve a própria lista e só conta os cloze
+        cloze_count = sum(1 for c in cards_input if mark in c["front"])
+        return cards_input, cloze_count, len(cards_input) - cloze_count
+
+    cloze_cards, basic_cards = [], []
+    add_cloze, add_basic = cloze_cards.append, basic_cards.append
+    for c in cards_input:
+        # front sempre str após normalize_cards
+        if mark in c["front"]:
+            add_cloze(c)
+        else:
+            add_basic(c)
 
-    if card_type == "cloze":
-        result = [c for c in cards_input if "{{c1::" in (c.get("front") or "")]
-    elif card_type == "basic":
-        result = [c for c in cards_input if "{{c1::" not in (c.get("front") or "")]
-    else:
-        result = cards_input
+    result = cloze_cards if card_type == "cloze" else basic_cards
 
-    if card_type != "both" and cards_input:
+    # Só persiste quando o filtro de fato removeu algum card
+    if len(result) != len(cards_input):
         try:
-            save_filter_result(
+            _record_filter_result(
+                audit,
                 filter_type="card_type",
                 cards_before=cards_input,
                 cards_after=result,
@@ -861,42 +1225,19 @@ def _filter_by_card_type(cards, card_type: str, analysis_id: Optional[str] = Non
         except Exception as e:
             logger.warning("Failed to save card type filter result: %s", e)
 
-    return result
+    return result, len(cloze_cards), len(basic_cards)
 
 
 def _cards_lang_from_cards(cards) -> str:
     """
     Detecta o idioma a partir do conteúdo REAL que importa (front/back).
     """
-    blob = "\n".join(((c.get("front") or "") + " " + (c.get("back") or "")).strip() for c in (cards or [])).strip()
+    # front/back já vêm sem espaços nas pontas de normalize_cards
+    blob = "\n".join(c["front"] + " " + c["back"] for c in (cards or [])).strip()
     if not blob:
         return "unknown"
-    return detect_language_pt_en_es(blob)
-
-
-EMBEDDING_MODEL_PATTERNS = [
-    r"embed",
-    r"nomic",
-    r"mxbai",
-    r"bge-",
-    r"gte-",
-    r"e5-",
-    r"multilingual-e5",
-    r"sentence-",
-    r"all-minilm",
-    r"instructor",
-    r"jina-embeddings",
-    r"snowflake-arctic-embed",
-]
-
-
-def _is_embedding_model(model_name: str) -> bool:
-    """Detecta se um modelo é de embedding baseado no nome."""
-    name_lower = model_name.lower()
-    for pattern in EMBEDDING_MODEL_PATTERNS:
-        if re.search(pattern, name_lower):
-            return True
-    return False
+    # Sem o atalho ASCII: card em português sem acento não pode virar "en" (dispararia tradução)
+    return detect_language_pt_en_es(blob, ascii_shortcut=False)
 
 
 @router.post("/analyze-text-stream")
@@ -918,7 +1259,7 @@ async def analyze_text_stream(
             if not analysis_model:
                 analysis_model = await get_first_available_ollama_llm()
                 if not analysis_model:
-                    yield f"event: error\ndata: {json.dumps({'error': 'Nenhum modelo disponível para análise.'})}\n\n"
+                    yield _sse_event("error", {'error': 'Nenhum modelo disponível para análise.'})
                     return
 
             analysis_mode = payload.analysisMode or "auto"
@@ -935,18 +1276,18 @@ async def analyze_text_stream(
                 if use_openai or use_perplexity:
                     analysis_mode = "llm"
                 else:
-                    analysis_mode = "embedding" if _is_embedding_model(analysis_model) else "llm"
+                    analysis_mode = "embedding" if is_embedding_model(analysis_model) else "llm"
 
             logger.info("Analysis model: %s, mode: %s, provider: %s", analysis_model, analysis_mode, provider)
 
             from app.services.ollama import (
-                ollama_embed,
+                ollama_embed_batch,
                 chunk_text_semantic,
                 chunk_text,
-                cosine_similarity,
+                top_k_by_similarity,
             )
 
-            yield f"event: progress\ndata: {json.dumps({'percent': 10, 'stage': 'preparing', 'mode': analysis_mode})}\n\n"
+            yield _sse_event("progress", {'percent': 10, 'stage': 'preparing', 'mode': analysis_mode})
 
             src = truncate_source(payload.text or "")
 
@@ -958,55 +1299,56 @@ async def analyze_text_stream(
                 max_words=400,
                 overlap_sentences=2,
                 language=language,
+                pre_tokenized=src_stats(src, language).sentences,
             )
 
             if not chunks:
                 chunks = chunk_text(src, chunk_size=400)
 
-            yield f"event: progress\ndata: {json.dumps({'percent': 20, 'stage': 'chunking', 'chunks': len(chunks)})}\n\n"
+            yield _sse_event("progress", {'percent': 20, 'stage': 'chunking', 'chunks': len(chunks)})
 
             if analysis_mode == "embedding":
-                yield f"event: progress\ndata: {json.dumps({'percent': 30, 'stage': 'embedding', 'model': analysis_model})}\n\n"
-
-                chunk_embeddings = []
-                for i, chunk in enumerate(chunks):
-                    try:
-                        emb = await ollama_embed(analysis_model, chunk)
-                        chunk_embeddings.append((chunk, emb))
-                    except Exception as embed_error:
-                        logger.warning("Embedding failed: %s. Falling back to LLM mode.", embed_error)
-                        analysis_mode = "llm"
-                        yield f"event: progress\ndata: {json.dumps({'percent': 35, 'stage': 'fallback_to_llm', 'reason': str(embed_error)})}\n\n"
-                        break
-
-                    if len(chunks) > 3:
-                        progress = 30 + int((i + 1) / len(chunks) * 25)
-                        yield f"event: progress\ndata: {json.dumps({'percent': progress, 'stage': 'embedding', 'chunk': i + 1, 'total': len(chunks)})}\n\n"
+                if len(chunks) <= 3:
+                    # Com até 3 chunks o ranking devolveria os mesmos chunks (top 3): dispensa embeddings
+                    summary = "\n\n".join(chunks)
+                    method_used = "embedding"
+                else:
+                    yield _sse_event("progress", {'percent': 30, 'stage': 'embedding', 'model': analysis_model})
 
-                if analysis_mode == "embedding" and chunk_embeddings:
                     if detected_lang == "pt-br":
                         query = "conceitos importantes, definições técnicas, contrastes e distinções"
                     else:
                         query = "important concepts, technical definitions, contrasts and distinctions"
 
-                    query_emb = await ollama_embed(analysis_model, query)
+                    # Uma única chamada /api/embed para todos os chunks + query (query vai por último)
+                    chunk_embs = []
+                    try:
+                        embeddings = await ollama_embed_batch(analysis_model, chunks + [query])
+                        query_emb = embeddings[-1]
+                        chunk_embs = embeddings[:-1]
+                    except Exception as embed_error:
+                        logger.warning("Embedding failed: %s. Falling back to LLM mode.", embed_error)
+                        analysis_mode = "llm"
+                        yield _sse_event("progress", {'percent': 35, 'stage': 'fallback_to_llm', 'reason': str(embed_error)})
 
-                    yield f"event: progress\ndata: {json.dumps({'percent': 60, 'stage': 'ranking'})}\n\n"
+                    if analysis_mode == "embedding" and chunk_embs:
+                        yield _sse_event("progress", {'percent': 55, 'stage': 'embedding', 'chunk': len(chunks), 'total': len(chunks)})
+                        yield _sse_event("progress", {'percent': 60, 'stage': 'ranking'})
 
-                    scored = [(chunk, cosine_similarity(emb, query_emb)) for chunk, emb in chunk_embeddings]
-                    scored.sort(key=lambda x: x[1], reverse=True)
+                        # (índice do chunk, score), já ordenado: matriz (N, d) @ query em uma chamada
+                        scored = top_k_by_similarity(chunk_embs, query_emb, k=5)
 
-                    min_similarity = 0.3
-                    top_chunks = [chunk for chunk, score in scored[:5] if score >= min_similarity][:3]
+                        min_similarity = 0.3
+                        top_chunks = [chunks[i] for i, score in scored if score >= min_similarity][:3]
 
-                    if not top_chunks and scored:
-                        top_chunks = [chunk for chunk, _ in scored[:3]]
+                        if not top_chunks and scored:
+                            top_chunks = [chunks[i] for i, _ in scored[:3]]
 
-                    summary = "\n\n".join(top_chunks)
-                    method_used = "embedding"
+                        summary = "\n\n".join(top_chunks)
+                        method_used = "embedding"
 
             if analysis_mode == "llm":
-                yield f"event: progress\ndata: {json.dumps({'percent': 40, 'stage': 'llm_analysis', 'model': analysis_model})}\n\n"
+                yield _sse_event("progress", {'percent': 40, 'stage': 'llm_analysis', 'model': analysis_model})
 
                 full_text = "\n\n".join(chunks[:5])
 
@@ -1023,42 +1365,37 @@ async def analyze_text_stream(
                 )
                 options = {"num_predict": np, "temperature": 0.3}
 
-                raw = ""
                 try:
-                    if use_openai:
-                        async for piece in openai_generate_stream(api_keys.openai, analysis_model, prompt, system=system, options=options):
-                            raw += piece
-                    elif use_perplexity:
-                        async for piece in perplexity_generate_stream(api_keys.perplexity, analysis_model, prompt, system=system, options=options):
-                            raw += piece
-                    else:
-                        async for piece in ollama_generate_stream(analysis_model, prompt, system=system, options=options):
-                            raw += piece
+                    raw = await _generate_with_provider(
+                        provider, analysis_model, prompt, system, options,
+                        openai_key=api_keys.openai, perplexity_key=api_keys.perplexity,
+                    )
                 except Exception as llm_error:
                     logger.warning("LLM analysis failed: %s", llm_error)
-                    yield f"event: error\ndata: {json.dumps({'error': f'LLM analysis failed: {str(llm_error)}'})}\n\n"
+                    yield _sse_event("error", {'error': f'LLM analysis failed: {str(llm_error)}'})
                     return
 
-                yield f"event: progress\ndata: {json.dumps({'percent': 80, 'stage': 'llm_complete'})}\n\n"
+                yield _sse_event("progress", {'percent': 80, 'stage': 'llm_complete'})
 
                 summary = raw.strip() if raw.strip() else "\n\n".join(chunks[:3])
                 method_used = "llm"
 
             result = {"content": [{"type": "text", "text": summary}], "method": method_used}
 
-            analysis_id = save_analysis(
+            analysis_id = await asyncio.to_thread(
+                save_analysis,
                 src,
                 summary,
                 {"chunks": len(chunks), "method": method_used, "model": analysis_model},
             )
             result["analysis_id"] = analysis_id
 
-            yield f"event: progress\ndata: {json.dumps({'percent': 100, 'stage': 'done', 'analysis_id': analysis_id, 'method': method_used})}\n\n"
-            yield f"event: result\ndata: {json.dumps(result)}\n\n"
+            yield _sse_event("progress", {'percent': 100, 'stage': 'done', 'analysis_id': analysis_id, 'method': method_used})
+            yield _sse_event("result", result)
 
         except Exception as e:
             logger.exception("Error in analyze_text_stream")
-            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+            yield _sse_event("error", {'error': str(e)})
 
     return StreamingResponse(generate(), media_type="text/event-stream")
 
@@ -1102,6 +1439,10 @@ TOPIC_COLORS = {
 CUSTOM_TOPIC_COLORS = ["#fcd34d", "#4ade80", "#60a5fa", "#a78bfa", "#f87171", "#22d3d8"]
 
 
+# Tabela para normalizar quebras de linha numa única passada (\r\n e \n viram um espaço)
+_NEWLINES_TO_SPACE = str.maketrans({"\r": "", "\n": " "})
+
+
 def _clean_llm_json(raw: str) -> str:
     """
     Limpa e corrige erros comuns de JSON gerado por LLMs.
@@ -1112,7 +1453,7 @@ def _clean_llm_json(raw: str) -> str:
     cleaned = re.sub(r"```(?:json)?", "", cleaned, flags=re.IGNORECASE)
 
     # Normaliza quebras de linha para evitar strings inválidas em JSON
-    cleaned = cleaned.replace("\r\n", " ").replace("\n", " ")
+    cleaned = cleaned.translate(_NEWLINES_TO_SPACE)
 
     # Corrige todas as variações de "custom_name" (case insensitive)
     # Cobre: custom-Name, custom-name, customName, custom_Name, custom-than, etc.
@@ -1476,7 +1817,7 @@ async def segment_topics(
             if not analysis_model:
                 analysis_model = await get_first_available_ollama_llm()
                 if not analysis_model:
-                    yield f"event: error\ndata: {json.dumps({'error': 'Nenhum modelo disponível para segmentação.'})}\n\n"
+                    yield _sse_event("error", {'error': 'Nenhum modelo disponível para segmentação.'})
                     return
 
             # Detecta provider
@@ -1487,7 +1828,7 @@ async def segment_topics(
             provider = "ollama" if use_ollama else ("openai" if use_openai else "perplexity")
             logger.info("Topic segmentation - model: %s, provider: %s", analysis_model, provider)
 
-            yield f"event: progress\ndata: {json.dumps({'percent': 10, 'stage': 'preparing'})}\n\n"
+            yield _sse_event("progress", {'percent': 10, 'stage': 'preparing'})
 
             # Trunca texto se muito longo
             src = payload.text[:15000] if len(payload.text) > 15000 else payload.text
@@ -1497,7 +1838,7 @@ async def segment_topics(
 
             # Tenta usar LangExtract primeiro (posições exatas)
             if is_langextract_available() and (use_ollama or use_openai):
-                yield f"event: progress\ndata: {json.dumps({'percent': 30, 'stage': 'calling_langextract', 'model': analysis_model})}\n\n"
+                yield _sse_event("progress", {'percent': 30, 'stage': 'calling_langextract', 'model': analysis_model})
 
                 try:
                     segments = await segment_with_langextract(
@@ -1516,12 +1857,13 @@ async def segment_topics(
 
             # Fallback para método legado (Ollama JSON Mode + str.find)
             if not segments:
-                yield f"event: progress\ndata: {json.dumps({'percent': 20, 'stage': 'building_prompt'})}\n\n"
+                yield _sse_event("progress", {'percent': 20, 'stage': 'building_prompt'})
 
-                from app.core.prompts import PROMPTS
-                prompt = PROMPTS["TOPIC_SEGMENTATION_PROMPT"].replace("${text}", src)
+                from app.core import prompts
+                from app.core.prompts import render
+                prompt = render("TOPIC_SEGMENTATION_PROMPT", text=src)
 
-                yield f"event: progress\ndata: {json.dumps({'percent': 30, 'stage': 'calling_llm', 'model': analysis_model})}\n\n"
+                yield _sse_event("progress", {'percent': 30, 'stage': 'calling_llm', 'model': analysis_model})
 
                 segments_raw = []
 
@@ -1536,16 +1878,13 @@ async def segment_topics(
                         logger.info("[TopicSegmentation] Ollama JSON Mode returned %d segments", len(segments_raw))
 
                     else:
-                        system = PROMPTS["TOPIC_SEGMENTATION_SYSTEM"]
+                        system = prompts.TOPIC_SEGMENTATION_SYSTEM
                         options = {"num_predict": 2048, "temperature": 0.2}
 
-                        raw = ""
-                        if use_openai:
-                            async for piece in openai_generate_stream(api_keys.openai, analysis_model, prompt, system=system, options=options):
-                                raw += piece
-                        elif use_perplexity:
-                            async for piece in perplexity_generate_stream(api_keys.perplexity, analysis_model, prompt, system=system, options=options):
-                                raw += piece
+                        raw = await _generate_with_provider(
+                            provider, analysis_model, prompt, system, options,
+                            openai_key=api_keys.openai, perplexity_key=api_keys.perplexity,
+                        )
 
                         try:
                             cleaned = _clean_llm_json(raw)
@@ -1594,27 +1933,28 @@ async def segment_topics(
 
                 except Exception as llm_error:
                     logger.warning("Topic segmentation LLM failed: %s", llm_error)
-                    yield f"event: error\ndata: {json.dumps({'error': f'LLM failed: {str(llm_error)}'})}\n\n"
+                    yield _sse_event("error", {'error': f'LLM failed: {str(llm_error)}'})
                     return
 
-                yield f"event: progress\ndata: {json.dumps({'percent': 60, 'stage': 'calculating_positions', 'raw_segments': len(segments_raw)})}\n\n"
+                yield _sse_event("progress", {'percent': 60, 'stage': 'calculating_positions', 'raw_segments': len(segments_raw)})
 
                 segments = _calculate_positions(src, segments_raw)
                 method_used = "legacy_ollama" if use_ollama else "legacy_api"
 
             if not segments:
                 logger.warning("No valid segments found after position calculation")
-                yield f"event: progress\ndata: {json.dumps({'percent': 100, 'stage': 'done', 'segments': 0})}\n\n"
-                yield f"event: result\ndata: {json.dumps({'success': True, 'segments': [], 'topics': [], 'text_length': len(src), 'analysis_id': None})}\n\n"
+                yield _sse_event("progress", {'percent': 100, 'stage': 'done', 'segments': 0})
+                yield _sse_event("result", {'success': True, 'segments': [], 'topics': [], 'text_length': len(src), 'analysis_id': None})
                 return
 
-            yield f"event: progress\ndata: {json.dumps({'percent': 85, 'stage': 'building_topics', 'segments': len(segments)})}\n\n"
+            yield _sse_event("progress", {'percent': 85, 'stage': 'building_topics', 'segments': len(segments)})
 
             # Constrói definições de tópicos com cores
             topics = _build_topic_definitions(segments)
 
             # Salva no banco
-            analysis_id = save_analysis(
+            analysis_id = await asyncio.to_thread(
+                save_analysis,
                 src[:1000],  # Salva apenas amostra do texto
                 f"Topic segmentation: {len(segments)} segments, {len(topics)} topics",
                 {
@@ -1635,12 +1975,12 @@ async def segment_topics(
                 "analysis_id": analysis_id,
             }
 
-            yield f"event: progress\ndata: {json.dumps({'percent': 100, 'stage': 'done', 'segments': len(segments), 'topics': len(topics)})}\n\n"
-            yield f"event: result\ndata: {json.dumps(result)}\n\n"
+            yield _sse_event("progress", {'percent': 100, 'stage': 'done', 'segments': len(segments), 'topics': len(topics)})
+            yield _sse_event("result", result)
 
         except Exception as e:
             logger.exception("Error in segment_topics")
-            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+            yield _sse_event("error", {'error': str(e)})
 
     return StreamingResponse(generate(), media_type="text/event-stream")
 
@@ -1675,9 +2015,15 @@ async def generate_cards_stream(
         best_cards_so_far = []
         deck = pick_default_deck(payload.deckOptions or "General")
 
-        current_chunk_raw = ""
+        current_chunk_parts: List[str] = []
         current_chunk_index = 0
         chunk_cards_generated: dict[int, int] = {}
+        # Frames SSE acumulados entre etapas síncronas; enviados juntos antes do próximo await longo
+        pending: list[bytes] = []
+        # Auditoria da request (entrada, respostas do LLM, etapas e filtros), gravada numa única transação no final
+        audit = AuditBatch()
+        # Validações antecipadas dos chunks já gerados (canceladas se a request terminar antes)
+        prefetch_tasks: List[asyncio.Task] = []
 
         async def ensure_not_cancelled():
             if _is_generation_cancelled(request_cancel_id) or await request.is_disconnected():
@@ -1691,7 +2037,7 @@ async def generate_cards_stream(
             if not model:
                 model = await get_first_available_ollama_llm()
                 if not model:
-                    yield f"event: error\ndata: {json.dumps({'error': 'Nenhum modelo disponível. Configure uma API key ou instale um modelo no Ollama.'})}\n\n"
+                    yield _sse_event("error", {'error': 'Nenhum modelo disponível. Configure uma API key ou instale um modelo no Ollama.'})
                     return
                 logger.info("Using fallback Ollama model: %s", model)
 
@@ -1716,7 +2062,7 @@ async def generate_cards_stream(
                     is_valid, error_msg, pattern_type = validate_custom_prompt(prompt_value)
                     if not is_valid:
                         log_injection_attempt(prompt_value, pattern_type, source="generate-cards-stream")
-                        yield f"event: error\ndata: {json.dumps({'error': f'Invalid {prompt_name}: {error_msg}', 'type': 'prompt_validation'})}\n\n"
+                        yield _sse_event("error", {'error': f'Invalid {prompt_name}: {error_msg}', 'type': 'prompt_validation'})
                         return
 
             # Cria PromptProvider com prompts customizados (se fornecidos)
@@ -1736,7 +2082,7 @@ async def generate_cards_stream(
             if using_custom:
                 logger.info("Using custom prompts from request")
 
-            yield f"event: stage\ndata: {json.dumps({'stage': 'generation_started'})}\n\n"
+            yield _sse_event("stage", {'stage': 'generation_started'})
             await ensure_not_cancelled()
 
             src = truncate_source(payload.text or "")
@@ -1746,10 +2092,13 @@ async def generate_cards_stream(
             if card_type not in ("basic", "cloze", "both"):
                 card_type = "both"
 
-            word_count = len(src.split())
             detected_lang = detect_language_pt_en_es(src[:500])
             language = "portuguese" if detected_lang == "pt-br" else "english"
 
+            # Tokenização única e cacheada (compartilhada com analyze_text_stream e o chunking)
+            stats = src_stats(src, language)
+            word_count = stats.word_count
+
             chunks = [src]
             chunked = False
             if len(src) > 12000 or word_count > 1800:
@@ -1760,6 +2109,7 @@ async def generate_cards_stream(
                     max_words=400,
                     overlap_sentences=2,
                     language=language,
+                    pre_tokenized=stats.sentences,
                 )
                 if not chunks:
                     chunks = chunk_text(src, chunk_size=400)
@@ -1767,7 +2117,7 @@ async def generate_cards_stream(
 
             if chunked:
                 logger.info("Generation chunking: %d chars -> %d chunks", len(src), len(chunks))
-                yield f"event: stage\ndata: {json.dumps({'stage': 'chunking', 'chunks': len(chunks)})}\n\n"
+                yield _sse_event("stage", {'stage': 'chunking', 'chunks': len(chunks)})
             await ensure_not_cancelled()
 
             # Se o usuario especificou numCards, usa com range de +-20%
@@ -1775,29 +2125,19 @@ async def generate_cards_stream(
                 # Validacao de escassez de conteudo
                 validation = validate_content_sufficiency(src, payload.numCards)
                 if not validation.is_valid:
-                    yield f"event: error\ndata: {json.dumps({'error': validation.message, 'type': 'content_scarcity', 'recommended_max': validation.recommended_max_cards, 'token_count': validation.token_count})}\n\n"
+                    yield _sse_event("error", {'error': validation.message, 'type': 'content_scarcity', 'recommended_max': validation.recommended_max_cards, 'token_count': validation.token_count})
                     return
                 elif validation.message:
                     # Aviso (permite continuar)
-                    yield f"event: warning\ndata: {json.dumps({'message': validation.message, 'recommended_max': validation.recommended_max_cards})}\n\n"
+                    yield _sse_event("warning", {'message': validation.message, 'recommended_max': validation.recommended_max_cards})
 
                 target_min = max(1, int(payload.numCards * 0.8))
                 target_max = int(payload.numCards * 1.2)
             else:
                 # Calculo automatico baseado em word count
-                if word_count < 140:
-                    target_min, target_max = 3, 8
-                elif word_count < 320:
-                    target_min, target_max = 5, 15
-                elif word_count < 700:
-                    target_min, target_max = 8, 25
-                else:
-                    # Escala dinamica: ~1 card por 80 palavras
-                    auto_target = max(15, word_count // 80)
-                    target_min = max(10, auto_target // 2)
-                    target_max = auto_target
+                target_min, target_max = _auto_targets(word_count)
 
-            request_id = save_generation_request(
+            request_id = audit.add_generation_request(
                 source_text=src,
                 context_text=ctx,
                 card_type=card_type,
@@ -1820,14 +2160,28 @@ async def generate_cards_stream(
             all_cards_raw = []
             response_lengths = []
 
+            # Juiz dedicado (OLLAMA_VALIDATION_MODEL, ex.: modelo pequeno quantizado) tem
+            # precedência sobre o modelo de geração quando configurado
+            validation_model = payload.validationModel or OLLAMA_VALIDATION_MODEL or model
+            # Detecta o provider correto para o modelo de validação (usa cache)
+            validation_provider = get_provider_for_model(
+                validation_model,
+                openai_key=api_keys.openai,
+                perplexity_key=api_keys.perplexity,
+            )
+
             for idx, chunk in enumerate(chunks):
                 await ensure_not_cancelled()
                 current_chunk_index = idx + 1
-                current_chunk_raw = ""
+                current_chunk_parts = []
                 if chunked:
-                    yield f"event: stage\ndata: {json.dumps({'stage': 'chunk_generation', 'chunk': idx + 1, 'total': len(chunks)})}\n\n"
+                    pending.append(_sse_event("stage", {'stage': 'chunk_generation', 'chunk': idx + 1, 'total': len(chunks)}))
+                if pending:
+                    yield b"".join(pending)
+                    pending.clear()
 
-                chunk_words = len(chunk.split())
+                # Sem chunking o único chunk é o próprio src, já contado em src_stats
+                chunk_words = sum(1 for _ in _WORD_RE.finditer(chunk)) if chunked else word_count
                 chunk_target_min, chunk_target_max = _scale_targets_for_chunk(
                     chunk_words, word_count, target_min, target_max
                 )
@@ -1841,32 +2195,25 @@ async def generate_cards_stream(
                     card_type=card_type,  # type: ignore[arg-type]
                 )
 
-                raw = ""
-                if use_openai:
-                    async for piece in openai_generate_stream(api_keys.openai, model, prompt, system=system_prompt, options=options):
-                        await ensure_not_cancelled()
-                        raw += piece
-                        current_chunk_raw = raw
-                elif use_perplexity:
-                    async for piece in perplexity_generate_stream(api_keys.perplexity, model, prompt, system=system_prompt, options=options):
-                        await ensure_not_cancelled()
-                        raw += piece
-                        current_chunk_raw = raw
-                else:
-                    async for piece in ollama_generate_stream(model, prompt, system=system_prompt, options=options):
-                        await ensure_not_cancelled()
-                        raw += piece
-                        current_chunk_raw = raw
+                async for piece in _stream_provider(
+                    provider, model, prompt, system_prompt, options,
+                    openai_key=api_keys.openai, perplexity_key=api_keys.perplexity,
+                ):
+                    await ensure_not_cancelled()
+                    current_chunk_parts.append(piece)
+                raw = "".join(current_chunk_parts)
 
                 response_lengths.append(len(raw))
 
                 if chunked:
-                    yield f"event: stage\ndata: {json.dumps({'stage': 'chunk_completed', 'chunk': idx + 1, 'total': len(chunks), 'response_length': len(raw)})}\n\n"
+                    pending.append(_sse_event("stage", {'stage': 'chunk_completed', 'chunk': idx + 1, 'total': len(chunks), 'response_length': len(raw)}))
 
-                save_llm_response(
+                # Grava o prompt como foi enviado ao modelo (sem o marcador de cache)
+                static_prefix, dynamic = split_for_cache(prompt)
+                audit.add_llm_response(
                     provider=provider,
                     model=model,
-                    prompt=prompt,
+                    prompt=static_prefix + dynamic,
                     response=raw,
                     analysis_id=payload.analysisId,
                     system_prompt=system_prompt,
@@ -1875,7 +2222,7 @@ async def generate_cards_stream(
                     options=options,
                 )
 
-                save_pipeline_stage(
+                audit.add_pipeline_stage(
                     request_id=request_id,
                     stage="llm_generation_chunk",
                     cards_in=0,
@@ -1890,15 +2237,11 @@ async def generate_cards_stream(
                     analysis_id=payload.analysisId,
                 )
 
-                cards_raw = normalize_cards(parse_flashcards_qa(raw))
-                parse_mode = "qa"
-                if not cards_raw:
-                    cards_raw = normalize_cards(parse_flashcards_json(raw))
-                    parse_mode = "json"
+                cards_raw, parse_mode = _parse_cards_raw(raw)
 
                 chunk_cards_generated[current_chunk_index] = len(cards_raw)
 
-                save_pipeline_stage(
+                audit.add_pipeline_stage(
                     request_id=request_id,
                     stage="parsing_chunk",
                     cards_in=0,
@@ -1912,6 +2255,25 @@ async def generate_cards_stream(
                 )
 
                 all_cards_raw.extend(cards_raw)
+
+                if chunked and idx + 1 < len(chunks):
+                    # Valida os cards deste chunk enquanto o próximo é gerado; a validação
+                    # final reaproveita esses veredictos pelo cache
+                    if card_type == "both":
+                        prefetch_cards = cards_raw
+                    else:
+                        want_cloze = card_type == "cloze"
+                        prefetch_cards = [c for c in cards_raw if (_CLOZE_MARK in c["front"]) == want_cloze]
+                    prefetch_tasks.append(asyncio.create_task(_prefetch_src_relevance_verdicts(
+                        prefetch_cards,
+                        src,
+                        prompt_provider=prompt_provider,
+                        provider=validation_provider,
+                        model=validation_model,
+                        openai_key=api_keys.openai,
+                        perplexity_key=api_keys.perplexity,
+                    )))
+
                 # Melhor esforço: snapshot dos cards parseados até agora
                 try:
                     best_cards_so_far = _merge_cards_dedup(all_cards_raw)
@@ -1922,7 +2284,7 @@ async def generate_cards_stream(
             best_cards_so_far = list(cards_raw)
             await ensure_not_cancelled()
 
-            save_pipeline_stage(
+            audit.add_pipeline_stage(
                 request_id=request_id,
                 stage="llm_generation",
                 cards_in=0,
@@ -1937,13 +2299,11 @@ async def generate_cards_stream(
             )
 
             cards_before_type_filter = len(cards_raw)
-            cloze_count = sum(1 for c in cards_raw if "{{c1::" in (c.get("front") or ""))
+            cards_raw, cloze_count, _ = _filter_by_card_type(cards_raw, card_type, analysis_id=payload.analysisId, audit=audit)
             logger.info("Parsed %d cards (%d with cloze syntax), card_type=%s", cards_before_type_filter, cloze_count, card_type)
-
-            cards_raw = _filter_by_card_type(cards_raw, card_type, analysis_id=payload.analysisId)
             best_cards_so_far = list(cards_raw)
 
-            save_pipeline_stage(
+            audit.add_pipeline_stage(
                 request_id=request_id,
                 stage="type_filter",
                 cards_in=cards_before_type_filter,
@@ -1952,19 +2312,19 @@ async def generate_cards_stream(
                 analysis_id=payload.analysisId,
             )
 
-            yield f"event: stage\ndata: {json.dumps({'stage': 'parsed', 'mode': parse_mode, 'count': len(cards_raw), 'before_type_filter': cards_before_type_filter})}\n\n"
+            pending.append(_sse_event("stage", {'stage': 'parsed', 'mode': parse_mode, 'count': len(cards_raw), 'before_type_filter': cards_before_type_filter}))
+            yield b"".join(pending)
+            pending.clear()
 
-            validation_model = payload.validationModel or model
-            # Detecta o provider correto para o modelo de validação (usa cache)
-            validation_provider = get_provider_for_model(
-                validation_model,
-                openai_key=api_keys.openai,
-                perplexity_key=api_keys.perplexity,
-            )
             logger.info("Validation model: %s (provider: %s)", validation_model, validation_provider)
 
+            if prefetch_tasks:
+                # Veredictos antecipados ainda em andamento entram no cache antes da validação final
+                await asyncio.gather(*prefetch_tasks, return_exceptions=True)
+
             cards_before_src = len(cards_raw)
-            cards = await _validate_src_with_llm(
+            # SRC + relevância numa única passada do LLM
+            cards_src, cards = await _validate_src_and_relevance_llm(
                 cards_raw,
                 src,
                 prompt_provider=prompt_provider,
@@ -1973,141 +2333,98 @@ async def generate_cards_stream(
                 openai_key=api_keys.openai,
                 perplexity_key=api_keys.perplexity,
                 analysis_id=payload.analysisId,
+                audit=audit,
             )
             best_cards_so_far = list(cards)
             await ensure_not_cancelled()
 
-            save_pipeline_stage(
+            audit.add_pipeline_stage(
                 request_id=request_id,
                 stage="src_filter_llm",
                 cards_in=cards_before_src,
-                cards_out=len(cards),
+                cards_out=len(cards_src),
                 details={"method": "llm_validation", "validation_model": validation_model, "validation_provider": validation_provider},
                 analysis_id=payload.analysisId,
             )
 
-            yield f"event: stage\ndata: {json.dumps({'stage': 'src_filtered', 'kept': len(cards), 'dropped': max(0, len(cards_raw) - len(cards)), 'method': 'llm'})}\n\n"
+            yield _sse_event("stage", {'stage': 'src_filtered', 'kept': len(cards_src), 'dropped': max(0, len(cards_raw) - len(cards_src)), 'method': 'llm'})
 
-            cards_before_relevance = len(cards)
-            cards = await _filter_cards_by_content_relevance_llm(
-                cards,
-                src,
-                prompt_provider=prompt_provider,
-                provider=validation_provider,
-                model=validation_model,
-                openai_key=api_keys.openai,
-                perplexity_key=api_keys.perplexity,
-                analysis_id=payload.analysisId,
-            )
-            best_cards_so_far = list(cards)
-            await ensure_not_cancelled()
+            cards_before_relevance = len(cards_src)
             if len(cards) < cards_before_relevance:
-                yield f"event: stage\ndata: {json.dumps({'stage': 'llm_relevance_filtered', 'kept': len(cards), 'dropped': cards_before_relevance - len(cards)})}\n\n"
+                pending.append(_sse_event("stage", {'stage': 'llm_relevance_filtered', 'kept': len(cards), 'dropped': cards_before_relevance - len(cards)}))
 
             if not cards and cards_raw:
                 for c in cards_raw:
                     c.pop("src", None)
                 cards = cards_raw
                 best_cards_so_far = list(cards)
-                yield f"event: stage\ndata: {json.dumps({'stage': 'src_bypassed', 'count': len(cards)})}\n\n"
+                pending.append(_sse_event("stage", {'stage': 'src_bypassed', 'count': len(cards)}))
 
             cards_relaxed = _relax_src_if_needed(cards, cards_raw, target_min=target_min, target_max=target_max)
             if len(cards_relaxed) != len(cards):
-                yield (
-                    "event: stage\ndata: "
-                    + json.dumps(
-                        {
-                            "stage": "src_relaxed",
-                            "kept_with_src": len(cards),
-                            "total_after_relax": len(cards_relaxed),
-                            "target_min": target_min,
-                        }
-                    )
-                    + "\n\n"
-                )
+                pending.append(_sse_event(
+                    "stage",
+                    {
+                        "stage": "src_relaxed",
+                        "kept_with_src": len(cards),
+                        "total_after_relax": len(cards_relaxed),
+                        "target_min": target_min,
+                    },
+                ))
                 cards = cards_relaxed
                 best_cards_so_far = list(cards)
 
             out_lang = _cards_lang_from_cards(cards)
-            yield f"event: stage\ndata: {json.dumps({'stage': 'lang_check', 'lang': out_lang, 'cards': len(cards), 'min': target_min})}\n\n"
+            pending.append(_sse_event("stage", {'stage': 'lang_check', 'lang': out_lang, 'cards': len(cards), 'min': target_min}))
 
             if not cards or out_lang != "pt-br" or len(cards) < target_min:
-                yield (
-                    "event: stage\ndata: "
-                    + json.dumps(
-                        {"stage": "repair_pass", "reason": f"lang={out_lang}, cards={len(cards)}, min={target_min}"}
+                pending.append(_sse_event(
+                    "stage",
+                    {"stage": "repair_pass", "reason": f"lang={out_lang}, cards={len(cards)}, min={target_min}"},
+                ))
+                yield b"".join(pending)
+                pending.clear()
+
+                if cards and len(cards) >= target_min:
+                    # Só o idioma falhou: um prompt curto de tradução basta (bem menos tokens que regerar)
+                    repair_prompt = prompt_provider.build_flashcards_translate_prompt(
+                        cards=cards,
+                        card_type=card_type,  # type: ignore[arg-type]
+                    )
+                else:
+                    repair_prompt = prompt_provider.build_flashcards_repair_prompt(
+                        src=src,
+                        ctx=ctx,
+                        checklist_block=checklist_block,
+                        target_min=target_min,
+                        target_max=target_max,
+                        card_type=card_type,  # type: ignore[arg-type]
                     )
-                    + "\n\n"
-                )
-
-                repair_prompt = prompt_provider.build_flashcards_repair_prompt(
-                    src=src,
-                    ctx=ctx,
-                    checklist_block=checklist_block,
-                    target_min=target_min,
-                    target_max=target_max,
-                    card_type=card_type,  # type: ignore[arg-type]
-                )
 
-                raw2 = ""
                 repair_system = prompt_provider.flashcards_system("basic")  # força system PTBR
 
-                if use_openai:
-                    async for piece in openai_generate_stream(
-                        api_keys.openai,
-                        model,
-                        repair_prompt,
-                        system=repair_system,
-                        options={"num_predict": 4096, "temperature": 0.0},
-                    ):
-                        await ensure_not_cancelled()
-                        raw2 += piece
-                elif use_perplexity:
-                    async for piece in perplexity_generate_stream(
-                        api_keys.perplexity,
-                        model,
-                        repair_prompt,
-                        system=repair_system,
-                        options={"num_predict": 4096, "temperature": 0.0},
-                    ):
-                        await ensure_not_cancelled()
-                        raw2 += piece
-                else:
-                    async for piece in ollama_generate_stream(
-                        model,
-                        repair_prompt,
-                        system=repair_system,
-                        options={"num_predict": 4096, "temperature": 0.0},
-                    ):
-                        await ensure_not_cancelled()
-                        raw2 += piece
-
-                cards2_raw = normalize_cards(parse_flashcards_qa(raw2))
-                repair_mode = "qa"
-                if not cards2_raw:
-                    cards2_raw = normalize_cards(parse_flashcards_json(raw2))
-                    repair_mode = "json"
-
-                cards2_raw = _filter_by_card_type(cards2_raw, card_type, analysis_id=payload.analysisId)
-
-                yield f"event: stage\ndata: {json.dumps({'stage': 'repair_parsed', 'mode': repair_mode, 'count': len(cards2_raw)})}\n\n"
-
-                cards2 = await _validate_src_with_llm(
-                    cards2_raw,
-                    src,
-                    prompt_provider=prompt_provider,
-                    provider=validation_provider,
-                    model=validation_model,
+                raw2_parts: List[str] = []
+                async for piece in _stream_provider(
+                    provider,
+                    model,
+                    repair_prompt,
+                    repair_system,
+                    {"num_predict": 4096, "temperature": 0.0},
                     openai_key=api_keys.openai,
                     perplexity_key=api_keys.perplexity,
-                    analysis_id=payload.analysisId,
-                )
-                await ensure_not_cancelled()
-                yield f"event: stage\ndata: {json.dumps({'stage': 'repair_src_filtered', 'kept': len(cards2), 'dropped': max(0, len(cards2_raw) - len(cards2)), 'method': 'llm'})}\n\n"
+                ):
+                    await ensure_not_cancelled()
+                    raw2_parts.append(piece)
+                raw2 = "".join(raw2_parts)
+
+                cards2_raw, repair_mode = _parse_cards_raw(raw2)
+
+                cards2_raw, _, _ = _filter_by_card_type(cards2_raw, card_type, analysis_id=payload.analysisId, audit=audit)
+
+                yield _sse_event("stage", {'stage': 'repair_parsed', 'mode': repair_mode, 'count': len(cards2_raw)})
 
-                cards2_before_relevance = len(cards2)
-                cards2 = await _filter_cards_by_content_relevance_llm(
-                    cards2,
+                cards2_src, cards2 = await _validate_src_and_relevance_llm(
+                    cards2_raw,
                     src,
                     prompt_provider=prompt_provider,
                     provider=validation_provider,
@@ -2115,31 +2432,32 @@ async def generate_cards_stream(
                     openai_key=api_keys.openai,
                     perplexity_key=api_keys.perplexity,
                     analysis_id=payload.analysisId,
+                    audit=audit,
                 )
                 await ensure_not_cancelled()
+                yield _sse_event("stage", {'stage': 'repair_src_filtered', 'kept': len(cards2_src), 'dropped': max(0, len(cards2_raw) - len(cards2_src)), 'method': 'llm'})
+
+                cards2_before_relevance = len(cards2_src)
                 if len(cards2) < cards2_before_relevance:
-                    yield f"event: stage\ndata: {json.dumps({'stage': 'repair_llm_relevance_filtered', 'kept': len(cards2), 'dropped': cards2_before_relevance - len(cards2)})}\n\n"
+                    pending.append(_sse_event("stage", {'stage': 'repair_llm_relevance_filtered', 'kept': len(cards2), 'dropped': cards2_before_relevance - len(cards2)}))
 
                 if not cards2 and cards2_raw:
                     for c in cards2_raw:
                         c.pop("src", None)
                     cards2 = cards2_raw
-                    yield f"event: stage\ndata: {json.dumps({'stage': 'repair_src_bypassed', 'count': len(cards2)})}\n\n"
+                    pending.append(_sse_event("stage", {'stage': 'repair_src_bypassed', 'count': len(cards2)}))
 
                 cards2_relaxed = _relax_src_if_needed(cards2, cards2_raw, target_min=target_min, target_max=target_max)
                 if len(cards2_relaxed) != len(cards2):
-                    yield (
-                        "event: stage\ndata: "
-                        + json.dumps(
-                            {
-                                "stage": "repair_src_relaxed",
-                                "kept_with_src": len(cards2),
-                                "total_after_relax": len(cards2_relaxed),
-                                "target_min": target_min,
-                            }
-                        )
-                        + "\n\n"
-                    )
+                    pending.append(_sse_event(
+                        "stage",
+                        {
+                            "stage": "repair_src_relaxed",
+                            "kept_with_src": len(cards2),
+                            "total_after_relax": len(cards2_relaxed),
+                            "target_min": target_min,
+                        },
+                    ))
                     cards2 = cards2_relaxed
 
                 if cards2:
@@ -2147,7 +2465,7 @@ async def generate_cards_stream(
                     best_cards_so_far = list(cards)
 
                 out_lang2 = _cards_lang_from_cards(cards)
-                yield f"event: stage\ndata: {json.dumps({'stage': 'lang_check_after_repair', 'lang': out_lang2, 'cards': len(cards)})}\n\n"
+                pending.append(_sse_event("stage", {'stage': 'lang_check_after_repair', 'lang': out_lang2, 'cards': len(cards)}))
 
             result_cards = []
             for c in cards:
@@ -2156,17 +2474,18 @@ async def generate_cards_stream(
                     item["src"] = c["src"]
                 result_cards.append(item)
 
-            cards_id = save_cards(result_cards, analysis_id=payload.analysisId, source_text=src)
-
-            conn = _get_connection()
-            conn.execute(
-                "UPDATE llm_responses SET cards_id = ? WHERE analysis_id = ? AND cards_id = ''",
-                [cards_id, payload.analysisId or ""],
+            cards_id = await asyncio.to_thread(
+                save_cards_and_link_responses,
+                result_cards,
+                analysis_id=payload.analysisId,
+                source_text=src,
+                audit=audit,
             )
-            conn.close()
 
-            yield f"event: stage\ndata: {json.dumps({'stage': 'done', 'total_cards': len(result_cards), 'cards_id': cards_id})}\n\n"
-            yield f"event: result\ndata: {json.dumps({'success': True, 'cards': result_cards})}\n\n"
+            pending.append(_sse_event("stage", {'stage': 'done', 'total_cards': len(result_cards), 'cards_id': cards_id}))
+            pending.append(_sse_event("result", {'success': True, 'cards': result_cards}))
+            yield b"".join(pending)
+            pending.clear()
 
         except asyncio.CancelledError:
             logger.info("Cards generation cancelled (requestId=%s)", request_cancel_id or "-")
@@ -2176,10 +2495,9 @@ async def generate_cards_stream(
             recovered = []
             recovered_count = 0
             try:
+                current_chunk_raw = "".join(current_chunk_parts)
                 if current_chunk_raw and len(current_chunk_raw.strip()) >= 80:
-                    recovered = normalize_cards(parse_flashcards_qa(current_chunk_raw))
-                    if not recovered:
-                        recovered = normalize_cards(parse_flashcards_json(current_chunk_raw))
+                    recovered, _ = _parse_cards_raw(current_chunk_raw)
             except Exception:
                 recovered = []
 
@@ -2189,7 +2507,7 @@ async def generate_cards_stream(
                     ct = (payload.cardType or "both").strip().lower()
                     if ct not in ("basic", "cloze", "both"):
                         ct = "both"
-                    recovered = _filter_by_card_type(recovered, ct, analysis_id=payload.analysisId)
+                    recovered, _, _ = _filter_by_card_type(recovered, ct, analysis_id=payload.analysisId, audit=audit)
                 except Exception:
                     pass
 
@@ -2225,11 +2543,19 @@ async def generate_cards_stream(
                 "chunk_cards": chunk_cards,
                 "total_cards_so_far": len(merged_best or []),
             }
-            yield f"event: cancelled\ndata: {json.dumps(cancel_meta)}\n\n"
-            yield f"event: result\ndata: {json.dumps({'success': True, 'cards': partial_cards, 'cancelled': True, **cancel_meta})}\n\n"
+            _flush_audit_in_background(audit)
+            pending.append(_sse_event("cancelled", cancel_meta))
+            pending.append(_sse_event("result", {'success': True, 'cards': partial_cards, 'cancelled': True, **cancel_meta}))
+            yield b"".join(pending)
+            pending.clear()
         except Exception as e:
-            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+            _flush_audit_in_background(audit)
+            pending.append(_sse_event("error", {'error': str(e)}))
+            yield b"".join(pending)
+            pending.clear()
         finally:
+            for task in prefetch_tasks:
+                task.cancel()
             _clear_generation_cancelled(request_cancel_id)
 
     return StreamingResponse(generate(), media_type="text/event-stream")
@@ -2325,22 +2651,11 @@ async def rewrite_card(
 
         options = {"num_predict": 1024, "temperature": 0.0}
 
-        raw = ""
-        if use_openai:
-            async for piece in openai_generate_stream(
-                api_keys.openai, model, prompt, system=system_prompt, options=options
-            ):
-                raw += piece
-        elif use_perplexity:
-            async for piece in perplexity_generate_stream(
-                api_keys.perplexity, model, prompt, system=system_prompt, options=options
-            ):
-                raw += piece
-        else:
-            async for piece in ollama_generate_stream(
-                model, prompt, system=system_prompt, options=options
-            ):
-                raw += piece
+        provider = "openai" if use_openai else ("perplexity" if use_perplexity else "ollama")
+        raw = await _generate_with_provider(
+            provider, model, prompt, system_prompt, options,
+            openai_key=api_keys.openai, perplexity_key=api_keys.perplexity,
+        )
 
         result = _parse_rewrite_response(raw)
 
@@ -1,13 +1,32 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
+import asyncio
+import hashlib
+import json
+import time
+from typing import Awaitable, Callable, Dict, Tuple
+
 import httpx
-import os
-from app.config import OLLAMA_MODEL, OLLAMA_ANALYSIS_MODEL, ANKI_CONNECT_URL
+from app.config import OLLAMA_HOST, OLLAMA_MODEL, OLLAMA_ANALYSIS_MODEL, ANKI_CONNECT_URL
+from app.services.http_pool import get_http_client
 from app.services.ollama import get_embedding_cache_stats
 
 router = APIRouter(prefix="/api", tags=["health"])
 
+# Anki/Ollama são locais: conectar leva milissegundos, então um connect lento já indica
+# serviço fora do ar e não consome o orçamento inteiro da leitura
+_ANKI_TIMEOUT = httpx.Timeout(2.5, connect=1.0)
+_OLLAMA_TIMEOUT = httpx.Timeout(2.0, connect=1.0)
+_OLLAMA_INFO_TIMEOUT = httpx.Timeout(3.0, connect=1.0)
+
+# Endereços normalizados uma vez no import (a config não muda em runtime)
+_ANKI_URL = (ANKI_CONNECT_URL or "http://127.0.0.1:8765").rstrip("/")
+_ANKI_VERSION_PAYLOAD = {"action": "version", "version": 6}
+_OLLAMA_HOST = OLLAMA_HOST.rstrip("/")
+
 @router.get("/health")
-async def health():
+async def health(response: Response):
+    # Liveness barato: nunca servido de cache intermediário (mascararia uma falha real)
+    response.headers["Cache-Control"] = "no-store"
     return {
         "status": "ok",
         "llm_model": OLLAMA_MODEL or "(auto-detect)",
@@ -22,54 +41,120 @@ async def cache_stats():
         "embedding_cache": get_embedding_cache_stats()
     }
 
+# Status mudam em segundos, não a cada poll do frontend/websocket: TTL curto em memória,
+# também anunciado via Cache-Control para que proxies respondam as repetições
+_PROBE_TTL = 5.0
+# chave -> (expira em, payload, ETag); o ETag depende só do conteúdo, então polls
+# seguidos com o mesmo status recebem 304
+_PROBE_CACHE: Dict[str, Tuple[float, dict, str]] = {}
+# Um lock por sonda: polls simultâneos com cache expirado esperam uma única consulta
+_PROBE_LOCKS: Dict[str, asyncio.Lock] = {}
+
+
+def _fresh_probe(key: str):
+    hit = _PROBE_CACHE.get(key)
+    if hit is not None and time.monotonic() < hit[0]:
+        return hit[1]
+    return None
+
+
+async def _cached_probe(key: str, fetch: Callable[[], Awaitable[dict]]) -> dict:
+    cached = _fresh_probe(key)
+    if cached is not None:
+        return cached
+
+    async with _PROBE_LOCKS.setdefault(key, asyncio.Lock()):
+        cached = _fresh_probe(key)
+        if cached is not None:
+            return cached
+        data = await fetch()
+        _PROBE_CACHE[key] = (time.monotonic() + _PROBE_TTL, data, _etag(data))
+        return data
+
+
+def _etag(data: dict) -> str:
+    body = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+    return f'W/"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def _probe_response(request: Request, response: Response, key: str, data: dict):
+    """Anexa Cache-Control/ETag ao status cacheado; 304 se o cliente já tem essa versão."""
+    headers = {"Cache-Control": f"public, max-age={int(_PROBE_TTL)}"}
+    hit = _PROBE_CACHE.get(key)
+    if hit is not None and hit[1] is data:
+        headers["ETag"] = hit[2]
+        if request.headers.get("if-none-match") == hit[2]:
+            return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return data
+
+
 @router.get("/anki-status")
-async def anki_status():
-    url = (ANKI_CONNECT_URL or "http://127.0.0.1:8765").rstrip("/")
-    payload = {"action": "version", "version": 6}
+async def anki_status(request: Request, response: Response):
+    return _probe_response(request, response, "anki", await check_anki_status())
+
+
+async def check_anki_status() -> dict:
+    """Status do AnkiConnect (cacheado); usado pela rota e pelo broadcaster do /ws/status."""
+    return await _cached_probe("anki", _fetch_anki_status)
+
+
+async def _fetch_anki_status() -> dict:
+    url = _ANKI_URL
 
     try:
-        async with httpx.AsyncClient(timeout=2.5) as client:
-            r = await client.post(url, json=payload)
-            r.raise_for_status()
-            data = r.json() or {}
+        # Pool compartilhado: o polling do frontend reaproveita a conexão keep-alive
+        r = await get_http_client().post(url, json=_ANKI_VERSION_PAYLOAD, timeout=_ANKI_TIMEOUT)
+        r.raise_for_status()
+        data = r.json() or {}
 
-            ok = (data.get("error") is None) and (data.get("result") is not None)
-            if ok:
-                return {"connected": True, "version": data["result"], "url": url}
+        ok = (data.get("error") is None) and (data.get("result") is not None)
+        if ok:
+            return {"connected": True, "version": data["result"], "url": url}
 
-            return {"connected": False, "url": url, "error": data.get("error")}
+        return {"connected": False, "url": url, "error": data.get("error")}
     except Exception as e:
         return {"connected": False, "url": url, "error": str(e)}
 
 
 @router.get("/ollama-status")
-async def ollama_status():
-    # padrão do Ollama local
-    host = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434").rstrip("/")
+async def ollama_status(request: Request, response: Response):
+    return _probe_response(request, response, "ollama", await check_ollama_status())
+
+
+async def check_ollama_status() -> dict:
+    """Status do Ollama (cacheado); compartilhado com o /ws/status."""
+    return await _cached_probe("ollama", _fetch_ollama_status)
+
+
+async def _fetch_ollama_status() -> dict:
+    host = _OLLAMA_HOST
     try:
-        async with httpx.AsyncClient(timeout=2.0) as client:
-            r = await client.get(f"{host}/api/tags")
-            r.raise_for_status()
-            data = r.json() or {}
-            models = []
-            for m in (data.get("models") or []):
-                name = m.get("name")
-                if name:
-                    models.append(name)
-            return {"connected": True, "host": host, "models": models}
+        r = await get_http_client().get(f"{host}/api/tags", timeout=_OLLAMA_TIMEOUT)
+        r.raise_for_status()
+        data = r.json() or {}
+        names = data.get("models") or []
+        get = dict.get
+        models = [n for m in names if type(m) is dict and (n := get(m, "name"))]
+        return {"connected": True, "host": host, "models": models}
     except Exception as e:
         return {"connected": False, "host": host, "models": [], "error": str(e)}
 
 
 @router.get("/ollama-info")
-async def ollama_info():
+async def ollama_info(request: Request, response: Response):
     """
     Retorna informações detalhadas do Ollama:
     - Modelos disponíveis (via /api/tags)
     - Modelos em execução com uso de VRAM (via /api/ps)
     - Detecção de GPU vs CPU
     """
-    host = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434").rstrip("/")
+    data = await _cached_probe("ollama_info", _fetch_ollama_info)
+    return _probe_response(request, response, "ollama_info", data)
+
+
+async def _fetch_ollama_info() -> dict:
+    host = _OLLAMA_HOST
     result = {
         "connected": False,
         "host": host,
@@ -81,45 +166,51 @@ async def ollama_info():
         }
     }
 
+    get = dict.get
     try:
-        async with httpx.AsyncClient(timeout=3.0) as client:
-            # 1. Buscar modelos disponíveis via /api/tags
-            tags_resp = await client.get(f"{host}/api/tags")
-            if tags_resp.status_code == 200:
-                tags_data = tags_resp.json() or {}
-                result["connected"] = True
-                for m in tags_data.get("models", []):
-                    model_info = {
-                        "name": m.get("name"),
-                        "size": m.get("size"),
-                        "parameter_size": m.get("details", {}).get("parameter_size"),
-                        "quantization": m.get("details", {}).get("quantization_level"),
-                        "family": m.get("details", {}).get("family"),
-                    }
-                    result["models"].append(model_info)
-
-            # 2. Buscar modelos em execução via /api/ps (info de VRAM)
-            ps_resp = await client.get(f"{host}/api/ps")
-            if ps_resp.status_code == 200:
-                ps_data = ps_resp.json() or {}
-                for model in ps_data.get("models", []):
-                    size_vram = model.get("size_vram", 0)
-                    size_total = model.get("size", 0)
-
-                    running_info = {
-                        "name": model.get("name"),
-                        "size_vram_bytes": size_vram,
-                        "size_vram_mb": round(size_vram / (1024 * 1024), 1) if size_vram else 0,
-                        "size_total_bytes": size_total,
-                        "expires_at": model.get("expires_at"),
-                        "using_gpu": size_vram > 0
-                    }
-                    result["running_models"].append(running_info)
-
-                    # Atualizar info de GPU agregada
-                    if size_vram > 0:
-                        result["gpu_info"]["using_gpu"] = True
-                        result["gpu_info"]["vram_used_mb"] += running_info["size_vram_mb"]
+        client = get_http_client()
+        # 1. Buscar modelos disponíveis via /api/tags
+        tags_resp = await client.get(f"{host}/api/tags", timeout=_OLLAMA_INFO_TIMEOUT)
+        if tags_resp.status_code == 200:
+            tags_data = tags_resp.json() or {}
+            result["connected"] = True
+            models = result["models"]
+            for m in (tags_data.get("models") or []):
+                if type(m) is not dict:
+                    continue
+                details = get(m, "details") or {}
+                models.append({
+                    "name": get(m, "name"),
+                    "size": get(m, "size"),
+                    "parameter_size": get(details, "parameter_size"),
+                    "quantization": get(details, "quantization_level"),
+                    "family": get(details, "family"),
+                })
+
+        # 2. Buscar modelos em execução via /api/ps (info de VRAM)
+        ps_resp = await client.get(f"{host}/api/ps", timeout=_OLLAMA_INFO_TIMEOUT)
+        if ps_resp.status_code == 200:
+            ps_data = ps_resp.json() or {}
+            running = result["running_models"]
+            gpu_info = result["gpu_info"]
+            for model in (ps_data.get("models") or []):
+                if type(model) is not dict:
+                    continue
+                size_vram = get(model, "size_vram", 0)
+                size_vram_mb = round(size_vram / (1024 * 1024), 1) if size_vram else 0
+                running.append({
+                    "name": get(model, "name"),
+                    "size_vram_bytes": size_vram,
+                    "size_vram_mb": size_vram_mb,
+                    "size_total_bytes": get(model, "size", 0),
+                    "expires_at": get(model, "expires_at"),
+                    "using_gpu": size_vram > 0
+                })
+
+                # Atualizar info de GPU agregada
+                if size_vram > 0:
+                    gpu_info["using_gpu"] = True
+                    gpu_info["vram_used_mb"] += size_vram_mb
 
     except Exception as e:
         result["error"] = str(e)
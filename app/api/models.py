@@ -1,16 +1,26 @@
-from fastapi import APIRouter, Header
+from fastapi import APIRouter, Header, Response
 from typing import Optional
 import httpx
 import re
 import asyncio
+import json
 import time
 import logging
+from functools import lru_cache, partial
+from pathlib import Path
 
-from app.config import OLLAMA_HOST
+from app.config import MODELS_CACHE_AUTO_REFRESH, OLLAMA_HOST
+from app.services.http_pool import get_http_client
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Timeouts por estágio: o connect tem orçamento próprio, menor no Ollama local, maior
+# nos hosts remotos (TLS), sem que um handshake lento consuma o tempo de leitura
+_OLLAMA_TAGS_TIMEOUT = httpx.Timeout(2.0, connect=1.0)
+_OPENAI_MODELS_TIMEOUT = httpx.Timeout(5.0, connect=2.0)
+_PERPLEXITY_DOCS_TIMEOUT = httpx.Timeout(6.0, connect=2.0)
+
 # =============================================================================
 # Cache de modelos por provider
 # =============================================================================
@@ -24,6 +34,55 @@ _MODELS_CACHE: dict[str, set[str]] = {
 _CACHE_TIMESTAMP: float = 0
 _CACHE_TTL: float = 300  # 5 minutos
 
+# Índice invertido nome -> provider, reconstruído a cada atualização de _MODELS_CACHE
+_NAME_TO_PROVIDER: dict[str, str] = {}
+# Ordem inversa de prioridade: quem vem depois sobrescreve (ollama, local, ganha)
+_PROVIDER_LOOKUP_ORDER = ("perplexity", "openai", "ollama")
+
+
+# Snapshot em disco (só nomes de modelos, nunca as chaves): um worker reiniciado dentro
+# do TTL começa com o cache quente em vez de refazer as consultas aos providers
+_MODELS_CACHE_PATH = Path(__file__).resolve().parents[2] / "data" / "models_cache.json"
+
+
+def _save_models_cache_to_disk(cache: dict[str, set[str]], ts: float) -> None:
+    try:
+        _MODELS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        data = {"ts": ts, "cache": {k: sorted(v) for k, v in cache.items()}}
+        _MODELS_CACHE_PATH.write_text(json.dumps(data), encoding="utf-8")
+    except Exception as e:
+        logger.debug("Failed to save models cache to disk: %s", e)
+
+
+def _load_models_cache_from_disk() -> None:
+    global _MODELS_CACHE, _CACHE_TIMESTAMP
+    if not _MODELS_CACHE_PATH.exists():
+        return
+    try:
+        data = json.loads(_MODELS_CACHE_PATH.read_text(encoding="utf-8"))
+        ts = float(data.get("ts") or 0)
+        if time.time() - ts >= _CACHE_TTL:
+            return
+        loaded = {k: set(v) for k, v in (data.get("cache") or {}).items() if k in _MODELS_CACHE}
+        _MODELS_CACHE = {**_MODELS_CACHE, **loaded}
+        _CACHE_TIMESTAMP = ts
+        _rebuild_provider_index()
+    except Exception as e:
+        logger.debug("Failed to load models cache from disk: %s", e)
+
+
+def _rebuild_provider_index() -> None:
+    """Reconstrói _NAME_TO_PROVIDER e o publica numa única atribuição."""
+    global _NAME_TO_PROVIDER
+    index: dict[str, str] = {}
+    for provider in _PROVIDER_LOOKUP_ORDER:
+        for name in _MODELS_CACHE[provider]:
+            index[name] = provider
+    _NAME_TO_PROVIDER = index
+
+
+_load_models_cache_from_disk()
+
 # Armazena as chaves API para refresh do cache
 _API_KEYS: dict[str, Optional[str]] = {
     "openai": None,
@@ -47,13 +106,15 @@ EMBEDDING_MODEL_PATTERNS = [
     r"snowflake-arctic-embed",
 ]
 
+# Os padrões são substrings literais (sem metacaracteres): busca por `in` dispensa o
+# motor de regex, e o resultado por nome fica memorizado entre os polls de /all-models
+_EMBEDDING_MODEL_SUBSTRINGS = tuple(EMBEDDING_MODEL_PATTERNS)
+
+@lru_cache(maxsize=1024)
 def is_embedding_model(model_name: str) -> bool:
     """Detecta se um modelo é de embedding baseado no nome."""
     name_lower = model_name.lower()
-    for pattern in EMBEDDING_MODEL_PATTERNS:
-        if re.search(pattern, name_lower):
-            return True
-    return False
+    return any(p in name_lower for p in _EMBEDDING_MODEL_SUBSTRINGS)
 
 PERPLEXITY_MODEL_DOC_PAGES = [
     "https://docs.perplexity.ai/getting-started/models/models/sonar",
@@ -68,21 +129,89 @@ PERPLEXITY_FALLBACK_MODELS = [
     "sonar-reasoning-pro",
 ]
 
+# Consultas externas em andamento por chave: chamadas concorrentes (ex.: várias abas
+# abrindo ao mesmo tempo) aguardam a mesma task em vez de repetir a requisição
+_INFLIGHT: dict[str, asyncio.Task] = {}
+
+
+def _inflight_task(key: str, factory) -> asyncio.Task:
+    """Task em andamento para `key`, criada a partir de `factory()` se ainda não houver."""
+    task = _INFLIGHT.get(key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        _INFLIGHT[key] = task
+
+        def _done(t: asyncio.Task) -> None:
+            if _INFLIGHT.get(key) is t:
+                del _INFLIGHT[key]
+
+        task.add_done_callback(_done)
+    return task
+
+
+async def _single_flight(key: str, factory):
+    # shield: o cancelamento de um chamador não derruba a consulta dos demais
+    return await asyncio.shield(_inflight_task(key, factory))
+
+
+def _log_background_failure(task: asyncio.Task) -> None:
+    """Consome e registra no logger o erro de uma task que ninguém aguarda."""
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        logger.exception("Background models cache refresh failed", exc_info=exc)
+
+
+# As páginas de modelos da Perplexity mudam raramente: o resultado do scraping vale por
+# 1h (falhas, só por alguns minutos) e cada página é revalidada com If-None-Match
+_PPLX_DOCS_TTL = 3600.0
+_PPLX_DOCS_EMPTY_TTL = 300.0
+_PPLX_DOCS_CACHE: dict = {"expires": 0.0, "models": []}
+# Busca direto nos bytes da página: dispensa decodificar o HTML inteiro para str
+_PPLX_MODEL_RE = re.compile(rb'"model"\s*:\s*"([^"]+)"')
+# url -> (ETag, modelos encontrados na página)
+_PPLX_PAGE_CACHE: dict[str, tuple[str, list[str]]] = {}
+
+
 async def fetch_perplexity_models_from_docs() -> list[str]:
-    async with httpx.AsyncClient(timeout=6.0, follow_redirects=True) as client:
-        tasks = [client.get(url) for url in PERPLEXITY_MODEL_DOC_PAGES]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+    if time.monotonic() < _PPLX_DOCS_CACHE["expires"]:
+        return _PPLX_DOCS_CACHE["models"]
+    found = await _single_flight("perplexity_docs", _scrape_perplexity_models)
+    ttl = _PPLX_DOCS_TTL if found else _PPLX_DOCS_EMPTY_TTL
+    _PPLX_DOCS_CACHE.update(expires=time.monotonic() + ttl, models=found)
+    return found
+
+
+def invalidate_perplexity_docs_cache() -> None:
+    _PPLX_DOCS_CACHE.update(expires=0.0, models=[])
+
+
+async def _scrape_perplexity_models() -> list[str]:
+    client = get_http_client()
+    tasks = []
+    for url in PERPLEXITY_MODEL_DOC_PAGES:
+        cached = _PPLX_PAGE_CACHE.get(url)
+        headers = {"If-None-Match": cached[0]} if cached else None
+        tasks.append(client.get(url, headers=headers, timeout=_PERPLEXITY_DOCS_TIMEOUT, follow_redirects=True))
+    results = await asyncio.gather(*tasks, return_exceptions=True)
 
     found = set()
-    pattern = re.compile(r'"model"\s*:\s*"([^"]+)"')
 
-    for r in results:
+    for url, r in zip(PERPLEXITY_MODEL_DOC_PAGES, results):
         if isinstance(r, Exception):
             continue
+        if r.status_code == 304 and url in _PPLX_PAGE_CACHE:
+            # Página não mudou desde o último scraping
+            found.update(_PPLX_PAGE_CACHE[url][1])
+            continue
         if r.status_code != 200:
             continue
-        for m in pattern.findall(r.text):
-            found.add(m)
+        page_models = [m.decode("utf-8", "replace") for m in _PPLX_MODEL_RE.findall(r.content)]
+        etag = r.headers.get("etag")
+        if etag:
+            _PPLX_PAGE_CACHE[url] = (etag, page_models)
+        found.update(page_models)
 
     return sorted(found)
 
@@ -93,14 +222,17 @@ async def fetch_perplexity_models_from_docs() -> list[str]:
 
 async def _fetch_ollama_models() -> set[str]:
     """Busca modelos disponíveis no Ollama local."""
-    models = set()
+    return set(await _single_flight("ollama_tags", _fetch_ollama_tags))
+
+
+async def _fetch_ollama_tags() -> list[str]:
+    """Nomes dos modelos do Ollama na ordem de /api/tags (vazio se indisponível)."""
+    models = []
     try:
-        async with httpx.AsyncClient(timeout=2.0) as client:
-            r = await client.get(f"{OLLAMA_HOST}/api/tags")
-            if r.status_code == 200:
-                data = r.json()
-                for m in data.get("models", []):
-                    models.add(m["name"])
+        r = await get_http_client().get(f"{OLLAMA_HOST}/api/tags", timeout=_OLLAMA_TAGS_TIMEOUT)
+        if r.status_code == 200:
+            data = r.json()
+            models = [m["name"] for m in data.get("models", [])]
     except Exception as e:
         logger.debug("Failed to fetch Ollama models: %s", e)
     return models
@@ -119,17 +251,21 @@ async def get_first_available_ollama_llm() -> str | None:
 
 async def _fetch_openai_models(api_key: str) -> set[str]:
     """Busca modelos disponíveis na API OpenAI."""
-    models = set()
+    return set(await _fetch_openai_model_ids(api_key))
+
+
+async def _fetch_openai_model_ids(api_key: str) -> list[str]:
+    """IDs de /v1/models na ordem da API (vazio se a chamada falhar)."""
+    models = []
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            r = await client.get(
-                "https://api.openai.com/v1/models",
-                headers={"Authorization": f"Bearer {api_key}"},
-            )
-            if r.status_code == 200:
-                data = r.json()
-                for m in data.get("data", []):
-                    models.add(m["id"])
+        r = await get_http_client().get(
+            "https://api.openai.com/v1/models",
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=_OPENAI_MODELS_TIMEOUT,
+        )
+        if r.status_code == 200:
+            data = r.json()
+            models = [m["id"] for m in data.get("data", [])]
     except Exception as e:
         logger.debug("Failed to fetch OpenAI models: %s", e)
     return models
@@ -146,6 +282,13 @@ async def _fetch_perplexity_models() -> set[str]:
     return set(PERPLEXITY_FALLBACK_MODELS)
 
 
+_REFRESH_LOCK = asyncio.Lock()
+
+
+def _models_cache_fresh() -> bool:
+    return (time.time() - _CACHE_TIMESTAMP) < _CACHE_TTL and bool(_MODELS_CACHE["ollama"])
+
+
 async def refresh_models_cache(
     openai_key: Optional[str] = None,
     perplexity_key: Optional[str] = None,
@@ -168,45 +311,54 @@ async def refresh_models_cache(
         _API_KEYS["perplexity"] = perplexity_key
 
     # Verifica se cache ainda é válido
-    now = time.time()
-    if not force and (now - _CACHE_TIMESTAMP) < _CACHE_TTL and _MODELS_CACHE["ollama"]:
+    if not force and _models_cache_fresh():
         return
 
-    logger.debug("Refreshing models cache...")
+    # Um refresh por vez: quem chegar durante um refresh reaproveita o resultado dele
+    async with _REFRESH_LOCK:
+        if not force and _models_cache_fresh():
+            return
 
-    async def _empty_set() -> set[str]:
-        return set()
+        now = time.time()
+        logger.debug("Refreshing models cache...")
 
-    # Busca modelos em paralelo
-    tasks = [_fetch_ollama_models()]
+        async def _empty_set() -> set[str]:
+            return set()
 
-    if _API_KEYS["openai"]:
-        tasks.append(_fetch_openai_models(_API_KEYS["openai"]))
-    else:
-        tasks.append(_empty_set())
+        # Busca modelos em paralelo
+        tasks = [_fetch_ollama_models()]
 
-    if _API_KEYS["perplexity"]:
-        tasks.append(_fetch_perplexity_models())
-    else:
-        tasks.append(_empty_set())
+        if _API_KEYS["openai"]:
+            tasks.append(_fetch_openai_models(_API_KEYS["openai"]))
+        else:
+            tasks.append(_empty_set())
 
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+        if _API_KEYS["perplexity"]:
+            tasks.append(_fetch_perplexity_models())
+        else:
+            tasks.append(_empty_set())
 
-    # Atualiza cache
-    if not isinstance(results[0], Exception):
-        _MODELS_CACHE["ollama"] = results[0]
-    if not isinstance(results[1], Exception) and results[1]:
-        _MODELS_CACHE["openai"] = results[1]
-    if not isinstance(results[2], Exception) and results[2]:
-        _MODELS_CACHE["perplexity"] = results[2]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
 
-    _CACHE_TIMESTAMP = now
-    logger.debug(
-        "Models cache updated: ollama=%d, openai=%d, perplexity=%d",
-        len(_MODELS_CACHE["ollama"]),
-        len(_MODELS_CACHE["openai"]),
-        len(_MODELS_CACHE["perplexity"]),
-    )
+        # Atualiza cache (copy-on-write: leitores nunca veem um dict pela metade)
+        updated = dict(_MODELS_CACHE)
+        if not isinstance(results[0], Exception):
+            updated["ollama"] = results[0]
+        if not isinstance(results[1], Exception) and results[1]:
+            updated["openai"] = results[1]
+        if not isinstance(results[2], Exception) and results[2]:
+            updated["perplexity"] = results[2]
+
+        _MODELS_CACHE = updated
+        _CACHE_TIMESTAMP = now
+        _rebuild_provider_index()
+        await asyncio.to_thread(_save_models_cache_to_disk, updated, now)
+        logger.debug(
+            "Models cache updated: ollama=%d, openai=%d, perplexity=%d",
+            len(updated["ollama"]),
+            len(updated["openai"]),
+            len(updated["perplexity"]),
+        )
 
 
 def get_provider_for_model(
@@ -227,13 +379,10 @@ def get_provider_for_model(
     if not model_name:
         return "ollama"
 
-    # Verifica no cache (ordem: ollama primeiro, pois é local)
-    if model_name in _MODELS_CACHE["ollama"]:
-        return "ollama"
-    if model_name in _MODELS_CACHE["openai"]:
-        return "openai"
-    if model_name in _MODELS_CACHE["perplexity"]:
-        return "perplexity"
+    # Verifica no cache (ollama tem prioridade, pois é local)
+    provider = _NAME_TO_PROVIDER.get(model_name)
+    if provider:
+        return provider
 
     # Fallback: heurística baseada no nome
     name_lower = model_name.lower()
@@ -250,6 +399,63 @@ def get_provider_for_model(
     return "ollama"
 
 
+@router.post("/api/models/refresh")
+async def refresh_models(
+    openai_api_key: Optional[str] = Header(None, alias="X-OpenAI-Key"),
+    perplexity_api_key: Optional[str] = Header(None, alias="X-Perplexity-Key"),
+):
+    """Descarta os caches de modelos (inclusive o scraping da Perplexity) e recarrega."""
+    invalidate_perplexity_docs_cache()
+    _ALL_MODELS_CACHE.update(models=None)
+    await refresh_models_cache(openai_key=openai_api_key, perplexity_key=perplexity_api_key, force=True)
+    return {provider: len(names) for provider, names in _MODELS_CACHE.items()}
+
+
+# =============================================================================
+# Refresh periódico em background (MODELS_CACHE_AUTO_REFRESH)
+# =============================================================================
+
+_REFRESHER_TASK: Optional[asyncio.Task] = None
+
+
+async def _models_cache_refresher() -> None:
+    while True:
+        try:
+            keys = _ALL_MODELS_CACHE["keys"]
+            if keys is not None:
+                # Remonta também a resposta de /all-models para as últimas chaves recebidas
+                await _single_flight(f"all_models:{hash(keys)}", partial(_build_all_models, *keys))
+            else:
+                await refresh_models_cache(force=True)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Background models cache refresh failed")
+        # Um pouco antes do TTL, para que as requests nunca encontrem o cache vencido
+        await asyncio.sleep(_CACHE_TTL * 0.9)
+
+
+async def start_models_refresher() -> None:
+    """Inicia o refresh periódico do cache de modelos, se habilitado na config."""
+    global _REFRESHER_TASK
+    if not MODELS_CACHE_AUTO_REFRESH:
+        return
+    if _REFRESHER_TASK is None or _REFRESHER_TASK.done():
+        _REFRESHER_TASK = asyncio.create_task(_models_cache_refresher())
+
+
+async def stop_models_refresher() -> None:
+    """Cancela o refresh periódico do cache de modelos."""
+    global _REFRESHER_TASK
+    task, _REFRESHER_TASK = _REFRESHER_TASK, None
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
 # Modelos Anthropic conhecidos (fallback)
 ANTHROPIC_FALLBACK_MODELS = [
     "claude-3-5-sonnet-20241022",
@@ -260,12 +466,44 @@ ANTHROPIC_FALLBACK_MODELS = [
 ]
 
 
+# Última resposta de /all-models e o conjunto de chaves com que foi montada
+_ALL_MODELS_CACHE: dict = {"ts": 0.0, "keys": None, "models": None}
+
+
 @router.get("/api/all-models")
 async def get_all_models(
+    response: Response,
     openai_api_key: Optional[str] = Header(None, alias="X-OpenAI-Key"),
     perplexity_api_key: Optional[str] = Header(None, alias="X-Perplexity-Key"),
     anthropic_api_key: Optional[str] = Header(None, alias="X-Anthropic-Key"),
 ):
+    # A lista depende das chaves enviadas: "private" para proxies não compartilharem entre usuários
+    response.headers["Cache-Control"] = "private, max-age=60, stale-while-revalidate=300"
+    keys = (openai_api_key, perplexity_api_key, anthropic_api_key)
+    flight_key = f"all_models:{hash(keys)}"
+    cached = _ALL_MODELS_CACHE
+    if cached["models"] is not None and cached["keys"] == keys:
+        if time.time() - cached["ts"] < _CACHE_TTL:
+            response.headers["X-Cache"] = "HIT"
+        else:
+            # stale-while-revalidate: responde com a lista anterior e atualiza em background
+            if flight_key not in _INFLIGHT:
+                # Ninguém aguarda esta task: o callback registra a falha no logger do app
+                task = _inflight_task(flight_key, lambda: _build_all_models(*keys))
+                task.add_done_callback(_log_background_failure)
+            response.headers["X-Cache"] = "STALE"
+        return {"models": cached["models"]}
+
+    response.headers["X-Cache"] = "MISS"
+    return {"models": await _single_flight(flight_key, lambda: _build_all_models(*keys))}
+
+
+async def _build_all_models(
+    openai_api_key: Optional[str],
+    perplexity_api_key: Optional[str],
+    anthropic_api_key: Optional[str],
+) -> list[dict]:
+    """Consulta os providers, atualiza os caches de modelos e devolve a lista de /all-models."""
     global _MODELS_CACHE, _CACHE_TIMESTAMP, _API_KEYS
 
     models = []
@@ -282,62 +520,46 @@ async def get_all_models(
     if anthropic_api_key:
         _API_KEYS["anthropic"] = anthropic_api_key
 
+    async def _empty_list() -> list[str]:
+        return []
+
+    # Os três upstreams são independentes: consulta em paralelo (latência = o mais lento)
+    ollama_list, openai_list, perplexity_list = await asyncio.gather(
+        _single_flight("ollama_tags", _fetch_ollama_tags),
+        _fetch_openai_model_ids(openai_api_key) if openai_api_key else _empty_list(),
+        _fetch_perplexity_models() if perplexity_api_key else _empty_list(),
+    )
+
     # Ollama models
-    try:
-        async with httpx.AsyncClient(timeout=2.0) as client:
-            r = await client.get(f"{OLLAMA_HOST}/api/tags")
-            if r.status_code == 200:
-                data = r.json()
-                for m in data.get("models", []):
-                    name = m["name"]
-                    ollama_names.add(name)
-                    model_type = "embedding" if is_embedding_model(name) else "llm"
-                    models.append({
-                        "name": name,
-                        "provider": "ollama",
-                        "type": model_type
-                    })
-    except Exception:
-        pass
+    for name in ollama_list:
+        ollama_names.add(name)
+        model_type = "embedding" if is_embedding_model(name) else "llm"
+        models.append({
+            "name": name,
+            "provider": "ollama",
+            "type": model_type
+        })
 
     # OpenAI models
-    if openai_api_key:
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                r = await client.get(
-                    "https://api.openai.com/v1/models",
-                    headers={"Authorization": f"Bearer {openai_api_key}"},
-                )
-                if r.status_code == 200:
-                    data = r.json()
-                    for m in data.get("data", []):
-                        model_id = m["id"]
-                        openai_names.add(model_id)
-                        # OpenAI: text-embedding-* são modelos de embedding
-                        if "embedding" in model_id.lower():
-                            models.append({
-                                "name": model_id,
-                                "provider": "openai",
-                                "type": "embedding"
-                            })
-                        elif "gpt" in model_id.lower() or model_id.startswith("o1-"):
-                            models.append({
-                                "name": model_id,
-                                "provider": "openai",
-                                "type": "llm"
-                            })
-        except Exception:
-            pass
+    for model_id in openai_list:
+        openai_names.add(model_id)
+        # OpenAI: text-embedding-* são modelos de embedding
+        if "embedding" in model_id.lower():
+            models.append({
+                "name": model_id,
+                "provider": "openai",
+                "type": "embedding"
+            })
+        elif "gpt" in model_id.lower() or model_id.startswith("o1-"):
+            models.append({
+                "name": model_id,
+                "provider": "openai",
+                "type": "llm"
+            })
 
     # Perplexity models (best-effort via docs + fallback)
     if perplexity_api_key:
-        try:
-            p_models = await fetch_perplexity_models_from_docs()
-            if not p_models:
-                p_models = PERPLEXITY_FALLBACK_MODELS
-        except Exception:
-            p_models = PERPLEXITY_FALLBACK_MODELS
-
+        p_models = sorted(perplexity_list)
         perplexity_names = set(p_models)
 
         # Perplexity models são todos LLMs (não têm modelos de embedding)
@@ -356,19 +578,28 @@ async def get_all_models(
             "type": "llm"
         } for name in ANTHROPIC_FALLBACK_MODELS)
 
-    # Atualiza cache com os modelos encontrados
-    _MODELS_CACHE["ollama"] = ollama_names
+    # Atualiza cache com os modelos encontrados (novo dict, publicado de uma vez)
+    updated = dict(_MODELS_CACHE)
+    updated["ollama"] = ollama_names
     if openai_names:
-        _MODELS_CACHE["openai"] = openai_names
+        updated["openai"] = openai_names
     if perplexity_names:
-        _MODELS_CACHE["perplexity"] = perplexity_names
+        updated["perplexity"] = perplexity_names
     if anthropic_names:
-        _MODELS_CACHE["anthropic"] = anthropic_names
+        updated["anthropic"] = anthropic_names
+    _MODELS_CACHE = updated
     _CACHE_TIMESTAMP = time.time()
+    _rebuild_provider_index()
+    await asyncio.to_thread(_save_models_cache_to_disk, updated, _CACHE_TIMESTAMP)
 
     logger.debug(
         "Models cache updated via /all-models: ollama=%d, openai=%d, perplexity=%d, anthropic=%d",
         len(ollama_names), len(openai_names), len(perplexity_names), len(anthropic_names),
     )
 
-    return {"models": models}
+    _ALL_MODELS_CACHE.update(
+        ts=_CACHE_TIMESTAMP,
+        keys=(openai_api_key, perplexity_api_key, anthropic_api_key),
+        models=models,
+    )
+    return models
@@ -6,12 +6,17 @@ Endpoints para geração de questões AllInOne (kprim, mc, sc).
 from fastapi import APIRouter, Depends, Header, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 import json
 import logging
 import uuid
 from datetime import datetime, timezone
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 from app.services.ollama import ollama_generate_stream
 from app.services.api_providers import openai_generate_stream, perplexity_generate_stream
 from app.services.question_parser import (
@@ -19,7 +24,8 @@ from app.services.question_parser import (
     normalize_questions,
 )
 from app.utils.text import truncate_source
-from app.core.prompts import PROMPTS
+from app.core import prompts
+from app.core.prompts import render
 from app.api.models import get_provider_for_model, get_first_available_ollama_llm
 
 router = APIRouter(prefix="/api", tags=["questions"])
@@ -110,13 +116,13 @@ def _build_generation_prompt(
     """
     # System prompt baseado no tipo
     if question_type == "kprim":
-        system = PROMPTS["QUESTION_GENERATION_SYSTEM_KPRIM"]
+        system = prompts.QUESTION_GENERATION_SYSTEM_KPRIM
     elif question_type == "mc":
-        system = PROMPTS["QUESTION_GENERATION_SYSTEM_MC"]
+        system = prompts.QUESTION_GENERATION_SYSTEM_MC
     elif question_type == "sc":
-        system = PROMPTS["QUESTION_GENERATION_SYSTEM_SC"]
+        system = prompts.QUESTION_GENERATION_SYSTEM_SC
     else:
-        system = PROMPTS["QUESTION_GENERATION_SYSTEM"]
+        system = prompts.QUESTION_GENERATION_SYSTEM
 
     # Calcula quantidade
     if num_questions:
@@ -149,18 +155,17 @@ def _build_generation_prompt(
         ctx_block = context[:2000]
 
     # Monta o prompt
-    prompt_template = PROMPTS["QUESTION_GENERATION_PROMPT"]
-    guidelines = PROMPTS["QUESTION_GENERATION_GUIDELINES"]
-    format_block = PROMPTS["QUESTION_GENERATION_FORMAT"]
-
-    prompt = prompt_template.replace("${guidelines}", guidelines)
-    prompt = prompt.replace("${src}", truncate_source(text, 4000))
-    prompt = prompt.replace("${ctx_block}", ctx_block)
-    prompt = prompt.replace("${target_min}", str(target_min))
-    prompt = prompt.replace("${target_max}", str(target_max))
-    prompt = prompt.replace("${question_type}", type_instruction)
-    prompt = prompt.replace("${domain_instruction}", domain_instruction)
-    prompt = prompt.replace("${format_block}", format_block)
+    prompt = render(
+        "QUESTION_GENERATION_PROMPT",
+        guidelines=prompts.QUESTION_GENERATION_GUIDELINES,
+        src=truncate_source(text, 4000),
+        ctx_block=ctx_block,
+        target_min=str(target_min),
+        target_max=str(target_max),
+        question_type=type_instruction,
+        domain_instruction=domain_instruction,
+        format_block=prompts.QUESTION_GENERATION_FORMAT,
+    )
 
     return system, prompt
 
@@ -170,17 +175,21 @@ def _build_parse_prompt(text: str) -> tuple[str, str]:
     Constrói o prompt para parsing de questões de texto livre.
     Retorna (system_prompt, user_prompt).
     """
-    system = PROMPTS["QUESTION_PARSE_SYSTEM"]
-    prompt = PROMPTS["QUESTION_PARSE_PROMPT"].replace("${text}", text[:8000])
+    system = prompts.QUESTION_PARSE_SYSTEM
+    prompt = render("QUESTION_PARSE_PROMPT", text=text[:8000])
     return system, prompt
 
 
 # =============================================================================
 # SSE Event Helpers
 # =============================================================================
-def _sse_event(event: str, data: dict) -> str:
-    """Formata um evento SSE."""
-    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+def _sse_event(event: str, data: dict) -> bytes:
+    """Formata um evento SSE já em bytes (orjson quando disponível)."""
+    if orjson is not None:
+        payload = orjson.dumps(data)
+    else:
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    return b"event: " + event.encode("ascii") + b"\ndata: " + payload + b"\n\n"
 
 
 # =============================================================================
@@ -234,7 +243,7 @@ async def generate_questions_stream(
             yield _sse_event("generating", {"status": "calling_llm"})
 
             # Chama o LLM
-            raw_response = ""
+            response_parts: List[str] = []
             options = {"temperature": 0.5, "num_predict": 4096}
 
             try:
@@ -242,17 +251,17 @@ async def generate_questions_stream(
                     async for piece in openai_generate_stream(
                         api_keys.openai, model, prompt, system=system, options=options
                     ):
-                        raw_response += piece
+                        response_parts.append(piece)
                 elif provider == "perplexity" and api_keys.perplexity:
                     async for piece in perplexity_generate_stream(
                         api_keys.perplexity, model, prompt, system=system, options=options
                     ):
-                        raw_response += piece
+                        response_parts.append(piece)
                 else:
                     async for piece in ollama_generate_stream(
                         model, prompt, system=system, options=options
                     ):
-                        raw_response += piece
+                        response_parts.append(piece)
             except Exception as e:
                 logger.error("LLM generation failed: %s", e)
                 yield _sse_event("error", {"message": f"Erro na geração: {str(e)}"})
@@ -260,6 +269,8 @@ async def generate_questions_stream(
 
             yield _sse_event("parsing", {"status": "parsing_response"})
 
+            raw_response = "".join(response_parts)
+
             # Parseia as questões
             questions = parse_questions(raw_response)
 
@@ -340,7 +351,7 @@ async def parse_questions_stream(
             yield _sse_event("parsing", {"status": "calling_llm"})
 
             # Chama o LLM
-            raw_response = ""
+            response_parts: List[str] = []
             options = {"temperature": 0.3, "num_predict": 4096}
 
             try:
@@ -348,22 +359,24 @@ async def parse_questions_stream(
                     async for piece in openai_generate_stream(
                         api_keys.openai, model, prompt, system=system, options=options
                     ):
-                        raw_response += piece
+                        response_parts.append(piece)
                 elif provider == "perplexity" and api_keys.perplexity:
                     async for piece in perplexity_generate_stream(
                         api_keys.perplexity, model, prompt, system=system, options=options
                     ):
-                        raw_response += piece
+                        response_parts.append(piece)
                 else:
                     async for piece in ollama_generate_stream(
                         model, prompt, system=system, options=options
                     ):
-                        raw_response += piece
+                        response_parts.append(piece)
             except Exception as e:
                 logger.error("LLM parsing failed: %s", e)
                 yield _sse_event("error", {"message": f"Erro no parsing: {str(e)}"})
                 return
 
+            raw_response = "".join(response_parts)
+
             # Parseia as questões
             questions = parse_questions(raw_response)
 
@@ -407,16 +420,16 @@ async def get_question_prompts():
     """
     return {
         "system": {
-            "general": PROMPTS["QUESTION_GENERATION_SYSTEM"],
-            "kprim": PROMPTS["QUESTION_GENERATION_SYSTEM_KPRIM"],
-            "mc": PROMPTS["QUESTION_GENERATION_SYSTEM_MC"],
-            "sc": PROMPTS["QUESTION_GENERATION_SYSTEM_SC"],
+            "general": prompts.QUESTION_GENERATION_SYSTEM,
+            "kprim": prompts.QUESTION_GENERATION_SYSTEM_KPRIM,
+            "mc": prompts.QUESTION_GENERATION_SYSTEM_MC,
+            "sc": prompts.QUESTION_GENERATION_SYSTEM_SC,
         },
-        "guidelines": PROMPTS["QUESTION_GENERATION_GUIDELINES"],
-        "format": PROMPTS["QUESTION_GENERATION_FORMAT"],
-        "generation": PROMPTS["QUESTION_GENERATION_PROMPT"],
+        "guidelines": prompts.QUESTION_GENERATION_GUIDELINES,
+        "format": prompts.QUESTION_GENERATION_FORMAT,
+        "generation": prompts.QUESTION_GENERATION_PROMPT,
         "parse": {
-            "system": PROMPTS["QUESTION_PARSE_SYSTEM"],
-            "prompt": PROMPTS["QUESTION_PARSE_PROMPT"],
+            "system": prompts.QUESTION_PARSE_SYSTEM,
+            "prompt": prompts.QUESTION_PARSE_PROMPT,
         },
     }
@@ -7,10 +7,9 @@ WebSocket endpoints for real-time updates:
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 import asyncio
 import httpx
-import os
 import logging
 from typing import Dict, Set, Optional, Any
-from app.config import ANKI_CONNECT_URL
+from app.api.health import check_anki_status, check_ollama_status
 
 router = APIRouter(tags=["websocket"])
 logger = logging.getLogger(__name__)
@@ -56,38 +55,6 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
-async def check_anki_status() -> dict:
-    """Check Anki connection status."""
-    url = (ANKI_CONNECT_URL or "http://127.0.0.1:8765").rstrip("/")
-    payload = {"action": "version", "version": 6}
-    
-    try:
-        async with httpx.AsyncClient(timeout=2.5) as client:
-            r = await client.post(url, json=payload)
-            r.raise_for_status()
-            data = r.json() or {}
-            
-            ok = (data.get("error") is None) and (data.get("result") is not None)
-            if ok:
-                return {"connected": True, "version": data["result"], "url": url}
-            return {"connected": False, "url": url, "error": data.get("error")}
-    except (httpx.RequestError, httpx.HTTPStatusError) as e:
-        return {"connected": False, "url": url, "error": str(e)}
-
-async def check_ollama_status() -> dict:
-    """Check Ollama connection status."""
-    host = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434").rstrip("/")
-    
-    try:
-        async with httpx.AsyncClient(timeout=2.0) as client:
-            r = await client.get(f"{host}/api/tags")
-            r.raise_for_status()
-            data = r.json() or {}
-            models = [m.get("name") for m in (data.get("models") or []) if m.get("name")]
-            return {"connected": True, "host": host, "models": models}
-    except (httpx.RequestError, httpx.HTTPStatusError) as e:
-        return {"connected": False, "host": host, "models": [], "error": str(e)}
-
 async def status_broadcaster():
     """Background task that checks status and broadcasts changes."""
     while True:
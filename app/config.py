@@ -11,6 +11,8 @@ OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", None)
 OLLAMA_ANALYSIS_MODEL = os.getenv("OLLAMA_ANALYSIS_MODEL", None)
 # Modelo para validação de qualidade de cards (pode ser mais rápido/barato que o de geração)
 OLLAMA_VALIDATION_MODEL = os.getenv("OLLAMA_VALIDATION_MODEL", None)
+# Máximo de chamadas de validação (SRC/relevância) simultâneas ao provider, somando todas as requests
+LLM_VALIDATION_MAX_CONCURRENCY = int(os.getenv("LLM_VALIDATION_MAX_CONCURRENCY", "4"))
 OLLAMA_EMBED_URL = os.getenv("OLLAMA_EMBED_URL", f"{OLLAMA_HOST}/api/embed")
 
 # Anki
@@ -30,6 +32,12 @@ CORS_ORIGINS = os.getenv(
     "http://localhost:3000,http://localhost:5173,http://127.0.0.1:3000,http://127.0.0.1:5173"
 ).split(",")
 
+# Atualiza a lista de modelos dos providers em background a cada TTL (requests só leem o cache)
+MODELS_CACHE_AUTO_REFRESH = os.getenv("MODELS_CACHE_AUTO_REFRESH", "false").lower() in ("1", "true", "yes")
+
+# Auditoria: grava no DuckDB o resultado de cada filtro de cards (desligar economiza I/O)
+PERSIST_FILTER_RESULTS = os.getenv("PERSIST_FILTER_RESULTS", "true").lower() in ("1", "true", "yes")
+
 # Rate Limiting
 RATE_LIMIT_DEFAULT = os.getenv("RATE_LIMIT_DEFAULT", "100/minute")
 RATE_LIMIT_GENERATE = os.getenv("RATE_LIMIT_GENERATE", "10/minute")
@@ -1,28 +1,32 @@
 # app/core/prompts.py
 
-PROMPTS = {
-    # =========================
-    # Flashcards: system prompts (curtos e “duros”)
-    # =========================
-    "FLASHCARDS_SYSTEM_PTBR": (
-        "Você gera flashcards para Anki.\n"
-        "Fora do campo SRC: escreva SEMPRE em pt-BR.\n"
-        "No campo SRC: COPIE literalmente do texto-fonte.\n"
-        "NUNCA responda em espanhol.\n"
-    ),
-
-    "FLASHCARDS_SYSTEM_CLOZE": (
-        "Voce gera flashcards CLOZE para Anki.\n"
-        "REGRA: cada CLOZE pode ter uma ou multiplas lacunas: {{c1::termo}}, {{c2::termo}}, etc.\n"
-        "Fora do SRC: pt-BR. No SRC: citacao literal de <SOURCE>.\n"
-        "Cloze usa apenas CLOZE:/EXTRA:/SRC: (sem Q:/A:).\n"
-        "NUNCA responda em espanhol.\n"
-    ),
-
-    # =========================
-    # Flashcards: diretrizes essenciais (SuperMemo + Justin Sung, bem compacto)
-    # =========================
-    "FLASHCARDS_GUIDELINES": """Crie flashcards de alta retenção (SuperMemo) e que ajudem a formar rede de conhecimento (Justin Sung).
+import re
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Final, Mapping, Tuple
+
+# =========================
+# Flashcards: system prompts (curtos e “duros”)
+# =========================
+FLASHCARDS_SYSTEM_PTBR: Final[str] = (
+    "Você gera flashcards para Anki.\n"
+    "Fora do campo SRC: escreva SEMPRE em pt-BR.\n"
+    "No campo SRC: COPIE literalmente do texto-fonte.\n"
+    "NUNCA responda em espanhol.\n"
+)
+
+FLASHCARDS_SYSTEM_CLOZE: Final[str] = (
+    "Voce gera flashcards CLOZE para Anki.\n"
+    "REGRA: cada CLOZE pode ter uma ou multiplas lacunas: {{c1::termo}}, {{c2::termo}}, etc.\n"
+    "Fora do SRC: pt-BR. No SRC: citacao literal de <SOURCE>.\n"
+    "Cloze usa apenas CLOZE:/EXTRA:/SRC: (sem Q:/A:).\n"
+    "NUNCA responda em espanhol.\n"
+)
+
+# =========================
+# Flashcards: diretrizes essenciais (SuperMemo + Justin Sung, bem compacto)
+# =========================
+FLASHCARDS_GUIDELINES: Final[str] = """Crie flashcards de alta retenção (SuperMemo) e que ajudem a formar rede de conhecimento (Justin Sung).
 
 QUALIDADE:
 - 1 ideia por card (mínimo de informação). Quebre conceitos grandes.
@@ -35,22 +39,22 @@ ANCORAGEM:
 - Crie cards SOMENTE do CONTEÚDO-FONTE.
 - CONTEXTO GERAL é só para entendimento: NÃO vire card.
 - SRC deve ser citação literal do CONTEÚDO-FONTE (pode estar em inglês). Fora do SRC: pt-BR.
-""",
-
-    # =========================
-    # Flashcards: instruções por tipo
-    # =========================
-    "FLASHCARDS_TYPE_BASIC": "Gere APENAS cards básicos (Q/A). NÃO gere cloze.",
-    "FLASHCARDS_TYPE_CLOZE": (
-        "Gere APENAS cards cloze: frase afirmativa com uma ou mais lacunas {{c1::termo}}, {{c2::termo}}, etc.\n"
-        "Use prefixo CLOZE: (nao Q:). Numere as lacunas sequencialmente."
-    ),
-    "FLASHCARDS_TYPE_BOTH": "Para cada conceito importante: 1 básico (Q/A) + 1 cloze (CLOZE/EXTRA).",
-
-    # =========================
-    # Flashcards: blocos de formato (minimizados)
-    # =========================
-    "FLASHCARDS_FORMAT_BASIC": """FORMATO:
+"""
+
+# =========================
+# Flashcards: instruções por tipo
+# =========================
+FLASHCARDS_TYPE_BASIC: Final[str] = "Gere APENAS cards básicos (Q/A). NÃO gere cloze."
+FLASHCARDS_TYPE_CLOZE: Final[str] = (
+    "Gere APENAS cards cloze: frase afirmativa com uma ou mais lacunas {{c1::termo}}, {{c2::termo}}, etc.\n"
+    "Use prefixo CLOZE: (nao Q:). Numere as lacunas sequencialmente."
+)
+FLASHCARDS_TYPE_BOTH: Final[str] = "Para cada conceito importante: 1 básico (Q/A) + 1 cloze (CLOZE/EXTRA)."
+
+# =========================
+# Flashcards: blocos de formato (minimizados)
+# =========================
+FLASHCARDS_FORMAT_BASIC: Final[str] = """FORMATO:
 Q: <pergunta específica em pt-BR>
 A: <resposta curta em pt-BR>
 SRC: "<trecho literal do CONTEÚDO-FONTE>"
@@ -58,9 +62,9 @@ SRC: "<trecho literal do CONTEÚDO-FONTE>"
 REGRAS:
 - Sem {{c1::...}}.
 - Não crie cloze.
-""",
+"""
 
-    "FLASHCARDS_FORMAT_CLOZE": """FORMATO:
+FLASHCARDS_FORMAT_CLOZE: Final[str] = """FORMATO:
 CLOZE: <frase afirmativa em pt-BR com uma ou mais lacunas {{c1::termo}}, {{c2::termo}}, etc.>
 EXTRA: <1 frase curta de contexto>
 SRC: "<trecho literal de <SOURCE>>"
@@ -68,9 +72,9 @@ SRC: "<trecho literal de <SOURCE>>"
 REGRAS:
 - CLOZE pode ter multiplas lacunas numeradas sequencialmente: {{c1::}}, {{c2::}}, etc.
 - Nunca use Q:/A:.
-""",
+"""
 
-    "FLASHCARDS_FORMAT_BOTH": """FORMATO:
+FLASHCARDS_FORMAT_BOTH: Final[str] = """FORMATO:
 
 BÁSICO:
 Q: <pt-BR>
@@ -81,14 +85,30 @@ CLOZE:
 CLOZE: <pt-BR afirmativo com UMA lacuna {{c1::termo}}>
 EXTRA: <pt-BR curto>
 SRC: "<literal do CONTEÚDO-FONTE>"
-""",
+"""
 
-    # =========================
-    # Flashcards: prompt principal de geracao (com delimitadores XML)
-    # =========================
-    "FLASHCARDS_GENERATION": """${guidelines}
+# =========================
+# Flashcards: prompt principal de geracao (com delimitadores XML)
+# Blocos estaticos (diretrizes, tipo, formato, regras) primeiro e os dinamicos
+# (fonte, contexto, checklist, quantidade) no fim: o prefixo fica identico entre
+# chamadas e aproveita o prompt caching dos providers
+# =========================
+FLASHCARDS_GENERATION: Final[str] = """${guidelines}
 
-<SOURCE>
+<TYPE>
+${type_instruction}
+</TYPE>
+
+<OUTPUT_FORMAT>
+${format_block}
+</OUTPUT_FORMAT>
+
+<OUTPUT_RULES>
+- Sem markdown/listas/numeracao.
+- Uma linha em branco entre cards.
+</OUTPUT_RULES>
+
+<<<CACHE_BREAK>>><SOURCE>
 ${src}
 </SOURCE>
 
@@ -108,28 +128,26 @@ ${checklist_block}
 - SRC deve ser citacao literal de <SOURCE>.
 </INSTRUCTIONS>
 
-<TYPE>
-${type_instruction}
-</TYPE>
+COMECE:
+"""
+
+# =========================
+# Flashcards: prompt de repair (com delimitadores XML)
+# Mesma ordem do prompt de geracao: parte estatica antes da fonte
+# =========================
+FLASHCARDS_REPAIR: Final[str] = """${guidelines}
 
 <OUTPUT_FORMAT>
 ${format_block}
 </OUTPUT_FORMAT>
 
 <OUTPUT_RULES>
+- Apenas pt-BR fora do SRC.
 - Sem markdown/listas/numeracao.
 - Uma linha em branco entre cards.
 </OUTPUT_RULES>
 
-COMECE:
-""",
-
-    # =========================
-    # Flashcards: prompt de repair (com delimitadores XML)
-    # =========================
-    "FLASHCARDS_REPAIR": """${guidelines}
-
-<SOURCE>
+<<<CACHE_BREAK>>><SOURCE>
 ${src}
 </SOURCE>
 
@@ -149,6 +167,23 @@ REFACA os cards obedecendo 100% ao FORMATO e as REGRAS:
 - <CONTEXT> serve APENAS para compreensao - NAO crie cards baseados apenas em <CONTEXT>.
 </INSTRUCTIONS>
 
+COMECE (sem explicar):
+"""
+
+# =========================
+# Flashcards: repair curto (apenas tradução para pt-BR)
+# =========================
+FLASHCARDS_TRANSLATE: Final[str] = """<CARDS>
+${cards_text}
+</CARDS>
+
+<INSTRUCTIONS>
+TRADUZA os cards acima para pt-BR:
+- Traduza apenas a pergunta e a resposta; mantenha o SRC EXATAMENTE como esta (citacao literal da fonte).
+- NAO adicione, remova ou junte cards; preserve a sintaxe {{c1::...}} quando houver.
+- Nao altere o conteudo, apenas o idioma.
+</INSTRUCTIONS>
+
 <OUTPUT_FORMAT>
 ${format_block}
 </OUTPUT_FORMAT>
@@ -160,101 +195,75 @@ ${format_block}
 </OUTPUT_RULES>
 
 COMECE (sem explicar):
-""",
+"""
 
-    # =========================
-    # Validação SRC (LLM) — valida ancoragem no texto selecionado
-    # =========================
-    "SRC_VALIDATION_PROMPT": """Valide se cada card está ancorado no TEXTO SELECIONADO.
+# =========================
+# Validação combinada (LLM) — SRC + relevância numa única chamada
+# Parte fixa (instruções + texto) antes dos cards: prefixo idêntico entre lotes/passes
+# favorece o cache de prefixo dos providers.
+# =========================
+SRC_RELEVANCE_VALIDATION_PROMPT: Final[str] = """Valide cada card contra o TEXTO SELECIONADO em dois critérios.
 
 TEXTO SELECIONADO (fonte única):
 ---BEGIN_SELECTED_TEXT---
 ${src_text}
 ---END_SELECTED_TEXT---
 
-CARDS:
-${cards_text}
-
-REGRAS DE APROVAÇÃO (SIM):
-- SRC não-vazio e corresponde a trecho do texto (aceite variações de pontuação/espaços/caixa).
-- O conceito principal do FRONT está presente ou é claramente derivável do texto.
-- Reformulações e sinônimos são aceitos se o significado está no texto.
+SRC (ancoragem):
+- SIM: SRC não-vazio e corresponde a trecho do texto (aceite variações de pontuação/espaços/caixa).
+- NÃO: SRC vazio ou não encontrado no texto.
 
-REGRAS DE REJEIÇÃO (NÃO):
-- SRC vazio ou não encontrado no texto.
-- Card introduz conceito/termo técnico que NÃO aparece no texto (ex: menciona "SGBD" mas texto não menciona).
-- Card faz afirmação factual não suportada pelo texto.
+REL (conteúdo):
+- SIM: informação do card está explícita ou claramente implícita no texto (reformulações e sinônimos são aceitos).
+- NÃO: card adiciona fatos externos, faz extrapolação ou introduz conceito/termo técnico que NÃO aparece no texto.
 
 RESPONDA 1 linha por card:
-CARD_N: SIM|NÃO | motivo (máx 10 palavras)
-
-INICIE:
-""",
-
-    "SRC_VALIDATION_SYSTEM": (
-        "Você é um validador de flashcards.\n"
-        "Aprove cards bem ancorados no texto.\n"
-        "Rejeite apenas se o conceito claramente não está no texto.\n"
-        "Responda APENAS no formato pedido.\n"
-    ),
-
-    # =========================
-    # Relevance filter (LLM) — valida se informação está no texto
-    # =========================
-    "RELEVANCE_FILTER_PROMPT": """Verifique se cada card contém informação presente no TEXTO-FONTE.
-
-TEXTO-FONTE:
-${src_text}
+CARD_N: SRC=SIM|NÃO | REL=SIM|NÃO | motivo (máx 10 palavras, se algum NÃO)
 
-CARDS:
+<<<CACHE_BREAK>>>CARDS:
 ${cards_text}
 
-APROVAR (SIM): informação do card está explícita ou claramente implícita no texto.
-REJEITAR (NÃO): card adiciona fatos externos, faz extrapolação ou menciona conceitos não presentes.
-
-Responda 1 linha por card:
-N: SIM|NÃO | motivo breve (se NÃO)
-
-RESPONDA:
-""",
+INICIE:
+"""
 
-    "RELEVANCE_FILTER_SYSTEM": (
-        "Você valida a relevância de flashcards.\n"
-        "Aprove cards com informação presente no texto.\n"
-        "Responda no formato: N: SIM|NÃO | motivo\n"
-    ),
+SRC_RELEVANCE_VALIDATION_SYSTEM: Final[str] = (
+    "Você é um validador de flashcards.\n"
+    "Aprove cards bem ancorados no texto e com informação presente nele.\n"
+    "Rejeite apenas se claramente não está no texto.\n"
+    "Responda APENAS no formato: CARD_N: SRC=SIM|NÃO | REL=SIM|NÃO | motivo\n"
+)
 
-    # =========================
-    # Text analysis — compacto
-    # =========================
-    "TEXT_ANALYSIS_PT": """Extraia os conceitos mais importantes do texto para criar flashcards (definições, mecanismos, relações, contrastes).
+# =========================
+# Text analysis — compacto
+# =========================
+TEXT_ANALYSIS_PT: Final[str] = """Extraia os conceitos mais importantes do texto para criar flashcards (definições, mecanismos, relações, contrastes).
 
 TEXTO:
 ${text}
 
 Retorne um resumo estruturado e curto (3–7 bullets).
-""",
+"""
 
-    "TEXT_ANALYSIS_EN": """Extract the most important concepts for flashcards (definitions, mechanisms, relations, contrasts).
+TEXT_ANALYSIS_EN: Final[str] = """Extract the most important concepts for flashcards (definitions, mechanisms, relations, contrasts).
 
 TEXT:
 ${text}
 
 Return a short structured summary (3–7 bullets).
-""",
+"""
 
-    "TEXT_ANALYSIS_SYSTEM": "Voce e um assistente de analise de texto educacional.",
+TEXT_ANALYSIS_SYSTEM: Final[str] = "Voce e um assistente de analise de texto educacional."
 
-    # =========================
-    # Topic segmentation — marcação automática por tópico
-    # =========================
-    "TOPIC_SEGMENTATION_SYSTEM": (
-        "Você segmenta texto educacional por tipo de conteúdo.\n"
-        "Responda APENAS em JSON válido, sem explicações.\n"
-        "Extraia trechos LITERAIS do texto fornecido.\n"
-    ),
+# =========================
+# Topic segmentation — marcação automática por tópico
+# =========================
+TOPIC_SEGMENTATION_SYSTEM: Final[str] = (
+    "Você segmenta texto educacional por tipo de conteúdo.\n"
+    "Responda APENAS em JSON válido, sem explicações.\n"
+    "Extraia trechos LITERAIS do texto fornecido.\n"
+)
 
-    "TOPIC_SEGMENTATION_PROMPT": """Identifique os tópicos educacionais mais importantes no texto abaixo.
+TOPIC_SEGMENTATION_PROMPT: Final[str] = """Identifique os tópicos educacionais mais importantes no texto abaixo.
 
 CATEGORIAS (use estes IDs exatos):
 - DEFINICAO: conceitos sendo definidos ou explicados
@@ -281,12 +290,12 @@ RESPONDA apenas em JSON válido (sem markdown, sem explicações):
     {"excerpt": "trecho literal copiado do texto", "category": "DEFINICAO", "custom_name": null},
     {"excerpt": "outro trecho literal do texto", "category": "CONCEITO", "custom_name": null}
   ]
-}""",
+}"""
 
-    # =========================
-    # Prompts de reescrita de cards com LLM
-    # =========================
-    "CARD_REWRITE_DENSIFY": """Reescreva este flashcard adicionando mais cloze deletions para tornar o aprendizado mais ativo.
+# =========================
+# Prompts de reescrita de cards com LLM
+# =========================
+CARD_REWRITE_DENSIFY: Final[str] = """Reescreva este flashcard adicionando mais cloze deletions para tornar o aprendizado mais ativo.
 
 <ORIGINAL_CARD>
 Front: ${front}
@@ -307,9 +316,9 @@ Back: [contexto expandido se necessario]
 </OUTPUT_FORMAT>
 
 Responda APENAS no formato acima, sem explicacoes:
-""",
+"""
 
-    "CARD_REWRITE_SPLIT": """Divida este flashcard em multiplas lacunas cloze independentes na mesma frase.
+CARD_REWRITE_SPLIT: Final[str] = """Divida este flashcard em multiplas lacunas cloze independentes na mesma frase.
 
 <ORIGINAL_CARD>
 Front: ${front}
@@ -330,9 +339,9 @@ Back: [breve contexto]
 </OUTPUT_FORMAT>
 
 Responda APENAS no formato acima, sem explicacoes:
-""",
+"""
 
-    "CARD_REWRITE_SIMPLIFY": """Simplifique este flashcard para focar no essencial.
+CARD_REWRITE_SIMPLIFY: Final[str] = """Simplifique este flashcard para focar no essencial.
 
 <ORIGINAL_CARD>
 Front: ${front}
@@ -352,44 +361,44 @@ Back: [resposta curta]
 </OUTPUT_FORMAT>
 
 Responda APENAS no formato acima, sem explicacoes:
-""",
-
-    "CARD_REWRITE_SYSTEM": (
-        "Voce e um assistente especializado em reescrever flashcards.\n"
-        "Siga EXATAMENTE o formato de saida pedido.\n"
-        "Responda em pt-BR.\n"
-        "NAO adicione explicacoes ou comentarios.\n"
-    ),
-
-    # =========================
-    # Question Generation (AllInOne kprim, mc, sc)
-    # =========================
-    "QUESTION_GENERATION_SYSTEM": (
-        "Você gera questões de múltipla escolha para Anki no formato AllInOne.\n"
-        "Tipos suportados: kprim (4 afirmativas V/F), mc (várias corretas), sc (uma correta).\n"
-        "Responda SEMPRE em pt-BR.\n"
-        "NUNCA responda em espanhol.\n"
-    ),
-
-    "QUESTION_GENERATION_SYSTEM_KPRIM": (
-        "Você gera questões Kprim (4 afirmativas verdadeiras ou falsas) para Anki.\n"
-        "Cada questão deve ter EXATAMENTE 4 opções que podem ser marcadas como corretas (V) ou incorretas (F).\n"
-        "Responda sempre em pt-BR.\n"
-    ),
-
-    "QUESTION_GENERATION_SYSTEM_MC": (
-        "Você gera questões de múltipla escolha com várias respostas corretas para Anki.\n"
-        "Cada questão deve ter 4-5 opções, onde 2 ou mais podem ser corretas.\n"
-        "Responda sempre em pt-BR.\n"
-    ),
-
-    "QUESTION_GENERATION_SYSTEM_SC": (
-        "Você gera questões de escolha única para Anki.\n"
-        "Cada questão deve ter 4-5 opções, onde EXATAMENTE uma é correta.\n"
-        "Responda sempre em pt-BR.\n"
-    ),
-
-    "QUESTION_GENERATION_GUIDELINES": """Crie questões de múltipla escolha de alta qualidade para estudo ativo.
+"""
+
+CARD_REWRITE_SYSTEM: Final[str] = (
+    "Voce e um assistente especializado em reescrever flashcards.\n"
+    "Siga EXATAMENTE o formato de saida pedido.\n"
+    "Responda em pt-BR.\n"
+    "NAO adicione explicacoes ou comentarios.\n"
+)
+
+# =========================
+# Question Generation (AllInOne kprim, mc, sc)
+# =========================
+QUESTION_GENERATION_SYSTEM: Final[str] = (
+    "Você gera questões de múltipla escolha para Anki no formato AllInOne.\n"
+    "Tipos suportados: kprim (4 afirmativas V/F), mc (várias corretas), sc (uma correta).\n"
+    "Responda SEMPRE em pt-BR.\n"
+    "NUNCA responda em espanhol.\n"
+)
+
+QUESTION_GENERATION_SYSTEM_KPRIM: Final[str] = (
+    "Você gera questões Kprim (4 afirmativas verdadeiras ou falsas) para Anki.\n"
+    "Cada questão deve ter EXATAMENTE 4 opções que podem ser marcadas como corretas (V) ou incorretas (F).\n"
+    "Responda sempre em pt-BR.\n"
+)
+
+QUESTION_GENERATION_SYSTEM_MC: Final[str] = (
+    "Você gera questões de múltipla escolha com várias respostas corretas para Anki.\n"
+    "Cada questão deve ter 4-5 opções, onde 2 ou mais podem ser corretas.\n"
+    "Responda sempre em pt-BR.\n"
+)
+
+QUESTION_GENERATION_SYSTEM_SC: Final[str] = (
+    "Você gera questões de escolha única para Anki.\n"
+    "Cada questão deve ter 4-5 opções, onde EXATAMENTE uma é correta.\n"
+    "Responda sempre em pt-BR.\n"
+)
+
+QUESTION_GENERATION_GUIDELINES: Final[str] = """Crie questões de múltipla escolha de alta qualidade para estudo ativo.
 
 QUALIDADE:
 - Questões claras, específicas e sem ambiguidade
@@ -407,9 +416,9 @@ DICAS:
 - Evite pistas gramaticais que entregam a resposta
 - Distratores devem ser erros conceituais comuns
 - O comentário deve ser educativo e completo
-""",
+"""
 
-    "QUESTION_GENERATION_FORMAT": """FORMATO DE SAÍDA (uma questão por bloco):
+QUESTION_GENERATION_FORMAT: Final[str] = """FORMATO DE SAÍDA (uma questão por bloco):
 
 QUESTION: <texto da pergunta em pt-BR>
 TYPE: kprim|mc|sc
@@ -428,9 +437,9 @@ REGRAS DO FORMATO:
 - Para mc: 4-5 opções, pelo menos 2 com [CORRECT]
 - Para sc: 4-5 opções, EXATAMENTE 1 com [CORRECT]
 - Linha em branco entre questões
-""",
+"""
 
-    "QUESTION_GENERATION_PROMPT": """${guidelines}
+QUESTION_GENERATION_PROMPT: Final[str] = """${guidelines}
 
 <SOURCE>
 ${src}
@@ -460,16 +469,16 @@ ${format_block}
 </OUTPUT_RULES>
 
 COMECE:
-""",
+"""
 
-    "QUESTION_PARSE_SYSTEM": (
-        "Você é um assistente que interpreta questões de múltipla escolha de qualquer formato.\n"
-        "Extraia as questões e converta para o formato estruturado AllInOne.\n"
-        "Identifique automaticamente o tipo (kprim/mc/sc) com base nas respostas.\n"
-        "Responda APENAS no formato solicitado.\n"
-    ),
+QUESTION_PARSE_SYSTEM: Final[str] = (
+    "Você é um assistente que interpreta questões de múltipla escolha de qualquer formato.\n"
+    "Extraia as questões e converta para o formato estruturado AllInOne.\n"
+    "Identifique automaticamente o tipo (kprim/mc/sc) com base nas respostas.\n"
+    "Responda APENAS no formato solicitado.\n"
+)
 
-    "QUESTION_PARSE_PROMPT": """Interprete o texto abaixo que contém questões de múltipla escolha e extraia cada questão no formato estruturado.
+QUESTION_PARSE_PROMPT: Final[str] = """Interprete o texto abaixo que contém questões de múltipla escolha e extraia cada questão no formato estruturado.
 
 <INPUT_TEXT>
 ${text}
@@ -501,11 +510,96 @@ DOMAIN: <categoria>
 </INSTRUCTIONS>
 
 COMECE:
-""",
+"""
+
+
+# Visão somente leitura de todos os prompts por nome (render/bind e a UI buscam por chave)
+PROMPTS: Mapping[str, str] = MappingProxyType({
+    name: value for name, value in globals().items() if name.isupper() and isinstance(value, str)
+})
+
+# Marca, dentro dos templates, o fim da parte estática (cacheável pelo provider) e o
+# início da parte dinâmica; é removida antes do envio ao modelo
+CACHE_BREAKPOINT = "<<<CACHE_BREAK>>>"
+
 
+def split_for_cache(rendered: str) -> Tuple[str, str]:
+    """
+    Separa um prompt renderizado em (prefixo estático, sufixo dinâmico) no CACHE_BREAKPOINT.
+
+    Sem o marcador (prompts curtos, sem ganho de cache) retorna ("", rendered), sinalizando
+    ao provider que não há bloco a marcar com cache_control.
+    """
+    prefix, sep, suffix = rendered.partition(CACHE_BREAKPOINT)
+    if not sep:
+        return "", rendered
+    return prefix, suffix
+
+
+_PLACEHOLDER_RE = re.compile(r"\$\{(\w+)\}")
+_MISSING = object()
+
+
+@dataclass(frozen=True)
+class _CompiledTemplate:
+    """Template ${var} quebrado em trechos literais intercalados com nomes de variáveis."""
+    literals: Tuple[str, ...]
+    vars: Tuple[str, ...]
+
+    @classmethod
+    def compile(cls, template: str) -> "_CompiledTemplate":
+        # re.split com grupo: índices pares são literais, ímpares são nomes de variáveis
+        parts = _PLACEHOLDER_RE.split(template)
+        return cls(literals=tuple(parts[0::2]), vars=tuple(parts[1::2]))
+
+    def bind(self, **static: object) -> "_CompiledTemplate":
+        """Substitui já as variáveis informadas, devolvendo um template só com as restantes."""
+        literals = [self.literals[0]]
+        names = []
+        for i, name in enumerate(self.vars, 1):
+            if name in static:
+                literals[-1] += str(static[name]) + self.literals[i]
+            else:
+                names.append(name)
+                literals.append(self.literals[i])
+        return _CompiledTemplate(literals=tuple(literals), vars=tuple(names))
+
+    @property
+    def static_prefix(self) -> str:
+        """Texto fixo antes da primeira variável (trecho estável entre chamadas)."""
+        return self.literals[0]
+
+    def render(self, ctx: Dict[str, object]) -> str:
+        literals = self.literals
+        out = [literals[0]]
+        append = out.append
+        for i, name in enumerate(self.vars, 1):
+            value = ctx.get(name, _MISSING)
+            # Variável não informada fica intacta (mesmo comportamento do safe_substitute)
+            append("${" + name + "}" if value is _MISSING else str(value))
+            append(literals[i])
+        return "".join(out)
+
+
+# Templates compilados uma única vez no import; render() só intercala e faz join
+PROMPTS_COMPILED: Dict[str, _CompiledTemplate] = {
+    key: _CompiledTemplate.compile(text) for key, text in PROMPTS.items() if "${" in text
 }
 
 
+def bind(key: str, **static) -> _CompiledTemplate:
+    """Pré-renderiza PROMPTS[key] com as variáveis estáticas; as demais ficam para o render."""
+    compiled = PROMPTS_COMPILED.get(key) or _CompiledTemplate.compile(PROMPTS[key])
+    return compiled.bind(**static)
+
+
+def render(key: str, **vars) -> str:
+    """Renderiza PROMPTS[key] substituindo os placeholders ${var} pelos valores informados."""
+    compiled = PROMPTS_COMPILED.get(key)
+    if compiled is None:
+        return PROMPTS[key]
+    return compiled.render(vars)
+
 def get_default_prompts_for_ui() -> dict:
     """
     Retorna os prompts padrão formatados para exibição no frontend.
@@ -516,28 +610,28 @@ def get_default_prompts_for_ui() -> dict:
     """
     return {
         "system": {
-            "basic": PROMPTS["FLASHCARDS_SYSTEM_PTBR"],
-            "cloze": PROMPTS["FLASHCARDS_SYSTEM_CLOZE"],
+            "basic": FLASHCARDS_SYSTEM_PTBR,
+            "cloze": FLASHCARDS_SYSTEM_CLOZE,
             "description": "Prompt de sistema que define o comportamento base do modelo",
         },
         "guidelines": {
-            "default": PROMPTS["FLASHCARDS_GUIDELINES"],
+            "default": FLASHCARDS_GUIDELINES,
             "description": "Diretrizes de qualidade para criação de flashcards (SuperMemo + Justin Sung)",
         },
         "generation": {
-            "default": PROMPTS["FLASHCARDS_GENERATION"],
+            "default": FLASHCARDS_GENERATION.replace(CACHE_BREAKPOINT, ""),
             "description": "Template principal de geração. Variáveis: ${src}, ${ctx_block}, ${guidelines}, ${target_min}, ${target_max}, ${type_instruction}, ${format_block}, ${checklist_block}",
         },
         "format": {
-            "basic": PROMPTS["FLASHCARDS_FORMAT_BASIC"],
-            "cloze": PROMPTS["FLASHCARDS_FORMAT_CLOZE"],
-            "both": PROMPTS["FLASHCARDS_FORMAT_BOTH"],
+            "basic": FLASHCARDS_FORMAT_BASIC,
+            "cloze": FLASHCARDS_FORMAT_CLOZE,
+            "both": FLASHCARDS_FORMAT_BOTH,
             "description": "Formatos de saída esperados por tipo de card",
         },
         "type_instruction": {
-            "basic": PROMPTS["FLASHCARDS_TYPE_BASIC"],
-            "cloze": PROMPTS["FLASHCARDS_TYPE_CLOZE"],
-            "both": PROMPTS["FLASHCARDS_TYPE_BOTH"],
+            "basic": FLASHCARDS_TYPE_BASIC,
+            "cloze": FLASHCARDS_TYPE_CLOZE,
+            "both": FLASHCARDS_TYPE_BOTH,
             "description": "Instruções específicas por tipo de card",
         },
     }
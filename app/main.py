@@ -3,7 +3,7 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
@@ -17,12 +17,22 @@ from app.api import (
     models_router,
     questions_router,
     start_broadcaster,
+    start_models_refresher,
     stop_broadcaster,
+    stop_models_refresher,
     websocket_router,
 )
 from app.config import CORS_ORIGINS, ENVIRONMENT
+from app.middleware.compression import SelectiveGZipMiddleware
 from app.middleware.security import SecurityHeadersMiddleware
 from app.middleware.rate_limit import setup_rate_limiting
+from app.services.http_pool import close_http_client
+from app.services.storage import close_shared_connection
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
 
 
 class AnkiStatusFilter(logging.Filter):
@@ -50,11 +60,22 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # Startup: start WebSocket broadcaster
     await start_broadcaster()
+    # Startup: refresh periódico do cache de modelos (só com MODELS_CACHE_AUTO_REFRESH)
+    await start_models_refresher()
     yield
     # Shutdown: stop WebSocket broadcaster
     await stop_broadcaster()
-
-app = FastAPI(title="Green Deck", lifespan=lifespan)
+    await stop_models_refresher()
+    # Shutdown: fecha o pool HTTP dos providers e a conexão DuckDB compartilhada
+    await close_http_client()
+    close_shared_connection()
+
+# Listagens de modelos, histórico e status são serializadas com orjson (em C) quando disponível
+app = FastAPI(
+    title="Green Deck",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse,
+)
 
 # Rate Limiting (must be configured before middlewares)
 setup_rate_limiting(app)
@@ -62,6 +83,13 @@ setup_rate_limiting(app)
 # Security Headers Middleware (must be added before CORS)
 app.add_middleware(SecurityHeadersMiddleware)
 
+# Gzip only for the large JSON listings (SSE streams must not be buffered)
+app.add_middleware(
+    SelectiveGZipMiddleware,
+    paths=("/api/all-models", "/api/ollama-info", "/api/history/"),
+    minimum_size=512,
+)
+
 # CORS - Configured with specific origins instead of wildcard
 app.add_middleware(
     CORSMiddleware,
@@ -1,4 +1,5 @@
+from app.middleware.compression import SelectiveGZipMiddleware
 from app.middleware.security import SecurityHeadersMiddleware
 from app.middleware.rate_limit import limiter, setup_rate_limiting
 
-__all__ = ["SecurityHeadersMiddleware", "limiter", "setup_rate_limiting"]
+__all__ = ["SelectiveGZipMiddleware", "SecurityHeadersMiddleware", "limiter", "setup_rate_limiting"]
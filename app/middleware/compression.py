@@ -0,0 +1,26 @@
+"""Selective gzip compression middleware for FastAPI."""
+
+from typing import Iterable
+
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class SelectiveGZipMiddleware:
+    """
+    Gzip-compresses responses only for the given path prefixes.
+
+    Applied globally, GZipMiddleware would also buffer the SSE generation streams;
+    restricting it to the large JSON endpoints keeps streaming untouched.
+    """
+
+    def __init__(self, app: ASGIApp, paths: Iterable[str], minimum_size: int = 512) -> None:
+        self.app = app
+        self.paths = tuple(paths)
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(self.paths):
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
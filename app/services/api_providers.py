@@ -9,6 +9,16 @@ import json
 import logging
 from typing import Optional, AsyncGenerator
 
+from app.core.prompts import split_for_cache
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Cada evento `data: {...}` do SSE carrega um token; decodificado com orjson quando disponível
+_json_loads = orjson.loads if orjson is not None else json.loads
+
 # Retry logic com tenacity
 try:
     from tenacity import (
@@ -22,8 +32,13 @@ try:
 except ImportError:
     TENACITY_AVAILABLE = False
 
+from app.services.http_pool import get_http_client
+
 logger = logging.getLogger(__name__)
 
+# Timeout das chamadas de streaming (o cliente HTTP é o pool compartilhado)
+_STREAM_TIMEOUT = httpx.Timeout(60.0, read=300.0)
+
 # Exceções que devem triggerar retry
 RETRYABLE_EXCEPTIONS = (
     httpx.ConnectTimeout,
@@ -80,10 +95,13 @@ async def openai_generate_stream(
         "Content-Type": "application/json"
     }
     
+    # Cache de prompt é automático nesses providers: basta o prefixo estático vir
+    # primeiro, sem o marcador de breakpoint
+    static_prefix, dynamic = split_for_cache(prompt)
     messages = []
     if system:
         messages.append({"role": "system", "content": system})
-    messages.append({"role": "user", "content": prompt})
+    messages.append({"role": "user", "content": static_prefix + dynamic})
     
     temperature = options.get("temperature", 0.0) if options else 0.0
     max_tokens = options.get("num_predict", 4096) if options else 4096
@@ -108,29 +126,30 @@ async def openai_generate_stream(
     logger.debug("OpenAI request: model=%s, messages=%d", model, len(messages))
     
     try:
-        async with httpx.AsyncClient(timeout=httpx.Timeout(60.0, read=300.0)) as client:
-            async with client.stream(
-                "POST",
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=payload
-            ) as resp:
-                if resp.status_code != 200:
-                    error_text = await resp.aread()
-                    logger.error("OpenAI error %d: %s", resp.status_code, error_text[:200])
-                    raise APIProviderError("OpenAI", error_text.decode()[:200], resp.status_code)
-                
-                async for line in resp.aiter_lines():
-                    if not line.strip() or line.strip() == "data: [DONE]":
+        client = get_http_client()
+        async with client.stream(
+            "POST",
+            "https://api.openai.com/v1/chat/completions",
+            headers=headers,
+            json=payload,
+            timeout=_STREAM_TIMEOUT,
+        ) as resp:
+            if resp.status_code != 200:
+                error_text = await resp.aread()
+                logger.error("OpenAI error %d: %s", resp.status_code, error_text[:200])
+                raise APIProviderError("OpenAI", error_text.decode()[:200], resp.status_code)
+            
+            async for line in resp.aiter_lines():
+                if not line.strip() or line.strip() == "data: [DONE]":
+                    continue
+                if line.startswith("data: "):
+                    try:
+                        data = _json_loads(line[6:])
+                        content = data.get("choices", [{}])[0].get("delta", {}).get("content")
+                        if content:
+                            yield content
+                    except json.JSONDecodeError:
                         continue
-                    if line.startswith("data: "):
-                        try:
-                            data = json.loads(line[6:])
-                            content = data.get("choices", [{}])[0].get("delta", {}).get("content")
-                            if content:
-                                yield content
-                        except json.JSONDecodeError:
-                            continue
     except RETRYABLE_EXCEPTIONS as e:
         logger.warning("OpenAI network error (will retry): %s", e)
         raise
@@ -157,10 +176,11 @@ async def perplexity_generate_stream(
         "Content-Type": "application/json"
     }
     
+    static_prefix, dynamic = split_for_cache(prompt)
     messages = []
     if system:
         messages.append({"role": "system", "content": system})
-    messages.append({"role": "user", "content": prompt})
+    messages.append({"role": "user", "content": static_prefix + dynamic})
     
     payload = {
         "model": model,
@@ -173,29 +193,30 @@ async def perplexity_generate_stream(
     logger.debug("Perplexity request: model=%s, messages=%d", model, len(messages))
     
     try:
-        async with httpx.AsyncClient(timeout=httpx.Timeout(60.0, read=300.0)) as client:
-            async with client.stream(
-                "POST",
-                "https://api.perplexity.ai/chat/completions",
-                headers=headers,
-                json=payload
-            ) as resp:
-                if resp.status_code != 200:
-                    error_text = await resp.aread()
-                    logger.error("Perplexity error %d: %s", resp.status_code, error_text[:200])
-                    raise APIProviderError("Perplexity", error_text.decode()[:200], resp.status_code)
-                
-                async for line in resp.aiter_lines():
-                    if not line.strip() or line.strip() == "data: [DONE]":
+        client = get_http_client()
+        async with client.stream(
+            "POST",
+            "https://api.perplexity.ai/chat/completions",
+            headers=headers,
+            json=payload,
+            timeout=_STREAM_TIMEOUT,
+        ) as resp:
+            if resp.status_code != 200:
+                error_text = await resp.aread()
+                logger.error("Perplexity error %d: %s", resp.status_code, error_text[:200])
+                raise APIProviderError("Perplexity", error_text.decode()[:200], resp.status_code)
+            
+            async for line in resp.aiter_lines():
+                if not line.strip() or line.strip() == "data: [DONE]":
+                    continue
+                if line.startswith("data: "):
+                    try:
+                        data = _json_loads(line[6:])
+                        content = data.get("choices", [{}])[0].get("delta", {}).get("content")
+                        if content:
+                            yield content
+                    except json.JSONDecodeError:
                         continue
-                    if line.startswith("data: "):
-                        try:
-                            data = json.loads(line[6:])
-                            content = data.get("choices", [{}])[0].get("delta", {}).get("content")
-                            if content:
-                                yield content
-                        except json.JSONDecodeError:
-                            continue
     except RETRYABLE_EXCEPTIONS as e:
         logger.warning("Perplexity network error (will retry): %s", e)
         raise
@@ -3,7 +3,9 @@
 Cache de embeddings para evitar recomputar embeddings para textos já processados.
 Usa cache em memória com LRU e persistência opcional em DuckDB.
 """
+import asyncio
 import hashlib
+import logging
 import time
 from collections import OrderedDict
 from typing import List, Optional, Tuple
@@ -12,6 +14,9 @@ import threading
 # Configuration
 CACHE_MAX_SIZE = 1000  # Maximum entries in memory cache
 CACHE_TTL_SECONDS = 3600 * 24  # 24 hours TTL
+BATCH_FALLBACK_CONCURRENCY = 8  # Max concurrent single-text calls when no batch endpoint
+
+logger = logging.getLogger(__name__)
 
 class EmbeddingCache:
     """
@@ -194,7 +199,8 @@ async def cached_embed(model: str, text: str, embed_func) -> List[float]:
 async def cached_embed_batch(
     model: str, 
     texts: List[str], 
-    embed_func
+    embed_func,
+    batch_func=None,
 ) -> List[List[float]]:
     """
     Get embeddings for multiple texts with caching.
@@ -204,6 +210,10 @@ async def cached_embed_batch(
         model: The embedding model name
         texts: List of texts to embed
         embed_func: Async function that takes (model, text) and returns embedding
+        batch_func: Optional async function that takes (model, texts) and returns
+            all embeddings in one call. Without it (or if its response is
+            malformed, signalled by ValueError), misses are computed
+            concurrently (bounded) via embed_func.
         
     Returns:
         List of embedding vectors
@@ -217,9 +227,27 @@ async def cached_embed_batch(
     if not missing_indices:
         return results
     
+    missing_texts = [texts[idx] for idx in missing_indices]
+    
     # Compute missing embeddings
-    for idx in missing_indices:
-        embedding = await embed_func(model, texts[idx])
+    embeddings = None
+    if batch_func is not None:
+        try:
+            embeddings = await batch_func(model, missing_texts)
+        except ValueError as e:
+            # Batch response without a usable "embeddings" list: fall back to per-item calls
+            logger.warning("Batch embedding response unusable (%s); embedding %d texts individually", e, len(missing_texts))
+
+    if embeddings is None:
+        semaphore = asyncio.Semaphore(BATCH_FALLBACK_CONCURRENCY)
+        
+        async def _embed_one(text: str) -> List[float]:
+            async with semaphore:
+                return await embed_func(model, text)
+        
+        embeddings = await asyncio.gather(*[_embed_one(t) for t in missing_texts])
+    
+    for idx, embedding in zip(missing_indices, embeddings):
         results[idx] = embedding
         cache.set(model, texts[idx], embedding)
     
@@ -0,0 +1,52 @@
+"""
+Cliente HTTP compartilhado (pool de conexões) para as chamadas aos providers de LLM.
+
+Abrir um httpx.AsyncClient por chamada refaz o handshake TCP/TLS a cada validação,
+embedding ou geração; com o pool, as conexões keep-alive são reaproveitadas entre
+todas as chamadas do processo. Timeouts específicos continuam sendo passados por request.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (habilita HTTP/2 quando disponível)
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+logger = logging.getLogger(__name__)
+
+_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+_DEFAULT_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+
+_CLIENT: Optional[httpx.AsyncClient] = None
+_CLIENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Retorna o cliente compartilhado, criando-o sob demanda.
+
+    O pool fica preso ao event loop em que foi criado; se chamado de outro loop
+    (ex.: asyncio.run em thread), cria um cliente novo para esse loop.
+    """
+    global _CLIENT, _CLIENT_LOOP
+    loop = asyncio.get_running_loop()
+    if _CLIENT is None or _CLIENT.is_closed or _CLIENT_LOOP is not loop:
+        _CLIENT = httpx.AsyncClient(limits=_LIMITS, timeout=_DEFAULT_TIMEOUT, http2=_HTTP2)
+        _CLIENT_LOOP = loop
+    return _CLIENT
+
+
+async def close_http_client() -> None:
+    """Fecha o cliente compartilhado (chamado no shutdown da aplicação)."""
+    global _CLIENT, _CLIENT_LOOP
+    client, _CLIENT, _CLIENT_LOOP = _CLIENT, None, None
+    if client is not None and not client.is_closed:
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.debug("Failed to close shared HTTP client: %s", e)
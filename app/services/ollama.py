@@ -1,12 +1,27 @@
-import httpx
 import json
 import re
 import logging
 import numpy as np
-from typing import Optional, List
+from functools import lru_cache
+from typing import NamedTuple, Optional, List, Sequence, Tuple
 
 from app.config import OLLAMA_GENERATE_URL, OLLAMA_EMBED_URL
+from app.core.prompts import split_for_cache
 from app.services.embedding_cache import cached_embed, cached_embed_batch, get_embedding_cache
+from app.services.http_pool import get_http_client
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Uma linha JSON por token no streaming: orjson decodifica bem mais rápido que o json padrão
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+try:
+    from numba import njit
+except ImportError:  # pragma: no cover
+    njit = None
 
 logger = logging.getLogger(__name__)
 
@@ -55,11 +70,37 @@ def _regex_sent_tokenize(text: str) -> List[str]:
     return [p.strip() for p in parts if p.strip()]
 
 
+class SrcStats(NamedTuple):
+    """Estatísticas do texto fonte calculadas uma única vez por requisição."""
+    word_count: int
+    approx_tokens: int
+    sentences: Tuple[str, ...]
+
+
+@lru_cache(maxsize=64)
+def src_stats(src: str, language: str = "portuguese") -> SrcStats:
+    """
+    Tokeniza o texto fonte uma vez e devolve contagem de palavras, estimativa de
+    tokens e sentenças. O cache permite que analyze/generate (e o chunking)
+    reaproveitem o mesmo trabalho para o mesmo texto.
+    """
+    text = re.sub(r'\s+', ' ', (src or '')).strip()
+    if not text:
+        return SrcStats(0, 0, ())
+
+    # Após a normalização as palavras são separadas por exatamente um espaço
+    word_count = text.count(" ") + 1
+    # ~4 caracteres por token (heurística usual para pt/en)
+    approx_tokens = (len(text) + 3) // 4
+    return SrcStats(word_count, approx_tokens, tuple(_sent_tokenize(text, language)))
+
+
 def chunk_text_semantic(
     text: str,
     max_words: int = 400,
     overlap_sentences: int = 2,
-    language: str = "portuguese"
+    language: str = "portuguese",
+    pre_tokenized: Optional[Sequence[str]] = None,
 ) -> List[str]:
     """
     Chunking semântico baseado em sentenças com overlap.
@@ -69,21 +110,30 @@ def chunk_text_semantic(
         max_words: Máximo de palavras por chunk
         overlap_sentences: Número de sentenças de overlap entre chunks
         language: Idioma para tokenização ('portuguese' ou 'english')
+        pre_tokenized: Sentenças já tokenizadas (ex.: src_stats().sentences);
+            quando informado, dispensa a normalização e o tokenizer internos
     
     Returns:
         Lista de chunks com overlap semântico
     """
-    text = re.sub(r'\s+', ' ', (text or '')).strip()
-    if not text:
-        return []
-    
-    sentences = _sent_tokenize(text, language)
+    if pre_tokenized is not None:
+        sentences = list(pre_tokenized)
+    else:
+        text = re.sub(r'\s+', ' ', (text or '')).strip()
+        if not text:
+            return []
+        sentences = _sent_tokenize(text, language)
+
     if not sentences:
+        text = re.sub(r'\s+', ' ', (text or '')).strip()
+        if not text:
+            return []
         # Fallback para chunking simples se não conseguir tokenizar
         return chunk_text(text, chunk_size=max_words)
     
     chunks: List[str] = []
     current_chunk: List[str] = []
+    current_counts: List[int] = []
     current_word_count = 0
     
     for sentence in sentences:
@@ -96,14 +146,16 @@ def chunk_text_semantic(
             
             # Mantém as últimas N sentenças para overlap
             if overlap_sentences > 0 and len(current_chunk) >= overlap_sentences:
-                overlap = current_chunk[-overlap_sentences:]
-                current_chunk = overlap.copy()
-                current_word_count = sum(len(s.split()) for s in current_chunk)
+                current_chunk = current_chunk[-overlap_sentences:]
+                current_counts = current_counts[-overlap_sentences:]
+                current_word_count = sum(current_counts)
             else:
                 current_chunk = []
+                current_counts = []
                 current_word_count = 0
         
         current_chunk.append(sentence)
+        current_counts.append(sentence_words)
         current_word_count += sentence_words
     
     # Adiciona o último chunk
@@ -128,9 +180,11 @@ def chunk_text_semantic(
 
 
 async def ollama_generate_stream(model: str, prompt: str, *, system: Optional[str] = None, options: Optional[dict] = None):
+    # O Ollama reaproveita o KV cache do prefixo comum; só o marcador sai do texto
+    static_prefix, dynamic = split_for_cache(prompt)
     payload = {
         "model": model,
-        "prompt": prompt,
+        "prompt": static_prefix + dynamic,
         "stream": True,
     }
     if system:
@@ -138,42 +192,58 @@ async def ollama_generate_stream(model: str, prompt: str, *, system: Optional[st
     if options:
         payload["options"] = options
 
-    async with httpx.AsyncClient(timeout=None) as client:
-        async with client.stream("POST", OLLAMA_GENERATE_URL, json=payload) as resp:
-            resp.raise_for_status()
-            async for line in resp.aiter_lines():
-                if not line.strip():
-                    continue
-                data = json.loads(line)
-                if data.get("response"):
-                    yield data["response"]
-                if data.get("done"):
-                    break
-
-async def _ollama_embed_raw(model: str, text: str) -> List[float]:
+    client = get_http_client()
+    async with client.stream("POST", OLLAMA_GENERATE_URL, json=payload, timeout=None) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if not line.strip():
+                continue
+            data = _json_loads(line)
+            if data.get("response"):
+                yield data["response"]
+            if data.get("done"):
+                break
+
+# Embeddings só servem para ranquear chunks: guardados como float16 (2 bytes por dimensão
+# em vez de um float Python por item), o cache ocupa uma fração da memória e o ranking
+# (que converte para float32 ao empilhar) lê metade dos bytes
+_EMB_DTYPE = np.float16
+
+
+async def _ollama_embed_raw(model: str, text: str) -> np.ndarray:
     """Raw embedding call without caching."""
     payload = {"model": model, "input": text}
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        resp = await client.post(OLLAMA_EMBED_URL, json=payload)
-        resp.raise_for_status()
-        data = resp.json()
-        return data.get("embeddings", [[]])[0]
+    resp = await get_http_client().post(OLLAMA_EMBED_URL, json=payload, timeout=60.0)
+    resp.raise_for_status()
+    data = resp.json()
+    return np.asarray(data.get("embeddings", [[]])[0], dtype=_EMB_DTYPE)
+
+async def _ollama_embed_many_raw(model: str, texts: List[str]) -> List[np.ndarray]:
+    """Raw batched embedding call: one /api/embed request with an input array, without caching."""
+    payload = {"model": model, "input": texts}
+    resp = await get_http_client().post(OLLAMA_EMBED_URL, json=payload, timeout=60.0)
+    resp.raise_for_status()
+    data = resp.json()
+    embeddings = data.get("embeddings") or []
+    if len(embeddings) != len(texts):
+        raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+    return [np.asarray(e, dtype=_EMB_DTYPE) for e in embeddings]
 
-async def ollama_embed(model: str, text: str) -> List[float]:
+async def ollama_embed(model: str, text: str) -> np.ndarray:
     """Get embedding with caching for improved performance."""
     return await cached_embed(model, text, _ollama_embed_raw)
 
-async def ollama_embed_batch(model: str, texts: List[str]) -> List[List[float]]:
-    """Get embeddings for multiple texts with caching."""
-    return await cached_embed_batch(model, texts, _ollama_embed_raw)
+async def ollama_embed_batch(model: str, texts: List[str]) -> List[np.ndarray]:
+    """Get embeddings for multiple texts with caching (cache misses go in a single request)."""
+    return await cached_embed_batch(model, texts, _ollama_embed_raw, batch_func=_ollama_embed_many_raw)
 
 def get_embedding_cache_stats() -> dict:
     """Get statistics about the embedding cache."""
     return get_embedding_cache().stats()
 
-def cosine_similarity(a: List[float], b: List[float]) -> float:
-    a_arr = np.array(a)
-    b_arr = np.array(b)
+def cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
+    a_arr = np.asarray(a, dtype=np.float32)
+    b_arr = np.asarray(b, dtype=np.float32)
     norm_a = np.linalg.norm(a_arr)
     norm_b = np.linalg.norm(b_arr)
     if norm_a == 0 or norm_b == 0:
@@ -181,6 +251,71 @@ def cosine_similarity(a: List[float], b: List[float]) -> float:
     return float(np.dot(a_arr, b_arr) / (norm_a * norm_b))
 
 
+# Kernel opcional (numba): norma + produto escalar numa única passada sobre a matriz, sem
+# a cópia normalizada; compensa em documentos longos, com centenas de chunks
+_NUMBA_MIN_ROWS = 128
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _score_all(m, q):  # pragma: no cover - depende do numba
+        n_rows, dim = m.shape
+        out = np.empty(n_rows, dtype=np.float32)
+        qn = 0.0
+        for j in range(dim):
+            qn += q[j] * q[j]
+        qn = 1.0 / (np.sqrt(qn) + 1e-12)
+        for i in range(n_rows):
+            dot = 0.0
+            norm = 0.0
+            for j in range(dim):
+                v = m[i, j]
+                dot += v * q[j]
+                norm += v * v
+            out[i] = dot * qn / (np.sqrt(norm) + 1e-12)
+        return out
+else:
+    _score_all = None
+
+
+def top_k_by_similarity(
+    embeddings: Sequence[Sequence[float]],
+    query_emb: Sequence[float],
+    k: int = 5,
+) -> List[tuple]:
+    """
+    Ranqueia embeddings por similaridade de cosseno com a query, de forma vetorizada.
+
+    Empilha os vetores em uma matriz (N, d), normaliza as linhas e calcula todos os
+    scores com um único matmul (ou com o kernel numba, se instalado, para muitos chunks);
+    o top-k é selecionado com argpartition (O(N)).
+
+    Returns:
+        Lista de (índice, score) ordenada por score decrescente (até k itens).
+    """
+    # len() em vez de `not`: aceita também um ndarray 2-D (cujo bool é ambíguo)
+    if len(embeddings) == 0:
+        return []
+
+    m = np.asarray(embeddings, dtype=np.float32)
+    q = np.asarray(query_emb, dtype=np.float32)
+    if _score_all is not None and m.shape[0] >= _NUMBA_MIN_ROWS:
+        sims = _score_all(m, q)
+    else:
+        # Sem divisão in-place: asarray devolve o próprio array do chamador se já for float32
+        m = m / (np.linalg.norm(m, axis=1, keepdims=True) + 1e-12)
+        q = q / (np.linalg.norm(q) + 1e-12)
+        sims = m @ q
+
+    k = min(k, sims.size)
+    if k < sims.size:
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+    else:
+        # k cobre todos os itens: a partição não descarta nada, basta ordenar
+        top = np.argsort(-sims)
+    return [(int(i), float(sims[i])) for i in top]
+
+
 def chunk_text(text: str, chunk_size: int = 500) -> List[str]:
     """Chunking simples por palavras (legacy, para compatibilidade)."""
     words = text.split()
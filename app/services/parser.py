@@ -3,6 +3,11 @@ import json
 import re
 from typing import List, Dict, Any
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 from app.utils.text import (
     get_card_type,
     is_valid_cloze,
@@ -10,6 +15,27 @@ from app.utils.text import (
     normalize_cloze_answer,
 )
 
+# Padrões do parser compilados uma única vez; todos ancorados no início da linha
+# e sem quantificadores aninhados (varredura linear mesmo com saída ruim do modelo)
+_WS_RE = re.compile(r"\s+")
+_Q_PREFIX_RE = re.compile(r"(?i)^(q|cloze)\s*:\s*")
+_A_PREFIX_RE = re.compile(r"(?i)^(a|extra)\s*:\s*")
+_SRC_PREFIX_RE = re.compile(r"(?i)^(src|fonte|ref)\s*:\s*")
+_CLOZE_MARKER_RE = re.compile(r"\{\{c\d+::([^}]+)\}\}")
+_LIST_BULLET_RE = re.compile(r"(^|\s)(-|\d+\))\s+")
+
+
+def _json_loads(s: str) -> Any:
+    """Decodifica JSON usando orjson quando disponível (fallback: json da stdlib)."""
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
+
+
+def looks_like_json(text: str) -> bool:
+    """Indica se a saída do modelo começa como JSON (objeto ou array)."""
+    return (text or "").lstrip().startswith(("{", "["))
+
 
 def parse_flashcards_qa(text: str) -> List[Dict[str, str]]:
     """
@@ -35,9 +61,9 @@ def parse_flashcards_qa(text: str) -> List[Dict[str, str]]:
 
     def flush():
         nonlocal cur_q, cur_a, cur_src, mode
-        q = re.sub(r"\s+", " ", cur_q).strip()
-        a = re.sub(r"\s+", " ", cur_a).strip()
-        s = re.sub(r"\s+", " ", cur_src).strip().strip('"').strip()
+        q = _WS_RE.sub(" ", cur_q).strip()
+        a = _WS_RE.sub(" ", cur_a).strip()
+        s = _WS_RE.sub(" ", cur_src).strip().strip('"').strip()
 
         if q and a:
             out = {"front": q, "back": a}
@@ -54,23 +80,26 @@ def parse_flashcards_qa(text: str) -> List[Dict[str, str]]:
                 flush()
             continue
 
-        # Reconhece Q: ou CLOZE: como front do card
-        if re.match(r"(?i)^(q|cloze)\s*:\s*", ln):
+        # Reconhece Q: ou CLOZE: como front do card (o prefixo casado é cortado pelo end())
+        m = _Q_PREFIX_RE.match(ln)
+        if m:
             if cur_q and cur_a:
                 flush()
             mode = "q"
-            cur_q = re.sub(r"(?i)^(q|cloze)\s*:\s*", "", ln).strip()
+            cur_q = ln[m.end():].strip()
             continue
 
         # Reconhece A: ou EXTRA: como back do card
-        if re.match(r"(?i)^(a|extra)\s*:\s*", ln):
+        m = _A_PREFIX_RE.match(ln)
+        if m:
             mode = "a"
-            cur_a = re.sub(r"(?i)^(a|extra)\s*:\s*", "", ln).strip()
+            cur_a = ln[m.end():].strip()
             continue
 
-        if re.match(r"(?i)^(src|fonte|ref)\s*:\s*", ln):
+        m = _SRC_PREFIX_RE.match(ln)
+        if m:
             mode = "src"
-            cur_src = re.sub(r"(?i)^(src|fonte|ref)\s*:\s*", "", ln).strip()
+            cur_src = ln[m.end():].strip()
             continue
 
         # continuação de linha (quando o modelo quebra)
@@ -119,7 +148,7 @@ def parse_flashcards_json(text: str) -> List[Dict[str, str]]:
     if lb != -1 and rb != -1 and rb > lb:
         candidate = t[lb : rb + 1]
         try:
-            data = json.loads(candidate)
+            data = _json_loads(candidate)
         except Exception:
             data = None
 
@@ -130,7 +159,7 @@ def parse_flashcards_json(text: str) -> List[Dict[str, str]]:
         if lc != -1 and rc != -1 and rc > lc:
             candidate = t[lc : rc + 1]
             try:
-                data = json.loads(candidate)
+                data = _json_loads(candidate)
             except Exception:
                 data = None
 
@@ -207,7 +236,7 @@ def _dedup_by_front(cards: List[Dict[str, str]]) -> List[Dict[str, str]]:
     seen = set()
     out: List[Dict[str, str]] = []
     for c in cards or []:
-        k = re.sub(r"\s+", " ", (c.get("front") or "")).strip().lower()
+        k = _WS_RE.sub(" ", (c.get("front") or "")).strip().lower()
         if k and k not in seen:
             seen.add(k)
             out.append(c)
@@ -228,8 +257,7 @@ def renumber_cloze_markers(text: str) -> str:
         return text
 
     # Encontra todos os marcadores cloze na ordem em que aparecem
-    pattern = r"\{\{c\d+::([^}]+)\}\}"
-    matches = list(re.finditer(pattern, text))
+    matches = list(_CLOZE_MARKER_RE.finditer(text))
 
     if not matches:
         return text
@@ -253,6 +281,9 @@ def normalize_cards(cards: List[Dict[str, str]]) -> List[Dict[str, str]]:
     - limpa resposta
     - preserva `src` (quando existir)
     - NAO adiciona prefixos [BASIC]/[CLOZE]
+
+    Garante `front` e `back` sempre presentes como str sem espaços nas pontas (nunca None):
+    o pipeline lê `c["front"]`/`c["back"]` direto nos laços por card.
     """
     normalized: List[Dict[str, str]] = []
     for c in cards or []:
@@ -272,11 +303,11 @@ def normalize_cards(cards: List[Dict[str, str]]) -> List[Dict[str, str]]:
                         a = normalize_cloze_answer(a)
                     else:
                         # Ainda invalido - converte pra BASIC
-                        q = re.sub(r"\{\{c\d+::([^}]+)\}\}", r"\1", q).strip()
+                        q = _CLOZE_MARKER_RE.sub(r"\1", q).strip()
                         a = normalize_basic_answer(a)
                 else:
                     # Nao tem marcadores cloze - converte pra BASIC
-                    q = re.sub(r"\{\{c\d+::([^}]+)\}\}", r"\1", q).strip()
+                    q = _CLOZE_MARKER_RE.sub(r"\1", q).strip()
                     a = normalize_basic_answer(a)
             else:
                 a = normalize_cloze_answer(a)
@@ -284,7 +315,7 @@ def normalize_cards(cards: List[Dict[str, str]]) -> List[Dict[str, str]]:
             a = normalize_basic_answer(a)
 
         # limpeza extra
-        a = re.sub(r"(^|\s)(-|\d+\))\s+", " ", a).strip()
+        a = _LIST_BULLET_RE.sub(" ", a).strip()
 
         out = {"front": q, "back": a}
         if src:
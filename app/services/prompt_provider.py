@@ -1,17 +1,60 @@
 # app/services/prompt_provider.py
 
 from dataclasses import dataclass, field
+from functools import lru_cache
 from string import Template
-from typing import Literal, Optional, Dict
+from typing import Literal, Optional, Dict, Tuple
 
-from app.core.prompts import PROMPTS
+from app.core import prompts
+from app.core.prompts import bind, render
 
 CardType = Literal["basic", "cloze", "both"]
 
+# (instrução de tipo, bloco de formato, system prompt padrão) por card_type, montados
+# uma única vez: cada seleção por request vira um lookup
+_CARD_TYPE_ASSETS: Dict[str, Tuple[str, str, str]] = {
+    "basic": (
+        prompts.FLASHCARDS_TYPE_BASIC,
+        prompts.FLASHCARDS_FORMAT_BASIC,
+        prompts.FLASHCARDS_SYSTEM_PTBR,
+    ),
+    "cloze": (
+        prompts.FLASHCARDS_TYPE_CLOZE,
+        prompts.FLASHCARDS_FORMAT_CLOZE,
+        prompts.FLASHCARDS_SYSTEM_CLOZE,
+    ),
+    "both": (
+        prompts.FLASHCARDS_TYPE_BOTH,
+        prompts.FLASHCARDS_FORMAT_BOTH,
+        prompts.FLASHCARDS_SYSTEM_PTBR,
+    ),
+}
+# Diretrizes padrão já sem espaços nas pontas (usadas em toda geração/repair)
+_DEFAULT_GUIDELINES = prompts.FLASHCARDS_GUIDELINES.strip()
+
+# Geração/repair com a parte estática (diretrizes padrão, tipo, formato) já substituída
+# por card_type: o prefixo do prompt sai idêntico entre chamadas e só a fonte varia
+_STATIC_PREFIX = {
+    (key, card_type): bind(
+        key,
+        guidelines=_DEFAULT_GUIDELINES,
+        type_instruction=type_instruction,
+        format_block=format_block,
+    )
+    for key in ("FLASHCARDS_GENERATION", "FLASHCARDS_REPAIR")
+    for card_type, (type_instruction, format_block, _) in _CARD_TYPE_ASSETS.items()
+}
+
+
+@lru_cache(maxsize=64)
+def _bound_with_guidelines(key: str, card_type: str, guidelines: str):
+    """Mesma especialização do _STATIC_PREFIX para diretrizes customizadas (repetidas a cada chunk)."""
+    type_instruction, format_block, _ = _CARD_TYPE_ASSETS[card_type]
+    return bind(key, guidelines=guidelines, type_instruction=type_instruction, format_block=format_block)
+
 
 def _render(key: str, **kwargs) -> str:
-    tmpl = Template(PROMPTS[key])
-    return tmpl.safe_substitute(**kwargs).strip()
+    return render(key, **kwargs).strip()
 
 
 def _render_custom(template_str: str, **kwargs) -> str:
@@ -43,12 +86,7 @@ class PromptProvider:
 
     def flashcards_system(self, card_type: CardType) -> str:
         # Se há prompt customizado, usa ele
-        if self.custom_prompts.get("system"):
-            base = self.custom_prompts["system"]
-        elif card_type == "cloze":
-            base = PROMPTS["FLASHCARDS_SYSTEM_CLOZE"]
-        else:
-            base = PROMPTS["FLASHCARDS_SYSTEM_PTBR"]
+        base = self.custom_prompts.get("system") or _CARD_TYPE_ASSETS[card_type][2]
         
         # Injeta instrução de perfil do usuário, se houver
         profile_instruction = self._build_profile_instruction()
@@ -57,25 +95,23 @@ class PromptProvider:
         return base
 
     def flashcards_type_instruction(self, card_type: CardType) -> str:
-        return {
-            "basic": PROMPTS["FLASHCARDS_TYPE_BASIC"],
-            "cloze": PROMPTS["FLASHCARDS_TYPE_CLOZE"],
-            "both": PROMPTS["FLASHCARDS_TYPE_BOTH"],
-        }[card_type]
+        return _CARD_TYPE_ASSETS[card_type][0]
 
     def flashcards_format_block(self, card_type: CardType) -> str:
-        return {
-            "basic": PROMPTS["FLASHCARDS_FORMAT_BASIC"],
-            "cloze": PROMPTS["FLASHCARDS_FORMAT_CLOZE"],
-            "both": PROMPTS["FLASHCARDS_FORMAT_BOTH"],
-        }[card_type]
+        return _CARD_TYPE_ASSETS[card_type][1]
 
     def flashcards_guidelines(self) -> str:
         """Retorna as diretrizes de criação de cards (customizável)."""
-        return (
-            self.custom_prompts.get("guidelines")
-            or PROMPTS["FLASHCARDS_GUIDELINES"]
-        ).strip()
+        custom = self.custom_prompts.get("guidelines")
+        return custom.strip() if custom else _DEFAULT_GUIDELINES
+
+    def _render_flashcards(self, key: str, card_type: CardType, **dynamic) -> str:
+        """Renderiza geração/repair preenchendo só as variáveis dinâmicas do template pré-especializado."""
+        if not self.custom_prompts.get("guidelines"):
+            bound = _STATIC_PREFIX[(key, card_type)]
+        else:
+            bound = _bound_with_guidelines(key, card_type, self.flashcards_guidelines())
+        return bound.render(dynamic).strip()
 
     def build_flashcards_generation_prompt(
         self,
@@ -116,16 +152,14 @@ class PromptProvider:
                 rendered = user_profile_block + rendered
             return rendered
 
-        base = _render(
+        base = self._render_flashcards(
             "FLASHCARDS_GENERATION",
-            guidelines=self.flashcards_guidelines(),
+            card_type,
             src=src,
             ctx_block=ctx_block,
             checklist_block=(checklist_block or "").strip(),
             target_min=str(target_min),
             target_max=str(target_max),
-            type_instruction=self.flashcards_type_instruction(card_type),
-            format_block=self.flashcards_format_block(card_type),
         )
 
         # Injeta bloco de perfil antes do prompt de geracao
@@ -146,43 +180,53 @@ class PromptProvider:
         # Contexto vai dentro do XML
         ctx_block = (ctx or "").strip() or "Nenhum contexto adicional fornecido."
 
-        return _render(
+        return self._render_flashcards(
             "FLASHCARDS_REPAIR",
-            guidelines=self.flashcards_guidelines(),
+            card_type,
             src=src,
             ctx_block=ctx_block,
             checklist_block=(checklist_block or "").strip(),
             target_min=str(target_min),
             target_max=str(target_max),
-            format_block=self.flashcards_format_block(card_type),
         )
 
-    def build_src_validation_prompt(self, *, src_text: str, cards_text: str) -> str:
+    def build_flashcards_translate_prompt(self, *, cards: list, card_type: CardType) -> str:
+        """Repair curto: pede apenas a tradução dos cards já gerados para pt-BR."""
+        blocks = []
+        for c in cards:
+            front = (c.get("front") or "").strip()
+            back = (c.get("back") or "").strip()
+            # Cloze segue o formato CLOZE:/EXTRA: (o bloco de formato cloze proíbe Q:/A:)
+            if "{{c" in front:
+                block = f"CLOZE: {front}\nEXTRA: {back}"
+            else:
+                block = f"Q: {front}\nA: {back}"
+            if c.get("src"):
+                block += f'\nSRC: "{c["src"]}"'
+            blocks.append(block)
+
         return _render(
-            "SRC_VALIDATION_PROMPT",
-            src_text=src_text,
-            cards_text=cards_text,
+            "FLASHCARDS_TRANSLATE",
+            cards_text="\n\n".join(blocks),
+            format_block=self.flashcards_format_block(card_type),
         )
 
-    def src_validation_system(self) -> str:
-        return PROMPTS["SRC_VALIDATION_SYSTEM"]
-
-    def build_relevance_filter_prompt(self, *, src_text: str, cards_text: str) -> str:
+    def build_src_relevance_validation_prompt(self, *, src_text: str, cards_text: str) -> str:
         return _render(
-            "RELEVANCE_FILTER_PROMPT",
+            "SRC_RELEVANCE_VALIDATION_PROMPT",
             src_text=src_text,
             cards_text=cards_text,
         )
 
-    def relevance_filter_system(self) -> str:
-        return PROMPTS["RELEVANCE_FILTER_SYSTEM"]
+    def src_relevance_validation_system(self) -> str:
+        return prompts.SRC_RELEVANCE_VALIDATION_SYSTEM
 
     def build_text_analysis_prompt(self, *, text: str, detected_lang: str) -> str:
         key = "TEXT_ANALYSIS_PT" if detected_lang == "pt-br" else "TEXT_ANALYSIS_EN"
         return _render(key, text=text)
 
     def text_analysis_system(self) -> str:
-        return PROMPTS["TEXT_ANALYSIS_SYSTEM"]
+        return prompts.TEXT_ANALYSIS_SYSTEM
 
     # ========================================
     # Metodos para reescrita de cards com LLM
@@ -213,7 +257,7 @@ class PromptProvider:
 
     def card_rewrite_system(self) -> str:
         """Retorna o system prompt para reescrita de cards."""
-        return PROMPTS["CARD_REWRITE_SYSTEM"]
+        return prompts.CARD_REWRITE_SYSTEM
 
     def with_custom_prompts(
         self,
@@ -4,15 +4,21 @@ Módulo de persistência unificado usando apenas DuckDB.
 Todas as operações de armazenamento (analyses, cards, llm_responses, filter_results)
 são feitas exclusivamente no DuckDB para simplicidade e performance.
 """
+import hashlib
 import json
+import threading
 import duckdb
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 
 DATA_DIR = Path("data/generator")
 DB_PATH = Path("data/storage.duckdb")
 
+# Conexão de longa duração compartilhada pelo app (evita abrir/fechar o DB a cada operação)
+_SHARED_CONN: Optional[duckdb.DuckDBPyConnection] = None
+_SHARED_CONN_LOCK = threading.Lock()
+
 
 def _ensure_data_dir():
     DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -131,12 +137,42 @@ def _get_connection():
     
     return conn
 
+
+def _get_shared_connection() -> duckdb.DuckDBPyConnection:
+    """
+    Retorna a conexão DuckDB compartilhada, criada (com o schema) uma única vez.
+    Scripts avulsos (ex: clean_database) continuam usando _get_connection().
+    """
+    global _SHARED_CONN
+    if _SHARED_CONN is None:
+        with _SHARED_CONN_LOCK:
+            if _SHARED_CONN is None:
+                _SHARED_CONN = _get_connection()
+    return _SHARED_CONN
+
+
+def _cursor() -> duckdb.DuckDBPyConnection:
+    """
+    Cursor sobre a conexão compartilhada. Cada cursor é uma conexão duplicada,
+    segura para uso em threads distintas; fechar o cursor não fecha o DB.
+    """
+    return _get_shared_connection().cursor()
+
+
+def close_shared_connection() -> None:
+    """Fecha a conexão compartilhada (chamado no shutdown do app)."""
+    global _SHARED_CONN
+    with _SHARED_CONN_LOCK:
+        if _SHARED_CONN is not None:
+            _SHARED_CONN.close()
+            _SHARED_CONN = None
+
 def save_analysis(text: str, summary: str, metadata: Optional[Dict] = None) -> str:
     """Salva análise de texto no DuckDB."""
     analysis_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     timestamp = datetime.now()
     
-    conn = _get_connection()
+    conn = _cursor()
     conn.execute("""
         INSERT INTO analyses (id, timestamp, text, summary, metadata)
         VALUES (?, ?, ?, ?, ?)
@@ -151,7 +187,7 @@ def save_cards(cards: List[Dict], analysis_id: Optional[str] = None, source_text
     cards_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     timestamp = datetime.now()
     
-    conn = _get_connection()
+    conn = _cursor()
     conn.execute("""
         INSERT INTO cards (id, timestamp, analysis_id, source_text, cards_count, cards)
         VALUES (?, ?, ?, ?, ?, ?)
@@ -160,8 +196,45 @@ def save_cards(cards: List[Dict], analysis_id: Optional[str] = None, source_text
     
     return cards_id
 
+def save_cards_and_link_responses(
+    cards: List[Dict],
+    analysis_id: Optional[str] = None,
+    source_text: Optional[str] = None,
+    audit: Optional["AuditBatch"] = None,
+) -> str:
+    """
+    Salva os cards finais e vincula as respostas do LLM pendentes (cards_id vazio)
+    da mesma análise, numa única transação. Se `audit` for passado, o lote de
+    auditoria da request é gravado nessa mesma transação, antes do vínculo.
+    """
+    cards_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    timestamp = datetime.now()
+
+    conn = _cursor()
+    try:
+        conn.execute("BEGIN TRANSACTION")
+        conn.execute("""
+            INSERT INTO cards (id, timestamp, analysis_id, source_text, cards_count, cards)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [cards_id, timestamp, analysis_id or "", source_text or "", len(cards), json.dumps(cards)])
+        audit_counts = audit._write(conn) if audit is not None else None
+        conn.execute(
+            "UPDATE llm_responses SET cards_id = ? WHERE analysis_id = ? AND cards_id = ''",
+            [cards_id, analysis_id or ""],
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    if audit_counts is not None:
+        audit._discard(audit_counts)
+    return cards_id
+
 def get_recent_analyses(limit: int = 10) -> List[Dict]:
-    conn = _get_connection()
+    conn = _cursor()
     result = conn.execute("""
         SELECT id, timestamp, text, summary, metadata
         FROM analyses
@@ -173,7 +246,7 @@ def get_recent_analyses(limit: int = 10) -> List[Dict]:
     return [{"id": r[0], "timestamp": r[1].isoformat(), "text": r[2], "summary": r[3], "metadata": json.loads(r[4])} for r in result]
 
 def get_recent_cards(limit: int = 10) -> List[Dict]:
-    conn = _get_connection()
+    conn = _cursor()
     result = conn.execute("""
         SELECT id, timestamp, analysis_id, source_text, cards_count, cards
         FROM cards
@@ -186,7 +259,7 @@ def get_recent_cards(limit: int = 10) -> List[Dict]:
 
 def get_stats() -> Dict:
     """Retorna estatísticas gerais do sistema."""
-    conn = _get_connection()
+    conn = _cursor()
     analyses_count = conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
     cards_count = conn.execute("SELECT SUM(cards_count) FROM cards").fetchone()[0] or 0
     filter_count = conn.execute("SELECT COUNT(*) FROM filter_results").fetchone()[0]
@@ -202,7 +275,7 @@ def get_stats() -> Dict:
     }
 
 
-def save_llm_response(
+def _llm_response_row(
     provider: str, 
     model: str, 
     prompt: str, 
@@ -213,28 +286,83 @@ def save_llm_response(
     card_type: Optional[str] = None,
     source_text_length: Optional[int] = None,
     options: Optional[Dict] = None
-) -> str:
-    """Salva resposta bruta do LLM no DuckDB com campos expandidos para debug."""
-    response_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    timestamp = datetime.now()
-    
-    conn = _get_connection()
-    conn.execute("""
-        INSERT INTO llm_responses (
-            id, timestamp, provider, model, prompt, response, cards_id, analysis_id,
-            system_prompt, card_type, prompt_length, response_length, source_text_length, options
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, [
-        response_id, timestamp, provider, model, prompt, response, 
+) -> list:
+    """Monta a linha (na ordem das colunas de llm_responses) de uma resposta do LLM."""
+    return [
+        datetime.now().strftime("%Y%m%d_%H%M%S_%f"), datetime.now(),
+        provider, model, prompt, response, 
         cards_id or "", analysis_id or "",
         system_prompt or "", card_type or "",
         len(prompt), len(response), source_text_length or 0,
         json.dumps(options or {})
-    ])
+    ]
+
+
+_LLM_RESPONSES_INSERT = """
+    INSERT INTO llm_responses (
+        id, timestamp, provider, model, prompt, response, cards_id, analysis_id,
+        system_prompt, card_type, prompt_length, response_length, source_text_length, options
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def save_llm_response(
+    provider: str, 
+    model: str, 
+    prompt: str, 
+    response: str, 
+    cards_id: Optional[str] = None, 
+    analysis_id: Optional[str] = None,
+    system_prompt: Optional[str] = None,
+    card_type: Optional[str] = None,
+    source_text_length: Optional[int] = None,
+    options: Optional[Dict] = None
+) -> str:
+    """Salva resposta bruta do LLM no DuckDB com campos expandidos para debug."""
+    row = _llm_response_row(
+        provider, model, prompt, response,
+        cards_id=cards_id,
+        analysis_id=analysis_id,
+        system_prompt=system_prompt,
+        card_type=card_type,
+        source_text_length=source_text_length,
+        options=options,
+    )
+    conn = _cursor()
+    conn.execute(_LLM_RESPONSES_INSERT, row)
     conn.close()
     
-    return response_id
+    return row[0]
+
+
+def _generation_request_row(
+    source_text: str,
+    context_text: str,
+    card_type: str,
+    model: str,
+    provider: str,
+    source_type: str,
+    word_count: int,
+    target_min: int,
+    target_max: int,
+    analysis_id: Optional[str] = None
+) -> list:
+    """Monta a linha (na ordem das colunas de generation_requests) de uma request de geração."""
+    return [
+        datetime.now().strftime("%Y%m%d_%H%M%S_%f"), datetime.now(),
+        analysis_id or "", source_text, context_text,
+        card_type, model, provider, source_type, word_count, target_min, target_max
+    ]
+
+
+_GENERATION_REQUESTS_INSERT = """
+    INSERT INTO generation_requests (
+        id, timestamp, analysis_id, source_text, context_text, card_type,
+        model, provider, source_type, word_count, target_min, target_max
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
 
 
 def save_generation_request(
@@ -250,23 +378,41 @@ def save_generation_request(
     analysis_id: Optional[str] = None
 ) -> str:
     """Salva request de geração de cards (entrada do usuário)."""
-    request_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    timestamp = datetime.now()
-    
-    conn = _get_connection()
-    conn.execute("""
-        INSERT INTO generation_requests (
-            id, timestamp, analysis_id, source_text, context_text, card_type,
-            model, provider, source_type, word_count, target_min, target_max
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, [
-        request_id, timestamp, analysis_id or "", source_text, context_text,
-        card_type, model, provider, source_type, word_count, target_min, target_max
-    ])
+    row = _generation_request_row(
+        source_text, context_text, card_type, model, provider,
+        source_type, word_count, target_min, target_max,
+        analysis_id=analysis_id,
+    )
+    conn = _cursor()
+    conn.execute(_GENERATION_REQUESTS_INSERT, row)
     conn.close()
     
-    return request_id
+    return row[0]
+
+
+def _pipeline_stage_row(
+    request_id: str,
+    stage: str,
+    cards_in: int,
+    cards_out: int,
+    duration_ms: int = 0,
+    details: Optional[Dict] = None,
+    analysis_id: Optional[str] = None
+) -> list:
+    """Monta a linha (na ordem das colunas de generation_pipeline) de uma etapa do pipeline."""
+    return [
+        datetime.now().strftime("%Y%m%d_%H%M%S_%f"), datetime.now(),
+        request_id, analysis_id or "", stage,
+        cards_in, cards_out, duration_ms, json.dumps(details or {})
+    ]
+
+
+_PIPELINE_STAGES_INSERT = """
+    INSERT INTO generation_pipeline (
+        id, timestamp, request_id, analysis_id, stage, cards_in, cards_out, duration_ms, details
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
 
 
 def save_pipeline_stage(
@@ -279,25 +425,20 @@ def save_pipeline_stage(
     analysis_id: Optional[str] = None
 ) -> str:
     """Salva uma etapa do pipeline de geração para rastreamento."""
-    stage_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    timestamp = datetime.now()
-    
-    conn = _get_connection()
-    conn.execute("""
-        INSERT INTO generation_pipeline (
-            id, timestamp, request_id, analysis_id, stage, cards_in, cards_out, duration_ms, details
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, [
-        stage_id, timestamp, request_id, analysis_id or "", stage,
-        cards_in, cards_out, duration_ms, json.dumps(details or {})
-    ])
+    row = _pipeline_stage_row(
+        request_id, stage, cards_in, cards_out,
+        duration_ms=duration_ms,
+        details=details,
+        analysis_id=analysis_id,
+    )
+    conn = _cursor()
+    conn.execute(_PIPELINE_STAGES_INSERT, row)
     conn.close()
     
-    return stage_id
+    return row[0]
 
 
-def save_filter_result(
+def _filter_result_row(
     filter_type: str,
     cards_before: List[Dict],
     cards_after: List[Dict],
@@ -305,22 +446,8 @@ def save_filter_result(
     analysis_id: Optional[str] = None,
     metadata: Optional[Dict] = None,
     removed_cards_with_reasons: Optional[List[Dict]] = None
-) -> str:
-    """
-    Salva resultado de uma operação de filtragem no DuckDB.
-    
-    Args:
-        filter_type: Tipo do filtro aplicado (ex: 'src_validation', 'llm_relevance', 'quality_score', 'type_filter')
-        cards_before: Lista de cards ANTES do filtro
-        cards_after: Lista de cards APÓS o filtro (mantidos)
-        cards_id: ID do registro de cards final (opcional)
-        analysis_id: ID da análise associada (opcional)
-        metadata: Metadados adicionais (ex: threshold usado, scores, etc.)
-        removed_cards_with_reasons: Lista de cards removidos com motivos de rejeição (opcional)
-    
-    Returns:
-        ID do registro de filter_result
-    """
+) -> list:
+    """Monta a linha (na ordem das colunas de filter_results) de uma operação de filtragem."""
     filter_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     timestamp = datetime.now()
     
@@ -331,14 +458,9 @@ def save_filter_result(
         kept_keys = {_card_key(c) for c in cards_after}
         removed_cards = [c for c in cards_before if _card_key(c) not in kept_keys]
     
-    conn = _get_connection()
-    conn.execute("""
-        INSERT INTO filter_results (
-            id, timestamp, cards_id, analysis_id, filter_type, 
-            cards_before, cards_after, kept_cards, removed_cards, filter_metadata
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, [
+    # Mantidos são gravados só como hashes curtos (o conteúdo completo já está em cards/ de estágios
+    # anteriores); os removidos, que são o delta do filtro, continuam completos com os motivos.
+    return [
         filter_id, 
         timestamp, 
         cards_id or "", 
@@ -346,13 +468,150 @@ def save_filter_result(
         filter_type,
         len(cards_before),
         len(cards_after),
-        json.dumps(cards_after),
+        json.dumps([_card_hash(c) for c in cards_after]),
         json.dumps(removed_cards),
         json.dumps(metadata or {})
-    ])
+    ]
+
+
+_FILTER_RESULTS_INSERT = """
+    INSERT INTO filter_results (
+        id, timestamp, cards_id, analysis_id, filter_type, 
+        cards_before, cards_after, kept_cards, removed_cards, filter_metadata
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def save_filter_result(
+    filter_type: str,
+    cards_before: List[Dict],
+    cards_after: List[Dict],
+    cards_id: Optional[str] = None,
+    analysis_id: Optional[str] = None,
+    metadata: Optional[Dict] = None,
+    removed_cards_with_reasons: Optional[List[Dict]] = None
+) -> str:
+    """
+    Salva resultado de uma operação de filtragem no DuckDB.
+    
+    Args:
+        filter_type: Tipo do filtro aplicado (ex: 'src_validation', 'llm_relevance', 'quality_score', 'type_filter')
+        cards_before: Lista de cards ANTES do filtro
+        cards_after: Lista de cards APÓS o filtro (mantidos)
+        cards_id: ID do registro de cards final (opcional)
+        analysis_id: ID da análise associada (opcional)
+        metadata: Metadados adicionais (ex: threshold usado, scores, etc.)
+        removed_cards_with_reasons: Lista de cards removidos com motivos de rejeição (opcional)
+    
+    Returns:
+        ID do registro de filter_result
+    """
+    row = _filter_result_row(
+        filter_type,
+        cards_before,
+        cards_after,
+        cards_id=cards_id,
+        analysis_id=analysis_id,
+        metadata=metadata,
+        removed_cards_with_reasons=removed_cards_with_reasons,
+    )
+    
+    conn = _cursor()
+    conn.execute(_FILTER_RESULTS_INSERT, row)
     conn.close()
     
-    return filter_id
+    return row[0]
+
+
+class AuditBatch:
+    """
+    Acumula registros de auditoria de uma request (request de geração, respostas do LLM,
+    etapas do pipeline e resultados de filtros) para gravá-los de uma vez, numa única
+    transação, ao final do pipeline.
+    """
+
+    def __init__(self) -> None:
+        self.generation_requests: List[list] = []
+        self.llm_responses: List[list] = []
+        self.pipeline_stages: List[list] = []
+        self.filter_results: List[list] = []
+
+    @staticmethod
+    def _append(rows: List[list], row: list) -> str:
+        # IDs são timestamps com microssegundos; garante unicidade dentro do lote
+        if any(r[0] == row[0] for r in rows):
+            row[0] = f"{row[0]}_{len(rows)}"
+        rows.append(row)
+        return row[0]
+
+    def add_generation_request(self, **kwargs) -> str:
+        """Mesma assinatura de save_generation_request, mas só enfileira a linha."""
+        return self._append(self.generation_requests, _generation_request_row(**kwargs))
+
+    def add_llm_response(self, **kwargs) -> str:
+        """Mesma assinatura de save_llm_response, mas só enfileira a linha."""
+        return self._append(self.llm_responses, _llm_response_row(**kwargs))
+
+    def add_pipeline_stage(self, **kwargs) -> str:
+        """Mesma assinatura de save_pipeline_stage, mas só enfileira a linha."""
+        return self._append(self.pipeline_stages, _pipeline_stage_row(**kwargs))
+
+    def add_filter_result(self, **kwargs) -> str:
+        """Mesma assinatura de save_filter_result, mas só enfileira a linha."""
+        return self._append(self.filter_results, _filter_result_row(**kwargs))
+
+    def __len__(self) -> int:
+        return (
+            len(self.generation_requests) + len(self.llm_responses)
+            + len(self.pipeline_stages) + len(self.filter_results)
+        )
+
+    def _write(self, conn) -> Tuple[int, ...]:
+        """
+        Grava as linhas pendentes em `conn` (transação já aberta) sem tirá-las do lote.
+
+        Retorna quantas linhas de cada lista foram gravadas; só depois do COMMIT elas são
+        descartadas com `_discard`, para que um ROLLBACK não perca a auditoria da request.
+        """
+        batches = (
+            (_GENERATION_REQUESTS_INSERT, self.generation_requests),
+            (_LLM_RESPONSES_INSERT, self.llm_responses),
+            (_PIPELINE_STAGES_INSERT, self.pipeline_stages),
+            (_FILTER_RESULTS_INSERT, self.filter_results),
+        )
+        counts = []
+        for sql, rows in batches:
+            rows = rows[:]
+            if rows:
+                conn.executemany(sql, rows)
+            counts.append(len(rows))
+        return tuple(counts)
+
+    def _discard(self, counts: Tuple[int, ...]) -> None:
+        """Remove do lote as linhas já confirmadas (as enfileiradas depois continuam pendentes)."""
+        lists = (self.generation_requests, self.llm_responses, self.pipeline_stages, self.filter_results)
+        for rows, n in zip(lists, counts):
+            del rows[:n]
+
+    def flush(self) -> int:
+        """Grava todas as linhas pendentes numa única transação. Retorna quantas foram gravadas."""
+        if not len(self):
+            return 0
+
+        conn = _cursor()
+        try:
+            conn.execute("BEGIN TRANSACTION")
+            counts = self._write(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        self._discard(counts)
+        return sum(counts)
 
 
 def _card_key(card: Dict) -> str:
@@ -362,6 +621,11 @@ def _card_key(card: Dict) -> str:
     return f"{front}||{back}"
 
 
+def _card_hash(card: Dict) -> str:
+    """Hash curto e estável da chave do card (para registros de auditoria compactos)."""
+    return hashlib.blake2b(_card_key(card).encode("utf-8"), digest_size=8).hexdigest()
+
+
 def get_filter_results(
     analysis_id: Optional[str] = None, 
     cards_id: Optional[str] = None,
@@ -380,7 +644,7 @@ def get_filter_results(
     Returns:
         Lista de registros de filter_results
     """
-    conn = _get_connection()
+    conn = _cursor()
     
     query = "SELECT * FROM filter_results WHERE 1=1"
     params = []
@@ -422,7 +686,7 @@ def get_llm_responses(
     limit: int = 20
 ) -> List[Dict]:
     """Retorna respostas do LLM armazenadas."""
-    conn = _get_connection()
+    conn = _cursor()
     
     query = "SELECT * FROM llm_responses WHERE 1=1"
     params = []
@@ -1,5 +1,8 @@
 import re
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
 from typing import List, Literal, Optional
 
 from app.config import MAX_SOURCE_CHARS
@@ -14,6 +17,21 @@ except Exception:
 
 _LANGID_READY = False
 
+# Cache LRU de detecção de idioma, chaveado pelo hash do texto (evita reter textos grandes)
+_LANG_CACHE: "OrderedDict[bytes, LangHint3]" = OrderedDict()
+_LANG_CACHE_MAX = 512
+_LANG_CACHE_LOCK = threading.Lock()
+
+# Texto puramente ASCII e longo o bastante, sem palavras funcionais de pt/es, é inglês na
+# prática. Textos curtos (ex.: "O que e X?") e pt/es escritos sem acento ainda vão ao langid.
+_ASCII_SHORTCUT_MIN_CHARS = 200
+_PT_ES_FUNCTION_WORDS_RE = re.compile(
+    r"\b(?:que|nao|de|da|dos|das|em|uma|com|para|el|los|las|una|con)\b",
+    re.IGNORECASE,
+)
+
+_SRC_LINE_RE = re.compile(r"(?i)^(src|fonte|ref)\s*:\s*")
+
 
 def _ensure_langid_ready() -> bool:
     """
@@ -63,16 +81,19 @@ def strip_src_lines(text: str) -> str:
     t = (text or "").replace("\r\n", "\n").replace("\r", "\n")
     out = []
     for ln in t.split("\n"):
-        if re.match(r"(?i)^(src|fonte|ref)\s*:\s*", ln.strip()):
+        if _SRC_LINE_RE.match(ln.strip()):
             continue
         out.append(ln)
     return "\n".join(out).strip()
 
 
-def detect_language_pt_en_es(text: str) -> LangHint3:
+def detect_language_pt_en_es(text: str, *, ascii_shortcut: bool = True) -> LangHint3:
     """
     Detector de idioma (pt/en/es) usando langid (offline).
     Retorna: "pt-br" | "en" | "es" | "unknown"
+
+    Com `ascii_shortcut=False`, todo texto passa pelo langid (ex.: cards gerados, que podem
+    vir em português sem acentos).
     """
     s = (text or "").strip()
     if not s:
@@ -81,6 +102,23 @@ def detect_language_pt_en_es(text: str) -> LangHint3:
     if not _ensure_langid_ready():
         return "unknown"
 
+    # str.isascii é O(1) no CPython (flag da representação interna); a busca das palavras
+    # funcionais só roda quando o texto já é ASCII
+    if (
+        ascii_shortcut
+        and len(s) >= _ASCII_SHORTCUT_MIN_CHARS
+        and s.isascii()
+        and _PT_ES_FUNCTION_WORDS_RE.search(s) is None
+    ):
+        return "en"
+
+    key = hashlib.blake2b(s.encode("utf-8", "ignore"), digest_size=16).digest()
+    with _LANG_CACHE_LOCK:
+        cached = _LANG_CACHE.get(key)
+        if cached is not None:
+            _LANG_CACHE.move_to_end(key)
+            return cached
+
     code, score = langid.classify(s)
 
     if code == "pt":
@@ -101,6 +139,11 @@ def detect_language_pt_en_es(text: str) -> LangHint3:
         len(s),
     )
 
+    with _LANG_CACHE_LOCK:
+        _LANG_CACHE[key] = mapped
+        if len(_LANG_CACHE) > _LANG_CACHE_MAX:
+            _LANG_CACHE.popitem(last=False)
+
     return mapped
 
 